@@ -0,0 +1,166 @@
+import sqlite3
+import time
+from contextlib import closing
+from logging import getLogger
+
+from pydantic import BaseModel
+
+from src.config.query_config import QueryConfig
+from src.dataingestion.analytics_database import (
+    get_date_bounds,
+    open_read_only_analytics_database,
+    select_stored_files,
+)
+from src.dataingestion.ledger_session_helpers import fill_session_player_names
+from src.dataingestion.poker_hand_parser import get_registered_player_nickname_from_session_nickname_or_id
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+
+logger = getLogger(__name__)
+
+# Authorizer actions a read-only query needs, anything else (writes, PRAGMA, ATTACH, ...) is denied
+READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+CONSOLIDATED_SESSIONS_VIEW = """
+CREATE TEMP VIEW consolidated_sessions AS
+SELECT names.name AS player, sessions.session_date,
+    SUM(sessions.end_ms - sessions.start_ms) / 3600000.0 AS hours_played,
+    SUM(sessions.net_cents) / 100.0 AS net_dollars,
+    SUM(sessions.buy_in_cents) / 100.0 AS buy_in_dollars
+FROM sessions JOIN temp.session_player_names AS names USING (player_id, player_nickname)
+WHERE sessions.content_hash IN (SELECT content_hash FROM temp.selected_files)
+GROUP BY names.name, sessions.session_date
+"""
+
+QUERY_TABLES_DESCRIPTION = (
+    "- `sessions` - one row per ledger session: player_id, player_nickname, session_date, start_ms, end_ms, "
+    "buy_in_cents, buy_out_cents, stack_cents, net_cents\n"
+    "- `consolidated_sessions` - sessions summed per registered player and date: player, session_date, "
+    "hours_played, net_dollars, buy_in_dollars\n"
+    "- `hands` - hand_id, session_date, start_ms, end_ms, pot_cents\n"
+    "- `hand_players` - hand_id, player_id, player_nickname, session_date, start_ms, pot_cents of each player's hands\n"
+    "- `actions` - hand_id, action_order, street (0 preflop to 3 river), player_id, player_nickname, "
+    "action, amount_cents, timestamp_ms\n"
+    "- `action_player_names` - player_id, player_nickname and registered name of each acting player\n"
+)
+
+
+class QueryResult(BaseModel):
+    columns: list[str]
+    rows: list[tuple[object, ...]]
+    truncated: bool  # True if the query returned more than QueryConfig.MAX_ROWS rows
+
+
+def _authorize_read_only(action: int, *_: str | None) -> int:
+    return sqlite3.SQLITE_OK if action in READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _fill_action_player_names(connection: sqlite3.Connection, registered_players: list[RegisteredPlayer]) -> None:
+    """
+    Fill the temporary action_player_names table attributing the players acting in the selected logs
+    to registered nicknames, see get_registered_player_nickname_from_session_nickname_or_id and select_stored_files.
+    """
+    session_players = connection.execute(
+        """
+        SELECT DISTINCT player_id, player_nickname FROM actions
+        WHERE player_id IS NOT NULL AND content_hash IN (SELECT content_hash FROM temp.selected_files)
+        """
+    ).fetchall()
+    connection.execute("CREATE TEMP TABLE action_player_names (player_id TEXT, player_nickname TEXT, name TEXT)")
+    connection.executemany(
+        "INSERT INTO temp.action_player_names VALUES (?, ?, ?)",
+        (
+            (
+                player_id,
+                nickname,
+                get_registered_player_nickname_from_session_nickname_or_id(nickname, player_id, registered_players),
+            )
+            for player_id, nickname in session_players
+        ),
+    )
+
+
+def _prepare_query_views(
+    connection: sqlite3.Connection, content_hashes: list[str], registered_players: list[RegisteredPlayer]
+) -> None:
+    """Create the temporary tables and views that attribute players to registered names for queries."""
+    select_stored_files(connection, content_hashes)
+    fill_session_player_names(connection, registered_players, get_date_bounds((None, None)))
+    _fill_action_player_names(connection, registered_players)
+    connection.execute(CONSOLIDATED_SESSIONS_VIEW)
+
+
+def run_read_only_query(
+    guild_id: str, sql: str, content_hashes: list[str], registered_players: list[RegisteredPlayer]
+) -> QueryResult:
+    """
+    Run a single ad-hoc SELECT statement over a guild's analytics database.
+    The database is opened read-only and an authorizer denies anything but reads, so a query cannot change it.
+    Queries are interrupted after QueryConfig.TIMEOUT_SECONDS and only the first QueryConfig.MAX_ROWS rows are fetched.
+
+    Args:
+        guild_id: Discord guild ID to query
+        sql: The statement to run
+        content_hashes: Content hashes of the guild's current files, consolidated_sessions only includes these
+        registered_players: Registered players to attribute player IDs and nicknames to
+
+    Returns:
+        The result columns and rows
+
+    Raises:
+        ValueError: If the statement is not allowed, is invalid or times out
+    """
+    with closing(open_read_only_analytics_database(guild_id)) as connection:
+        _prepare_query_views(connection, content_hashes, registered_players)
+        connection.set_authorizer(_authorize_read_only)
+        deadline = time.monotonic() + QueryConfig.TIMEOUT_SECONDS
+        connection.set_progress_handler(
+            lambda: int(time.monotonic() > deadline), QueryConfig.PROGRESS_CHECK_INSTRUCTIONS
+        )
+        try:
+            cursor = connection.execute(sql)
+            rows = cursor.fetchmany(QueryConfig.MAX_ROWS + 1)
+        except sqlite3.Error as e:
+            if time.monotonic() > deadline:
+                raise ValueError(f"Query timed out after {QueryConfig.TIMEOUT_SECONDS} seconds") from e
+            raise ValueError(str(e)) from e
+        if cursor.description is None:
+            raise ValueError("Only SELECT statements are allowed")
+
+    logger.info(f"Ran ad-hoc query for guild {guild_id}, {len(rows)} rows fetched")
+    return QueryResult(
+        columns=[column[0] for column in cursor.description],
+        rows=rows[: QueryConfig.MAX_ROWS],
+        truncated=len(rows) > QueryConfig.MAX_ROWS,
+    )
+
+
+def _format_cell(value: object) -> str:
+    if value is None:
+        text = "NULL"
+    elif isinstance(value, float):
+        # Sums of stored cents come back as floats like 5.969999999999999
+        text = f"{value:.10g}"
+    else:
+        text = " ".join(str(value).split())
+    return text if len(text) <= QueryConfig.MAX_CELL_WIDTH else text[: QueryConfig.MAX_CELL_WIDTH - 1] + "…"
+
+
+def format_query_result(result: QueryResult) -> str:
+    """Format a query result as a fixed-width table in a code block, dropping rows that do not fit in a message."""
+    table = [[_format_cell(column) for column in result.columns]] + [
+        [_format_cell(value) for value in row] for row in result.rows
+    ]
+    widths = [max(len(row[index]) for row in table) for index in range(len(result.columns))]
+    lines = [" | ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)).rstrip() for row in table]
+    lines.insert(1, "-+-".join("-" * width for width in widths))
+
+    shown_rows = len(result.rows)
+    while True:
+        if shown_rows < len(result.rows) or result.truncated:
+            footer = f"Showing the first {shown_rows} rows"
+        else:
+            footer = f"{shown_rows} row{'' if shown_rows == 1 else 's'}"
+        message = "```\n" + "\n".join(lines[: shown_rows + 2]) + "\n```" + footer
+        if len(message) <= QueryConfig.MAX_MESSAGE_LENGTH or shown_rows == 0:
+            return message[: QueryConfig.MAX_MESSAGE_LENGTH]
+        shown_rows -= 1
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+from collections.abc import Callable, Coroutine
+from datetime import date
+from functools import cache
+from io import BytesIO
+from logging import getLogger
+from pathlib import Path
+from typing import Any
+
+from src.config.cache_config import CacheConfig
+from src.dataingestion.byte_budget_cache import ByteBudgetLRUCache
+from src.dataingestion.single_flight import SingleFlight
+
+logger = getLogger(__name__)
+
+ChartParams = dict[str, date | int | None]
+
+# (guild ID, chart name, serialized params, data version)
+ChartCacheKey = tuple[str, str, str, str]
+
+
+def serialize_chart_params(params: ChartParams) -> str:
+    """Serialize chart parameters in a stable order, so equal parameters always share a cache key."""
+    return "&".join(f"{name}={value}" for name, value in sorted(params.items()))
+
+
+class ChartCache:
+    """
+    Cache of rendered chart PNGs, keyed by the guild data version they were rendered from.
+    Changed data gets a new version, so stale charts are never served and simply age out.
+    Concurrent misses for the same chart share a single load and render.
+    """
+
+    def __init__(self, max_bytes: int, directory: str | None, disk_max_bytes: int) -> None:
+        self._memory: ByteBudgetLRUCache[ChartCacheKey, bytes] = ByteBudgetLRUCache("rendered charts", max_bytes)
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = disk_max_bytes
+        self._renders: SingleFlight[ChartCacheKey, bytes | None] = SingleFlight("chart render")
+
+    def _get_path(self, key: ChartCacheKey) -> Path:
+        guild_id, chart_name, params, data_version = key
+        assert self.directory is not None
+        params_hash = hashlib.sha256(params.encode()).hexdigest()[:16]
+        return self.directory / guild_id / f"{chart_name}_{params_hash}_{data_version}.png"
+
+    def _read_from_disk(self, key: ChartCacheKey) -> bytes | None:
+        path = self._get_path(key)
+        try:
+            png = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Refresh the modification time, disk pruning removes the least recently used charts first
+        path.touch()
+        return png
+
+    def _write_to_disk(self, key: ChartCacheKey, png: bytes) -> None:
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Renders of the same chart from older data versions can never be served again
+        stale_prefix = path.name.rsplit("_", 1)[0] + "_"
+        for stale_path in path.parent.glob(f"{stale_prefix}*.png"):
+            stale_path.unlink(missing_ok=True)
+
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_bytes(png)
+        os.replace(temporary_path, path)
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        assert self.directory is not None
+        paths = sorted(self.directory.glob("*/*.png"), key=lambda path: path.stat().st_mtime)
+        total_bytes = sum(path.stat().st_size for path in paths)
+        for path in paths:
+            if total_bytes <= self.disk_max_bytes:
+                break
+            total_bytes -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+    async def get(self, guild_id: str, chart_name: str, params: ChartParams, data_version: str) -> bytes | None:
+        """Get a rendered chart from memory, falling back to disk when persistence is enabled."""
+        key = (guild_id, chart_name, serialize_chart_params(params), data_version)
+        png = self._memory.get(key)
+        if png is None and self.directory is not None:
+            png = await asyncio.to_thread(self._read_from_disk, key)
+            if png is not None:
+                self._memory.put(key, png, len(png))
+        return png
+
+    async def put(self, guild_id: str, chart_name: str, params: ChartParams, data_version: str, png: bytes) -> None:
+        key = (guild_id, chart_name, serialize_chart_params(params), data_version)
+        self._memory.put(key, png, len(png))
+        if self.directory is not None:
+            try:
+                await asyncio.to_thread(self._write_to_disk, key, png)
+            except OSError as e:
+                logger.error(f"Error persisting chart {chart_name} for guild {guild_id}: {e}")
+
+    async def _render_and_store(
+        self,
+        key: ChartCacheKey,
+        params: ChartParams,
+        render: Callable[[], Coroutine[Any, Any, BytesIO | None]],
+    ) -> bytes | None:
+        guild_id, chart_name, _, data_version = key
+        file_object = await render()
+        if file_object is None:
+            return None
+        png = file_object.getvalue()
+        await self.put(guild_id, chart_name, params, data_version, png)
+        return png
+
+    async def get_or_render(
+        self,
+        guild_id: str,
+        chart_name: str,
+        params: ChartParams,
+        data_version: str,
+        render: Callable[[], Coroutine[Any, Any, BytesIO | None]],
+    ) -> BytesIO | None:
+        """
+        Get a rendered chart, rendering and caching it on a miss.
+        Callers that miss while the same chart is already rendering wait for that render instead.
+
+        Args:
+            guild_id: Discord guild ID the chart belongs to
+            chart_name: Name of the chart, unique per chart function
+            params: Every parameter that changes the chart's output
+            data_version: Version of the guild data the chart is rendered from
+            render: Loads the data and renders the chart, returning None when there is nothing to chart
+
+        Returns:
+            The PNG image, or None if render had nothing to chart
+        """
+        png = await self.get(guild_id, chart_name, params, data_version)
+        if png is not None:
+            logger.info(f"Using cached {chart_name} chart for guild {guild_id} ({self._memory.stats()})")
+            return BytesIO(png)
+
+        key = (guild_id, chart_name, serialize_chart_params(params), data_version)
+        png = await self._renders.run(key, lambda: self._render_and_store(key, params, render))
+        # Every caller gets its own stream, discord.File reads from the current position
+        return BytesIO(png) if png is not None else None
+
+
+@cache
+def get_shared_chart_cache() -> ChartCache:
+    return ChartCache(
+        CacheConfig.CHART_CACHE_MAX_BYTES, CacheConfig.CHART_CACHE_DIRECTORY, CacheConfig.CHART_CACHE_DISK_MAX_BYTES
+    )
@@ -0,0 +1,279 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from datetime import date
+from functools import cache
+from io import BytesIO
+from logging import getLogger
+from typing import Any
+
+from src.analytics.chart_cache import ChartCache, ChartParams, get_shared_chart_cache
+from src.analytics.guild_dataset_cache import GuildDataset, GuildDatasetCache, get_shared_guild_dataset_cache
+from src.analytics.hand_stats import (
+    HAND_STATS_ACTION_COLUMNS,
+    HandStats,
+    VpipCounter,
+    calculate_hand_stats_from_columnar_logs,
+)
+from src.analytics.ledger_visualizations import (
+    get_file_object_of_buy_in_analysis,
+    get_file_object_of_player_nets_over_time,
+    get_file_object_of_player_played_time_totals,
+    get_file_object_of_player_profit_per_hour,
+)
+from src.analytics.log_analytics import VPIP_ACTION_COLUMNS, calculate_vpip_stats_from_columnar_logs
+from src.analytics.log_stats_cache import get_session_hand_stats
+from src.analytics.log_visualizations import (
+    get_file_object_of_hud_stats,
+    get_file_object_of_showdown_hands,
+    get_file_object_of_vpip_by_player,
+    get_file_object_of_vpip_by_session,
+)
+from src.analytics.showdown_analytics import classify_showdowns
+from src.dataingestion.columnar_hand_store import ColumnarPokerLog
+from src.dataingestion.file_manifest_helpers import DateRange
+from src.dataingestion.poker_hand_parser import (
+    load_all_columnar_poker_logs,
+    load_all_poker_logs,
+    load_stored_poker_log_entries,
+)
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
+
+logger = getLogger(__name__)
+
+# Action columns of the columnar hand store that log charts read
+LOG_CHART_ACTION_COLUMNS = list(dict.fromkeys(VPIP_ACTION_COLUMNS + HAND_STATS_ACTION_COLUMNS))
+
+
+class GuildCharts:
+    """Renders each graph command's chart from a guild's cached data, going through the chart cache."""
+
+    def __init__(self, s3_service: S3Service, dataset_cache: GuildDatasetCache, chart_cache: ChartCache) -> None:
+        self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
+        self.chart_cache = chart_cache
+
+    async def _get_chart(
+        self,
+        guild_id: str,
+        chart_name: str,
+        params: ChartParams,
+        render: Callable[[], Coroutine[Any, Any, BytesIO | None]],
+    ) -> BytesIO | None:
+        data_version = await self.dataset_cache.get_data_version(guild_id)
+        return await self.chart_cache.get_or_render(guild_id, chart_name, params, data_version, render)
+
+    async def _get_ledger_chart(
+        self,
+        guild_id: str,
+        chart_name: str,
+        start_date: date | None,
+        end_date: date | None,
+        render_dataset: Callable[[GuildDataset], BytesIO],
+    ) -> BytesIO | None:
+        """Get a chart of consolidated ledger sessions. Returns None if a date range has no sessions."""
+
+        async def render() -> BytesIO | None:
+            logger.info(f"Loading all ledger sessions and registered players for guild {guild_id}")
+            dataset = await self.dataset_cache.get_dataset(guild_id, start_date, end_date)
+            if dataset.sessions_df.empty and (start_date is not None or end_date is not None):
+                return None
+            return render_dataset(dataset)
+
+        return await self._get_chart(guild_id, chart_name, {"start_date": start_date, "end_date": end_date}, render)
+
+    async def _get_log_chart(
+        self,
+        guild_id: str,
+        chart_name: str,
+        latest_sessions: int | None,
+        date_range: DateRange,
+        render_logs: Callable[[list[ColumnarPokerLog], list[RegisteredPlayer]], BytesIO],
+    ) -> BytesIO | None:
+        """Get a chart of the action columns of a guild's stored poker logs. Returns None if there are no logs."""
+        start_date, end_date = date_range
+
+        async def render() -> BytesIO | None:
+            logger.info(f"Loading poker hands for guild {guild_id}")
+            registered_players = await self.dataset_cache.get_registered_players(guild_id)
+            logs = await load_all_columnar_poker_logs(
+                guild_id, self.s3_service, latest_sessions, date_range, LOG_CHART_ACTION_COLUMNS
+            )
+            if not logs:
+                return None
+            return render_logs(logs, registered_players)
+
+        params: ChartParams = {"latest_sessions": latest_sessions, "start_date": start_date, "end_date": end_date}
+        return await self._get_chart(guild_id, chart_name, params, render)
+
+    async def _get_session_stats_chart(
+        self,
+        guild_id: str,
+        chart_name: str,
+        latest_sessions: int | None,
+        date_range: DateRange,
+        render_sessions: Callable[[list[tuple[date, HandStats]]], BytesIO],
+    ) -> BytesIO | None:
+        """
+        Get a chart of each session's hand stats, which are memoized per log file, see get_session_hand_stats.
+        Returns None if there are no logs.
+        """
+        start_date, end_date = date_range
+
+        async def render() -> BytesIO | None:
+            logger.info(f"Loading session stats for guild {guild_id}")
+            registered_players = await self.dataset_cache.get_registered_players(guild_id)
+            entries = await load_stored_poker_log_entries(guild_id, self.s3_service, latest_sessions, date_range)
+            if not entries:
+                return None
+            session_stats = await asyncio.to_thread(get_session_hand_stats, guild_id, entries, registered_players)
+            return render_sessions(session_stats)
+
+        params: ChartParams = {"latest_sessions": latest_sessions, "start_date": start_date, "end_date": end_date}
+        return await self._get_chart(guild_id, chart_name, params, render)
+
+    async def get_player_nets_over_time(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        # Initial details are all-time starting balances, so they only apply to unbounded graphs
+        return await self._get_ledger_chart(
+            guild_id,
+            "player_nets_over_time",
+            start_date,
+            end_date,
+            lambda dataset: get_file_object_of_player_nets_over_time(
+                dataset.sessions_df, dataset.registered_players, include_initial_details=start_date is None
+            ),
+        )
+
+    async def get_player_played_time_totals(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        return await self._get_ledger_chart(
+            guild_id,
+            "player_played_time_totals",
+            start_date,
+            end_date,
+            lambda dataset: get_file_object_of_player_played_time_totals(
+                dataset.sessions_df, dataset.registered_players
+            ),
+        )
+
+    async def get_profit_per_hour(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        return await self._get_ledger_chart(
+            guild_id,
+            "profit_per_hour",
+            start_date,
+            end_date,
+            lambda dataset: get_file_object_of_player_profit_per_hour(dataset.sessions_df, dataset.registered_players),
+        )
+
+    async def get_buy_in_analysis(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        return await self._get_ledger_chart(
+            guild_id,
+            "buy_in_analysis",
+            start_date,
+            end_date,
+            lambda dataset: get_file_object_of_buy_in_analysis(dataset.sessions_df),
+        )
+
+    async def get_total_vpip(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        return await self._get_log_chart(
+            guild_id,
+            "total_vpip",
+            None,
+            (start_date, end_date),
+            lambda logs, registered_players: get_file_object_of_vpip_by_player(
+                calculate_vpip_stats_from_columnar_logs(logs, registered_players)[0]
+            ),
+        )
+
+    async def get_vpip_over_time(
+        self,
+        guild_id: str,
+        num_sessions: int | None = None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+    ) -> BytesIO | None:
+        # No count or a count below one charts all sessions
+        latest_sessions = num_sessions if num_sessions is not None and num_sessions > 0 else None
+        # Only the most recent sessions' stats are read, each log is only analyzed the first time it is charted
+        return await self._get_session_stats_chart(
+            guild_id,
+            "vpip_over_time",
+            latest_sessions,
+            (start_date, end_date),
+            lambda session_stats: get_file_object_of_vpip_by_session(
+                [(session_date, stats.stats_by_name[VpipCounter.name]) for session_date, stats in session_stats],
+                latest_sessions,
+            ),
+        )
+
+    async def get_latest_session_vpip(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        # Read only the latest session's stats and chart them with the total VPIP chart
+        return await self._get_session_stats_chart(
+            guild_id,
+            "latest_session_vpip",
+            1,
+            (start_date, end_date),
+            lambda session_stats: get_file_object_of_vpip_by_player(
+                session_stats[-1][1].stats_by_name[VpipCounter.name]
+            ),
+        )
+
+    async def get_hud_stats(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        return await self._get_log_chart(
+            guild_id,
+            "hud_stats",
+            None,
+            (start_date, end_date),
+            lambda logs, registered_players: get_file_object_of_hud_stats(
+                calculate_hand_stats_from_columnar_logs(logs, registered_players)
+            ),
+        )
+
+    async def get_showdown_hands(
+        self, guild_id: str, start_date: date | None = None, end_date: date | None = None
+    ) -> BytesIO | None:
+        """Get the chart of hands shown at showdown. Returns None if no cards were shown on a complete board."""
+
+        async def render() -> BytesIO | None:
+            logger.info(f"Loading parsed poker logs for guild {guild_id}")
+            registered_players = await self.dataset_cache.get_registered_players(guild_id)
+            # Shown cards are only kept in parsed logs, not in the columnar hand store
+            logs = await load_all_poker_logs(
+                guild_id, self.s3_service, registered_players, date_range=(start_date, end_date)
+            )
+            showdowns = classify_showdowns(logs, registered_players)
+            if not showdowns:
+                return None
+            return get_file_object_of_showdown_hands(showdowns)
+
+        return await self._get_chart(
+            guild_id, "showdown_hands", {"start_date": start_date, "end_date": end_date}, render
+        )
+
+    async def precompute_all_time_charts(self, guild_id: str) -> None:
+        """Render every chart that has no required parameters over all of a guild's data, unless already cached."""
+        await self.get_player_nets_over_time(guild_id)
+        await self.get_player_played_time_totals(guild_id)
+        await self.get_profit_per_hour(guild_id)
+        await self.get_buy_in_analysis(guild_id)
+        await self.get_total_vpip(guild_id)
+        await self.get_latest_session_vpip(guild_id)
+        await self.get_hud_stats(guild_id)
+
+
+@cache
+def get_shared_guild_charts() -> GuildCharts:
+    return GuildCharts(get_shared_s3_service(), get_shared_guild_dataset_cache(), get_shared_chart_cache())
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+from datetime import date
+from functools import cache
+from logging import getLogger
+
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+
+from src.config.cache_config import CacheConfig
+from src.dataingestion.file_manifest_helpers import DateRange, load_guild_manifest
+from src.dataingestion.ledger_session_helpers import load_all_consolidated_sessions
+from src.dataingestion.registered_player_helpers import fingerprint_registered_players, load_registered_players
+from src.dataingestion.schemas.consolidated_session import ConsolidatedPlayerSession
+from src.dataingestion.schemas.file_manifest import GuildManifest
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
+
+logger = getLogger(__name__)
+
+MS_PER_HOUR = 1000 * 60 * 60
+
+
+class GuildDataset(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    data_version: str
+    # One row per consolidated session, see build_consolidated_sessions_frame
+    sessions_df: pd.DataFrame
+    registered_players: list[RegisteredPlayer]
+
+
+def fingerprint_guild_data(manifest: GuildManifest, registered_players: list[RegisteredPlayer]) -> str:
+    """Get a data version that changes whenever any stored file or the registered players change."""
+    content_hash = hashlib.sha256()
+    for key, entry in sorted(manifest.entries.items()):
+        content_hash.update(f"{key}:{entry.etag}\n".encode())
+    content_hash.update(fingerprint_registered_players(registered_players).encode())
+    return content_hash.hexdigest()[:16]
+
+
+def build_consolidated_sessions_frame(consolidated_sessions: list[ConsolidatedPlayerSession]) -> pd.DataFrame:
+    """
+    Build a DataFrame with one row per consolidated session, which every ledger chart aggregates.
+    Columns are player, date (datetime64), net_dollars, hours_played and buy_in_dollars, amounts as floats.
+    """
+    return pd.DataFrame(
+        {
+            "player": [session.player_nickname_lowercase for session in consolidated_sessions],
+            "date": pd.to_datetime([session.date for session in consolidated_sessions]),
+            "net_dollars": [float(session.net_dollars) for session in consolidated_sessions],
+            "hours_played": [session.time_played_ms / MS_PER_HOUR for session in consolidated_sessions],
+            "buy_in_dollars": [float(session.buy_in_dollars) for session in consolidated_sessions],
+        }
+    )
+
+
+class GuildDatasetCache:
+    """
+    Keeps each guild's analytics inputs in memory between graph commands.
+    Nothing expires on a timer, the commands that change a guild's files call invalidate instead.
+    """
+
+    def __init__(self, s3_service: S3Service) -> None:
+        self.s3_service = s3_service
+        self._registered_players: dict[str, list[RegisteredPlayer]] = {}
+        self._data_versions: dict[str, str] = {}
+        self._datasets: dict[str, dict[DateRange, GuildDataset]] = {}
+        # Bumped by invalidate, so loads that started before an invalidation do not store stale results
+        self._generations: dict[str, int] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _get_lock(self, guild_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(guild_id, asyncio.Lock())
+
+    def _is_current(self, guild_id: str, generation: int) -> bool:
+        return self._generations.get(guild_id, 0) == generation
+
+    async def _get_registered_players(self, guild_id: str, generation: int) -> list[RegisteredPlayer]:
+        registered_players = self._registered_players.get(guild_id)
+        if registered_players is None:
+            registered_players = await load_registered_players(guild_id, self.s3_service)
+            if self._is_current(guild_id, generation):
+                self._registered_players[guild_id] = registered_players
+        return registered_players
+
+    async def _get_data_version(self, guild_id: str, generation: int) -> str:
+        data_version = self._data_versions.get(guild_id)
+        if data_version is None:
+            manifest = await load_guild_manifest(guild_id, self.s3_service)
+            registered_players = await self._get_registered_players(guild_id, generation)
+            data_version = fingerprint_guild_data(manifest, registered_players)
+            if self._is_current(guild_id, generation):
+                self._data_versions[guild_id] = data_version
+        return data_version
+
+    async def get_registered_players(self, guild_id: str) -> list[RegisteredPlayer]:
+        """Get a guild's registered players, loading them from S3 only after an invalidation."""
+        async with self._get_lock(guild_id):
+            return await self._get_registered_players(guild_id, self._generations.get(guild_id, 0))
+
+    async def get_data_version(self, guild_id: str) -> str:
+        """Get the version of a guild's stored data, for keying anything derived from it."""
+        async with self._get_lock(guild_id):
+            return await self._get_data_version(guild_id, self._generations.get(guild_id, 0))
+
+    async def get_dataset(
+        self,
+        guild_id: str,
+        start_date: date | None = None,
+        end_date: date | None = None,
+    ) -> GuildDataset:
+        """
+        Get a guild's consolidated ledger sessions and registered players, loading them only on a miss.
+        Concurrent callers for the same guild wait for a single load.
+
+        Args:
+            guild_id: Discord guild ID to get the dataset for
+            start_date: Only include sessions on or after this date
+            end_date: Only include sessions on or before this date
+
+        Returns:
+            The guild's dataset for the date range
+        """
+        date_range = (start_date, end_date)
+        async with self._get_lock(guild_id):
+            dataset = self._datasets.get(guild_id, {}).get(date_range)
+            if dataset is not None:
+                logger.info(f"Using cached dataset {dataset.data_version} for guild {guild_id}")
+                return dataset
+
+            generation = self._generations.get(guild_id, 0)
+            data_version = await self._get_data_version(guild_id, generation)
+            registered_players = await self._get_registered_players(guild_id, generation)
+            consolidated_sessions = await load_all_consolidated_sessions(
+                guild_id, self.s3_service, registered_players, date_range
+            )
+            dataset = GuildDataset(
+                data_version=data_version,
+                sessions_df=build_consolidated_sessions_frame(consolidated_sessions),
+                registered_players=registered_players,
+            )
+
+            if self._is_current(guild_id, generation):
+                guild_datasets = self._datasets.setdefault(guild_id, {})
+                guild_datasets[date_range] = dataset
+                if len(guild_datasets) > CacheConfig.MAX_CACHED_DATASETS_PER_GUILD:
+                    del guild_datasets[next(iter(guild_datasets))]
+            logger.info(
+                f"Loaded dataset {data_version} with {len(consolidated_sessions)} consolidated sessions "
+                f"for guild {guild_id}"
+            )
+            return dataset
+
+    def invalidate(self, guild_id: str) -> None:
+        """Drop everything cached for a guild after its files or registered players change."""
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+        self._registered_players.pop(guild_id, None)
+        self._data_versions.pop(guild_id, None)
+        self._datasets.pop(guild_id, None)
+        logger.info(f"Invalidated cached dataset for guild {guild_id}")
+
+
+@cache
+def get_shared_guild_dataset_cache() -> GuildDatasetCache:
+    """Get the dataset cache shared by all cogs, so invalidations from one cog are seen by the others."""
+    return GuildDatasetCache(get_shared_s3_service())
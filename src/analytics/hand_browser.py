@@ -0,0 +1,200 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+from logging import getLogger
+from typing import Literal
+
+from pydantic import BaseModel
+
+from src.config.hand_browser_config import HandBrowserConfig
+from src.dataingestion.analytics_database import get_date_bounds, open_read_only_analytics_database, select_stored_files
+from src.dataingestion.file_manifest_helpers import DateRange
+from src.dataingestion.poker_hand_parser import get_registered_player_nickname_from_session_nickname_or_id
+from src.dataingestion.schemas.player_action import PlayerAction
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+
+logger = getLogger(__name__)
+
+HandSortOrder = Literal["pot", "recent"]
+# Hand column each sort order pages by, largest first, ties are broken by the hand's key
+SORT_COLUMNS: dict[HandSortOrder, str] = {"pot": "pot_cents", "recent": "start_ms"}
+# Index of the hands table in each sort order, walked from its end so a page stops after reading PAGE_SIZE + 1 hands
+SORT_INDEXES: dict[HandSortOrder, str] = {"pot": "hands_by_pot", "recent": "hands_by_start"}
+SORT_TITLES: dict[HandSortOrder, str] = {"pot": "Biggest pots", "recent": "Most recent hands"}
+
+# (sort column value, content hash, hand ID) of the last hand on a page, the next page starts after it
+HandCursor = tuple[int, str, str]
+
+
+class HandFilter(BaseModel):
+    player_name: str | None  # Only hands a registered name or nickname played in, all hands if None
+    date_range: DateRange
+    sort: HandSortOrder
+
+
+class BrowsedHand(BaseModel):
+    hand_id: str
+    session_date: date
+    pot_cents: int
+    players: list[str]
+    winners: list[str]
+
+
+class HandPage(BaseModel):
+    hands: list[BrowsedHand]
+    next_cursor: HandCursor | None  # None on the last page
+
+
+def _get_player_names(pairs: list[tuple[str, str]], registered_players: list[RegisteredPlayer]) -> list[str]:
+    return list(
+        dict.fromkeys(
+            get_registered_player_nickname_from_session_nickname_or_id(nickname, player_id, registered_players)
+            for player_id, nickname in pairs
+        )
+    )
+
+
+def _select_players(
+    connection: sqlite3.Connection, registered_players: list[RegisteredPlayer], player_name: str
+) -> None:
+    """
+    Fill the temporary selected_players table with the players of the selected logs matching a name:
+    players attributed to the registered player the name or one of their nicknames belongs to,
+    and players who used the name as their session nickname.
+    """
+    lowercase_name = player_name.lower()
+    attributed_name = next(
+        (
+            player.player_name_lowercase
+            for player in registered_players
+            if lowercase_name == player.player_name_lowercase or lowercase_name in player.player_nicknames_lowercase
+        ),
+        lowercase_name,
+    )
+    log_players = connection.execute(
+        "SELECT DISTINCT player_id, player_nickname FROM players "
+        "WHERE content_hash IN (SELECT content_hash FROM temp.selected_files)"
+    ).fetchall()
+    selected_players = [
+        (player_id, nickname)
+        for player_id, nickname in log_players
+        if nickname.lower() == lowercase_name
+        or _get_player_names([(player_id, nickname)], registered_players)[0].lower() == attributed_name
+    ]
+    connection.execute("CREATE TEMP TABLE selected_players (player_id TEXT, player_nickname TEXT)")
+    connection.executemany("INSERT INTO temp.selected_players VALUES (?, ?)", selected_players)
+
+
+def _query_page_keys(
+    connection: sqlite3.Connection, hand_filter: HandFilter, cursor: HandCursor | None
+) -> list[HandCursor]:
+    """
+    Get the keys of a page of hands plus one, to tell if there is a next page. Pages start after the cursor
+    in the hands or hand_players indexes rather than at an offset, so turning a page never rereads earlier hands.
+    """
+    column = SORT_COLUMNS[hand_filter.sort]
+    # Without the hint SQLite prefers the content_hash primary key and sorts every selected hand
+    source = f"hands INDEXED BY {SORT_INDEXES[hand_filter.sort]}"
+    if hand_filter.player_name is not None:
+        # Each selected player's hands are a range of the hand_players index, only the ranges are merged and sorted
+        source = "hand_players JOIN temp.selected_players USING (player_id, player_nickname)"
+    conditions = ["content_hash IN (SELECT content_hash FROM temp.selected_files)", "session_date BETWEEN ? AND ?"]
+    params: list[str | int] = [*get_date_bounds(hand_filter.date_range)]
+    if cursor is not None:
+        conditions.append(f"({column}, content_hash, hand_id) < (?, ?, ?)")
+        params.extend(cursor)
+    return connection.execute(
+        f"""
+        SELECT DISTINCT {column}, content_hash, hand_id FROM {source}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {column} DESC, content_hash DESC, hand_id DESC
+        LIMIT ?
+        """,
+        (*params, HandBrowserConfig.PAGE_SIZE + 1),
+    ).fetchall()
+
+
+def _get_browsed_hand(
+    connection: sqlite3.Connection, registered_players: list[RegisteredPlayer], content_hash: str, hand_id: str
+) -> BrowsedHand:
+    session_date, pot_cents = connection.execute(
+        "SELECT session_date, pot_cents FROM hands WHERE content_hash = ? AND hand_id = ?", (content_hash, hand_id)
+    ).fetchone()
+    players = connection.execute(
+        "SELECT player_id, player_nickname FROM hand_players WHERE content_hash = ? AND hand_id = ?",
+        (content_hash, hand_id),
+    ).fetchall()
+    winners = connection.execute(
+        "SELECT player_id, player_nickname FROM actions WHERE content_hash = ? AND hand_id = ? AND action = ?",
+        (content_hash, hand_id, PlayerAction.COLLECT.value),
+    ).fetchall()
+    return BrowsedHand(
+        hand_id=hand_id,
+        session_date=date.fromisoformat(session_date),
+        pot_cents=pot_cents,
+        players=_get_player_names(players, registered_players),
+        winners=_get_player_names(winners, registered_players),
+    )
+
+
+def query_hand_page(
+    guild_id: str,
+    content_hashes: list[str],
+    registered_players: list[RegisteredPlayer],
+    hand_filter: HandFilter,
+    cursor: HandCursor | None = None,
+) -> HandPage:
+    """
+    Get a page of the hands matching a filter from the guild's analytics database, with keyset pagination.
+    Only the index entries up to the end of the page and the rows of the hands on it are read.
+
+    Args:
+        guild_id: Discord guild ID to query
+        content_hashes: Content hashes of the log files to include, see load_stored_poker_log_hashes
+        registered_players: Registered players to attribute player IDs and nicknames to
+        hand_filter: Which hands to page through and in which order
+        cursor: The previous page's next_cursor, None for the first page
+
+    Returns:
+        The page's hands and the cursor of the next page
+    """
+    with closing(open_read_only_analytics_database(guild_id)) as connection:
+        select_stored_files(connection, content_hashes)
+        if hand_filter.player_name is not None:
+            _select_players(connection, registered_players, hand_filter.player_name)
+        keys = _query_page_keys(connection, hand_filter, cursor)
+        hands = [
+            _get_browsed_hand(connection, registered_players, content_hash, hand_id)
+            for _, content_hash, hand_id in keys[: HandBrowserConfig.PAGE_SIZE]
+        ]
+
+    logger.info(f"Queried a page of {len(hands)} hands for guild {guild_id}")
+    return HandPage(
+        hands=hands,
+        next_cursor=keys[HandBrowserConfig.PAGE_SIZE - 1] if len(keys) > HandBrowserConfig.PAGE_SIZE else None,
+    )
+
+
+def format_hand_page(page: HandPage, hand_filter: HandFilter, page_number: int) -> str:
+    """Format a page of hands as a message that fits in Discord's limit."""
+    title = SORT_TITLES[hand_filter.sort]
+    if hand_filter.player_name is not None:
+        title += f" involving {hand_filter.player_name}"
+    start_date, end_date = hand_filter.date_range
+    if start_date is not None:
+        title += f" from {start_date.isoformat()}"
+    if end_date is not None:
+        title += f" to {end_date.isoformat()}"
+    header = f"**{title}** (page {page_number})"
+    if not page.hands:
+        return f"{header}\nNo matching hands."
+
+    lines = [
+        f"`{hand.session_date.isoformat()}` **${hand.pot_cents / 100:,.2f}** hand `{hand.hand_id}` - "
+        f"{', '.join(hand.players)}" + (f" - won by {', '.join(hand.winners)}" if hand.winners else "")
+        for hand in page.hands
+    ]
+    # Long player lists are cut off rather than dropping hands, which the next page would skip
+    line_length = (HandBrowserConfig.MAX_MESSAGE_LENGTH - len(header)) // len(lines) - 1
+    lines = [line if len(line) <= line_length else line[: line_length - 1] + "…" for line in lines]
+    return "\n".join([header, *lines])
@@ -0,0 +1,217 @@
+from collections.abc import Sequence
+from enum import IntEnum
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from src.dataingestion.schemas.card import Card
+from src.dataingestion.schemas.card_rank import CardRank
+from src.dataingestion.schemas.card_suit import CardSuit
+
+# Cards are encoded as rank index * 4 + suit index, ranks from TWO = 0 to ACE = 12
+RANKS = list(CardRank)
+SUITS = list(CardSuit)
+RANK_INDEXES: dict[CardRank, int] = {rank: index for index, rank in enumerate(RANKS)}
+SUIT_INDEXES: dict[CardSuit, int] = {suit: index for index, suit in enumerate(SUITS)}
+RANK_COUNT = len(RANKS)
+SUIT_COUNT = len(SUITS)
+EVALUATED_CARD_COUNT = 7
+HAND_SIZE = 5
+
+# A hand value is its category followed by up to five 4-bit ranks, most significant first,
+# so a stronger hand always has a larger value and equal hands have equal values
+RANK_BITS = 4
+CATEGORY_SHIFT = RANK_BITS * HAND_SIZE
+
+
+class HandCategory(IntEnum):
+    HIGH_CARD = 0
+    PAIR = 1
+    TWO_PAIR = 2
+    THREE_OF_A_KIND = 3
+    STRAIGHT = 4
+    FLUSH = 5
+    FULL_HOUSE = 6
+    FOUR_OF_A_KIND = 7
+    STRAIGHT_FLUSH = 8
+
+
+HAND_CATEGORY_TITLES: dict[HandCategory, str] = {
+    HandCategory.HIGH_CARD: "High Card",
+    HandCategory.PAIR: "Pair",
+    HandCategory.TWO_PAIR: "Two Pair",
+    HandCategory.THREE_OF_A_KIND: "Three of a Kind",
+    HandCategory.STRAIGHT: "Straight",
+    HandCategory.FLUSH: "Flush",
+    HandCategory.FULL_HOUSE: "Full House",
+    HandCategory.FOUR_OF_A_KIND: "Four of a Kind",
+    HandCategory.STRAIGHT_FLUSH: "Straight Flush",
+}
+# How many cards of each rank stored in a hand value make up the hand, straights store only their high card
+CATEGORY_RANK_REPEATS: dict[HandCategory, list[int]] = {
+    HandCategory.HIGH_CARD: [1, 1, 1, 1, 1],
+    HandCategory.PAIR: [2, 1, 1, 1],
+    HandCategory.TWO_PAIR: [2, 2, 1],
+    HandCategory.THREE_OF_A_KIND: [3, 1, 1],
+    HandCategory.FLUSH: [1, 1, 1, 1, 1],
+    HandCategory.FULL_HOUSE: [3, 2],
+    HandCategory.FOUR_OF_A_KIND: [4, 1],
+}
+ALL_RANKS_MASK = (1 << RANK_COUNT) - 1
+SUIT_MASK_BITS = 16
+WHEEL_HIGH_RANK = RANK_INDEXES[CardRank.FIVE]
+WHEEL_MASK = (1 << RANK_INDEXES[CardRank.ACE]) | ((1 << (WHEEL_HIGH_RANK + 1)) - 1)
+
+
+def _build_rank_mask_tables() -> tuple[NDArray[np.int32], NDArray[np.int32], NDArray[np.int32], NDArray[np.int32]]:
+    """
+    Build the tables indexed by a 13-bit mask of ranks that hands are evaluated with:
+    the packed k highest ranks and the mask of the k highest ranks for k up to 5,
+    the packed high card of the best straight (0 if there is none) and the number of ranks.
+    """
+    rank_masks = np.arange(ALL_RANKS_MASK + 1, dtype=np.int32)
+    rank_counts = ((rank_masks[:, None] >> np.arange(RANK_COUNT)) & 1).sum(axis=1).astype(np.int32)
+    # The k highest ranks of a mask are its highest rank followed by the k - 1 highest ranks of the rest
+    high_ranks = np.floor(np.log2(np.maximum(rank_masks, 1))).astype(np.int32)
+    high_rank_bits = np.where(rank_masks > 0, np.left_shift(1, high_ranks), 0).astype(np.int32)
+    rest_masks = rank_masks ^ high_rank_bits
+    packed_high_ranks = np.where(rank_masks > 0, high_ranks << (RANK_BITS * (HAND_SIZE - 1)), 0)
+    top_ranks = np.zeros((HAND_SIZE + 1, len(rank_masks)), dtype=np.int32)
+    top_rank_masks = np.zeros_like(top_ranks)
+    for count in range(1, HAND_SIZE + 1):
+        top_ranks[count] = packed_high_ranks | top_ranks[count - 1][rest_masks] >> RANK_BITS
+        top_rank_masks[count] = high_rank_bits | top_rank_masks[count - 1][rest_masks]
+
+    # Higher straights are checked last so they take precedence
+    straight_ranks = np.where(
+        rank_masks & WHEEL_MASK == WHEEL_MASK, WHEEL_HIGH_RANK << (RANK_BITS * (HAND_SIZE - 1)), 0
+    )
+    for high_rank in range(WHEEL_HIGH_RANK + 1, RANK_COUNT):
+        window = 0b11111 << (high_rank - HAND_SIZE + 1)
+        straight_ranks = np.where(
+            rank_masks & window == window, high_rank << (RANK_BITS * (HAND_SIZE - 1)), straight_ranks
+        )
+    return top_ranks, top_rank_masks, straight_ranks.astype(np.int32), rank_counts
+
+
+TOP_RANKS, TOP_RANK_MASKS, STRAIGHT_RANKS, RANK_COUNTS = _build_rank_mask_tables()
+
+
+def encode_card(card: Card) -> int:
+    return RANK_INDEXES[card.rank] * SUIT_COUNT + SUIT_INDEXES[card.suit]
+
+
+def encode_cards(cards: Sequence[Card]) -> list[int]:
+    return [encode_card(card) for card in cards]
+
+
+def evaluate_hands(cards: ArrayLike) -> NDArray[np.int32]:
+    """
+    Evaluate the best five card hand of many 7-card hands at once. Each hand is reduced to bit masks of the
+    ranks seen at least once, twice, three and four times and of the ranks of each suit, which index
+    precomputed rank tables, so there is no per-hand Python code and no sorting.
+
+    Args:
+        cards: (hands, 7) array of encoded cards, see encode_card. The cards of a hand must be distinct.
+
+    Returns:
+        The value of each hand, a larger value beats a smaller one, see get_hand_category and get_hand_ranks
+
+    Raises:
+        ValueError: If the array is not (hands, 7) or holds codes that are not cards
+    """
+    card_codes = np.asarray(cards, dtype=np.int32)
+    if card_codes.shape[1:] != (EVALUATED_CARD_COUNT,):
+        raise ValueError(f"Expected an array of {EVALUATED_CARD_COUNT}-card hands, got shape {card_codes.shape}")
+    if card_codes.size and (card_codes.min() < 0 or card_codes.max() >= RANK_COUNT * SUIT_COUNT):
+        raise ValueError("Card codes must be between 0 and 51")
+
+    # One column per card, so each step below is a single pass over contiguous memory
+    card_columns = np.ascontiguousarray(card_codes.T)
+    ranks = card_columns // SUIT_COUNT
+    rank_bits = np.left_shift(1, ranks, dtype=np.int32)
+    # The ranks of each suit, in 16 bits per suit
+    suit_rank_bits = np.left_shift(1, ranks + SUIT_MASK_BITS * (card_columns % SUIT_COUNT), dtype=np.int64)
+    # Cards are distinct, so a rank seen again moves up to the next count
+    seen_once = np.zeros(len(card_codes), dtype=np.int32)
+    seen_twice = np.zeros_like(seen_once)
+    seen_thrice = np.zeros_like(seen_once)
+    seen_four_times = np.zeros_like(seen_once)
+    for column in rank_bits:
+        seen_four_times |= seen_thrice & column
+        seen_thrice |= seen_twice & column
+        seen_twice |= seen_once & column
+        seen_once |= column
+    suit_masks = np.bitwise_or.reduce(suit_rank_bits, axis=0)
+
+    # Seven cards hold at most one suit with five or more cards
+    flush_mask = np.zeros_like(seen_once)
+    for suit in range(SUIT_COUNT):
+        suit_mask = (suit_masks >> (SUIT_MASK_BITS * suit)).astype(np.int32) & ALL_RANKS_MASK
+        flush_mask = np.where(RANK_COUNTS[suit_mask] >= HAND_SIZE, suit_mask, flush_mask)
+
+    straight_flush_ranks = STRAIGHT_RANKS[flush_mask]
+    straight_ranks = STRAIGHT_RANKS[seen_once]
+    # A second set of trips plays as the pair of a full house
+    full_house_pairs = seen_twice & ~TOP_RANK_MASKS[1, seen_thrice]
+    categories = [
+        (straight_flush_ranks != 0, HandCategory.STRAIGHT_FLUSH, straight_flush_ranks),
+        (
+            seen_four_times != 0,
+            HandCategory.FOUR_OF_A_KIND,
+            TOP_RANKS[1, seen_four_times] | TOP_RANKS[1, seen_once & ~seen_four_times] >> RANK_BITS,
+        ),
+        (
+            (seen_thrice != 0) & (full_house_pairs != 0),
+            HandCategory.FULL_HOUSE,
+            TOP_RANKS[1, seen_thrice] | TOP_RANKS[1, full_house_pairs] >> RANK_BITS,
+        ),
+        (flush_mask != 0, HandCategory.FLUSH, TOP_RANKS[HAND_SIZE, flush_mask]),
+        (straight_ranks != 0, HandCategory.STRAIGHT, straight_ranks),
+        (
+            seen_thrice != 0,
+            HandCategory.THREE_OF_A_KIND,
+            TOP_RANKS[1, seen_thrice] | TOP_RANKS[2, seen_once & ~seen_thrice] >> RANK_BITS,
+        ),
+        (
+            # A pair beside the highest one
+            (seen_twice & ~TOP_RANK_MASKS[1, seen_twice]) != 0,
+            HandCategory.TWO_PAIR,
+            TOP_RANKS[2, seen_twice] | TOP_RANKS[1, seen_once & ~TOP_RANK_MASKS[2, seen_twice]] >> (2 * RANK_BITS),
+        ),
+        (
+            seen_twice != 0,
+            HandCategory.PAIR,
+            TOP_RANKS[1, seen_twice] | TOP_RANKS[3, seen_once & ~seen_twice] >> RANK_BITS,
+        ),
+    ]
+    return np.select(
+        [condition for condition, _, _ in categories],
+        [(category << CATEGORY_SHIFT) | ranks for _, category, ranks in categories],
+        default=(HandCategory.HIGH_CARD << CATEGORY_SHIFT) | TOP_RANKS[HAND_SIZE, seen_once],
+    ).astype(np.int32)
+
+
+def evaluate_cards(cards: Sequence[Card]) -> int:
+    """Evaluate the best five card hand of 7 cards, see evaluate_hands to evaluate many hands at once."""
+    return int(evaluate_hands([encode_cards(cards)])[0])
+
+
+def get_hand_category(hand_value: int) -> HandCategory:
+    return HandCategory(hand_value >> CATEGORY_SHIFT)
+
+
+def get_hand_ranks(hand_value: int) -> list[CardRank]:
+    """Get the ranks of the five cards of an evaluated hand, e.g. K K K 7 7 for a full house."""
+    category = get_hand_category(hand_value)
+    ranks = [hand_value >> (RANK_BITS * (HAND_SIZE - 1 - position)) & 0b1111 for position in range(HAND_SIZE)]
+    if category in (HandCategory.STRAIGHT, HandCategory.STRAIGHT_FLUSH):
+        # The wheel's five high straight wraps around to the ace
+        return [RANKS[rank % RANK_COUNT] for rank in range(ranks[0], ranks[0] - HAND_SIZE, -1)]
+    repeats = CATEGORY_RANK_REPEATS[category]
+    return [RANKS[rank] for rank, repeat in zip(ranks, repeats, strict=False) for _ in range(repeat)]
+
+
+def describe_hand_value(hand_value: int) -> str:
+    ranks = " ".join(rank.value for rank in get_hand_ranks(hand_value))
+    return f"{HAND_CATEGORY_TITLES[get_hand_category(hand_value)]} ({ranks})"
@@ -0,0 +1,323 @@
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from typing import ClassVar
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.dataingestion.columnar_hand_store import (
+    BOARD_ACTION_STREETS,
+    NO_PLAYER,
+    PLAYER_ACTION_CODES,
+    PREFLOP_STREET,
+    ColumnarPokerLog,
+)
+from src.dataingestion.poker_hand_parser import get_registered_player_nickname_from_session_nickname_or_id
+from src.dataingestion.schemas.board_move import BoardMove
+from src.dataingestion.schemas.player_action import PlayerAction
+from src.dataingestion.schemas.poker_hand import PokerHand
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+
+# Bump whenever a counter's rules change, memoized stats of other versions are recalculated
+HAND_STATS_VERSION = 1
+# Columns of the columnar hand store that hands are replayed from
+HAND_STATS_ACTION_COLUMNS = ["hand_index", "street", "player_index", "action_code"]
+PLAYER_ACTIONS_BY_CODE: dict[int, PlayerAction] = {code: action for action, code in PLAYER_ACTION_CODES.items()}
+
+VOLUNTARY_ACTIONS = frozenset({PlayerAction.BET, PlayerAction.CALL, PlayerAction.RAISE})
+AGGRESSIVE_ACTIONS = frozenset({PlayerAction.BET, PlayerAction.RAISE})
+# Actions a player chooses when it is their turn, as opposed to blinds, shows, collects and returned bets
+DECISION_ACTIONS = frozenset(
+    {PlayerAction.FOLD, PlayerAction.CHECK, PlayerAction.CALL, PlayerAction.BET, PlayerAction.RAISE}
+)
+
+
+class HandState:
+    """Where a hand stands while its moves are replayed in order, shared by every counter."""
+
+    def __init__(self) -> None:
+        self.street = PREFLOP_STREET
+        # Preflop bets and raises so far, blinds are not raises
+        self.preflop_raises = 0
+        self.preflop_raiser_id: str | None = None
+        # Players who have acted and not folded
+        self.active_player_ids: set[str] = set()
+        self.folded_player_ids: set[str] = set()
+        # Players still in the hand when the first flop was dealt
+        self.saw_flop_player_ids: set[str] = set()
+        # Player IDs the hand counts for, one per registered nickname, known once the hand ends
+        self.participant_ids: set[str] = set()
+
+    def start_street(self, street: int) -> None:
+        if self.street == PREFLOP_STREET and street != PREFLOP_STREET:
+            self.saw_flop_player_ids = set(self.active_player_ids)
+        self.street = street
+
+    def apply_move(self, player_id: str, action: PlayerAction) -> None:
+        if action == PlayerAction.FOLD:
+            self.active_player_ids.discard(player_id)
+            self.folded_player_ids.add(player_id)
+        elif player_id not in self.folded_player_ids:
+            self.active_player_ids.add(player_id)
+        if self.street == PREFLOP_STREET and action in AGGRESSIVE_ACTIONS:
+            self.preflop_raises += 1
+            self.preflop_raiser_id = player_id
+
+
+class HandStatCounter:
+    """
+    Counts one stat per player ID while hands are replayed. A stat is its hits over its chances,
+    e.g. VPIP is hands voluntarily played over hands dealt. Subclasses override the hooks they need.
+    """
+
+    name: ClassVar[str]
+    title: ClassVar[str]
+    # Percentages are shown with one decimal, ratios such as the aggression factor with two
+    is_percentage: ClassVar[bool] = True
+
+    def __init__(self) -> None:
+        self.hits: dict[str, int] = {}
+        self.chances: dict[str, int] = {}
+
+    @staticmethod
+    def _count(counts: dict[str, int], player_ids: Iterable[str]) -> None:
+        for player_id in player_ids:
+            counts[player_id] = counts.get(player_id, 0) + 1
+
+    def start_hand(self, state: HandState) -> None:
+        """Called before a hand's first move."""
+
+    def on_move(self, state: HandState, player_id: str, action: PlayerAction) -> None:
+        """Called for each player move, before the hand state takes it into account."""
+
+    def end_hand(self, state: HandState) -> None:
+        """Called after a hand's last move, once its participants are known."""
+
+    def summarize_by_nickname(self, nickname_to_ids: Mapping[str, Collection[str]]) -> dict[str, float]:
+        """Sum the counts up to registered nicknames, leaving out players who never had a chance."""
+        values: dict[str, float] = {}
+        for nickname, player_ids in nickname_to_ids.items():
+            hits = sum(self.hits.get(player_id, 0) for player_id in player_ids)
+            chances = sum(self.chances.get(player_id, 0) for player_id in player_ids)
+            if chances > 0:
+                values[nickname] = round(hits / chances * 100, 1) if self.is_percentage else round(hits / chances, 2)
+        return values
+
+
+class PreflopActionCounter(HandStatCounter):
+    """Counts the hands each player made any of a set of preflop actions in, out of the hands they were dealt."""
+
+    actions: ClassVar[frozenset[PlayerAction]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._hand_hits: set[str] = set()
+
+    def start_hand(self, state: HandState) -> None:
+        self._hand_hits = set()
+
+    def on_move(self, state: HandState, player_id: str, action: PlayerAction) -> None:
+        if state.street == PREFLOP_STREET and action in self.actions:
+            self._hand_hits.add(player_id)
+
+    def end_hand(self, state: HandState) -> None:
+        self._count(self.chances, state.participant_ids)
+        self._count(self.hits, self._hand_hits)
+
+
+class VpipCounter(PreflopActionCounter):
+    """Voluntarily put money in pot: any preflop bet, call or raise, blind posts are not voluntary."""
+
+    name = "vpip"
+    title = "VPIP %"
+    actions = VOLUNTARY_ACTIONS
+
+
+class PfrCounter(PreflopActionCounter):
+    """Preflop raise: any preflop bet or raise."""
+
+    name = "pfr"
+    title = "PFR %"
+    actions = AGGRESSIVE_ACTIONS
+
+
+class ThreeBetCounter(HandStatCounter):
+    """Re-raises out of the hands where a player faced a single preflop raise."""
+
+    name = "three_bet"
+    title = "3-Bet %"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._hand_chances: set[str] = set()
+
+    def start_hand(self, state: HandState) -> None:
+        self._hand_chances = set()
+
+    def on_move(self, state: HandState, player_id: str, action: PlayerAction) -> None:
+        if (
+            state.street != PREFLOP_STREET
+            or state.preflop_raises != 1
+            or action not in DECISION_ACTIONS
+            or player_id == state.preflop_raiser_id
+            or player_id in self._hand_chances
+        ):
+            return
+        self._hand_chances.add(player_id)
+        self._count(self.chances, [player_id])
+        if action in AGGRESSIVE_ACTIONS:
+            self._count(self.hits, [player_id])
+
+
+class AggressionFactorCounter(HandStatCounter):
+    """Postflop bets and raises over postflop calls. Players who never called postflop are left out."""
+
+    name = "aggression_factor"
+    title = "AF"
+    is_percentage = False
+
+    def on_move(self, state: HandState, player_id: str, action: PlayerAction) -> None:
+        if state.street == PREFLOP_STREET:
+            return
+        if action in AGGRESSIVE_ACTIONS:
+            self._count(self.hits, [player_id])
+        elif action == PlayerAction.CALL:
+            self._count(self.chances, [player_id])
+
+
+class WentToShowdownCounter(HandStatCounter):
+    """Hands that reached a showdown out of the hands a player saw the flop in."""
+
+    name = "went_to_showdown"
+    title = "WTSD %"
+
+    def end_hand(self, state: HandState) -> None:
+        self._count(self.chances, state.saw_flop_player_ids)
+        showdown_player_ids = state.saw_flop_player_ids & state.active_player_ids
+        if len(showdown_player_ids) > 1:
+            self._count(self.hits, showdown_player_ids)
+
+
+DEFAULT_HAND_STAT_COUNTERS: tuple[type[HandStatCounter], ...] = (
+    VpipCounter,
+    PfrCounter,
+    ThreeBetCounter,
+    AggressionFactorCounter,
+    WentToShowdownCounter,
+)
+
+
+class HandStats(BaseModel):
+    hands_by_player: dict[str, int]
+    stat_titles: dict[str, str]  # Stat name to its chart title, in counter order
+    stats_by_name: dict[str, dict[str, float]]  # Stat name to its value by registered nickname
+
+
+class HandStatsEngine:
+    """
+    Replays each hand's moves once, street by street, updating every counter as it goes,
+    so adding a stat costs a hook call per move rather than another pass over the hands.
+    """
+
+    def __init__(self, counters: Sequence[HandStatCounter]) -> None:
+        self.counters = list(counters)
+        self.hands_by_player: dict[str, int] = {}
+        self.nickname_to_ids: dict[str, set[str]] = {}
+        self._state = HandState()
+
+    def start_hand(self) -> None:
+        self._state = HandState()
+        for counter in self.counters:
+            counter.start_hand(self._state)
+
+    def on_board_move(self, street: int) -> None:
+        self._state.start_street(street)
+
+    def on_player_move(self, player_id: str, action: PlayerAction) -> None:
+        for counter in self.counters:
+            counter.on_move(self._state, player_id, action)
+        self._state.apply_move(player_id, action)
+
+    def end_hand(self, participants: Mapping[str, str]) -> None:
+        """
+        Args:
+            participants: The player ID each registered nickname last acted under in the hand, see parse_poker_hand
+        """
+        self._state.participant_ids = set(participants.values())
+        for nickname, player_id in participants.items():
+            self.hands_by_player[nickname] = self.hands_by_player.get(nickname, 0) + 1
+            self.nickname_to_ids.setdefault(nickname, set()).add(player_id)
+        for counter in self.counters:
+            counter.end_hand(self._state)
+
+    def add_hands(self, hands: Iterable[PokerHand]) -> None:
+        """Replay parsed hands."""
+        for hand in hands:
+            self.start_hand()
+            for move in hand.actions_in_chronological_order:
+                if isinstance(move, BoardMove):
+                    self.on_board_move(BOARD_ACTION_STREETS[move.action])
+                else:
+                    self.on_player_move(move.player_id, move.action)
+            self.end_hand(hand.player_registered_nicknames_to_id)
+
+    def add_columnar_log(self, log: ColumnarPokerLog, registered_players: list[RegisteredPlayer]) -> None:
+        """Replay the hands of a columnar log opened with at least HAND_STATS_ACTION_COLUMNS."""
+        row_nicknames = [
+            get_registered_player_nickname_from_session_nickname_or_id(nickname, player_id, registered_players)
+            for player_id, nickname in zip(log.player_ids, log.player_nicknames, strict=True)
+        ]
+        hand_indexes: list[int] = np.asarray(log.actions["hand_index"], dtype=np.int32).tolist()
+        streets: list[int] = np.asarray(log.actions["street"], dtype=np.int8).tolist()
+        player_indexes: list[int] = np.asarray(log.actions["player_index"], dtype=np.int32).tolist()
+        action_codes: list[int] = np.asarray(log.actions["action_code"], dtype=np.int8).tolist()
+
+        current_hand_index: int | None = None
+        participants: dict[str, str] = {}
+        for hand_index, street, player_index, action_code in zip(
+            hand_indexes, streets, player_indexes, action_codes, strict=True
+        ):
+            if hand_index != current_hand_index:
+                if current_hand_index is not None:
+                    self.end_hand(participants)
+                self.start_hand()
+                current_hand_index = hand_index
+                participants = {}
+            if player_index == NO_PLAYER:
+                self.on_board_move(street)
+            else:
+                player_id = log.player_ids[player_index]
+                participants[row_nicknames[player_index]] = player_id
+                self.on_player_move(player_id, PLAYER_ACTIONS_BY_CODE[action_code])
+        if current_hand_index is not None:
+            self.end_hand(participants)
+
+    def summarize(self) -> HandStats:
+        return HandStats(
+            hands_by_player=self.hands_by_player,
+            stat_titles={counter.name: counter.title for counter in self.counters},
+            stats_by_name={
+                counter.name: counter.summarize_by_nickname(self.nickname_to_ids) for counter in self.counters
+            },
+        )
+
+
+def calculate_hand_stats_from_columnar_logs(
+    logs: Sequence[ColumnarPokerLog],
+    registered_players: list[RegisteredPlayer],
+    counter_types: Sequence[type[HandStatCounter]] = DEFAULT_HAND_STAT_COUNTERS,
+) -> HandStats:
+    """
+    Calculate several stats for each player across columnar logs in a single pass over their actions.
+
+    Args:
+        logs: Columnar logs to analyze, opened with at least HAND_STATS_ACTION_COLUMNS
+        registered_players: Registered players to attribute player IDs and nicknames to
+        counter_types: Stats to calculate
+
+    Returns:
+        Hands played and each stat's values by registered nickname
+    """
+    engine = HandStatsEngine([counter_type() for counter_type in counter_types])
+    for log in logs:
+        engine.add_columnar_log(log, registered_players)
+    return engine.summarize()
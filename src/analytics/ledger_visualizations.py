@@ -4,48 +4,26 @@ from logging import getLogger
 import pandas as pd
 import plotly.express as px
 
-from src.dataingestion.ledger_session_helpers import (
-    consolidate_sessions_with_player_mapping_details,
-    load_all_ledger_sessions,
-)
-from src.dataingestion.registered_player_helpers import load_registered_players
-from src.dataingestion.schemas.consolidated_session import ConsolidatedPlayerSession
-from src.dataingestion.schemas.player_session_log import PlayerSessionLog
 from src.dataingestion.schemas.registered_player import RegisteredPlayer
-from src.discordbot.services.s3_service import S3Service
 
 logger = getLogger(__name__)
 
 
-async def load_sessions_and_registered_players(
-    guild_id: str, s3_service: S3Service
-) -> tuple[list[PlayerSessionLog], list[RegisteredPlayer]]:
-    sessions = await load_all_ledger_sessions(guild_id, s3_service)
-    logger.info(f"Loaded {len(sessions)} player ledger sessions")
-
-    registered_players = await load_registered_players(guild_id, s3_service)
-    logger.info(f"Loaded {len(registered_players)} registered players")
-
-    return sessions, registered_players
-
-
-async def fetch_consolidated_sessions_and_registered_players(
-    guild_id: str, s3_service: S3Service
-) -> tuple[list[ConsolidatedPlayerSession], list[RegisteredPlayer]]:
-    sessions, registered_players = await load_sessions_and_registered_players(guild_id, s3_service)
-    consolidated_sessions = consolidate_sessions_with_player_mapping_details(sessions, registered_players)
-    return consolidated_sessions, registered_players
+def _sum_by_player(sessions_df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """Sum session columns per player, players in order of their first session."""
+    sessions_by_player = sessions_df.groupby("player", sort=False)
+    return pd.DataFrame({column: sessions_by_player[column].sum() for column in columns})
 
 
 def get_file_object_of_player_played_time_totals(
-    consolidated_sessions: list[ConsolidatedPlayerSession],
+    sessions_df: pd.DataFrame,
     registered_players: list[RegisteredPlayer],
 ) -> BytesIO:
     """
     Creates a bar chart showing total time played for each player.
 
     Args:
-        consolidated_sessions: List of consolidated player sessions
+        sessions_df: Consolidated sessions frame, see build_consolidated_sessions_frame
         registered_players: List of registered players
 
     Returns:
@@ -53,20 +31,14 @@ def get_file_object_of_player_played_time_totals(
     """
 
     # Calculate total hours played per player
-    player_times = {}
-    for session in consolidated_sessions:
-        player = session.player_nickname_lowercase
-        if player not in player_times:
-            player_times[player] = 0
-        # Convert milliseconds to hours
-        player_times[player] += session.time_played_ms / (1000 * 60 * 60)
+    player_times = _sum_by_player(sessions_df, ["hours_played"])["hours_played"]
 
     # If no sessions, use registered player names with 0 hours
-    if not player_times:
-        player_times = {player.player_name_lowercase: 0 for player in registered_players}
+    if player_times.empty:
+        player_times = pd.Series(0.0, index=[player.player_name_lowercase for player in registered_players])
 
     # Convert to DataFrame and sort by total time
-    df = pd.DataFrame([{"player": player, "hours": hours} for player, hours in player_times.items()]).sort_values(
+    df = pd.DataFrame({"player": player_times.index, "hours": player_times.to_numpy()}).sort_values(
         "hours", ascending=True
     )
 
@@ -100,32 +72,25 @@ def get_file_object_of_player_played_time_totals(
 
 
 def get_file_object_of_player_nets_over_time(
-    consolidated_sessions: list[ConsolidatedPlayerSession],
+    sessions_df: pd.DataFrame,
     registered_players: list[RegisteredPlayer],
+    include_initial_details: bool = True,
 ) -> BytesIO:
-    # Convert sessions to DataFrame with mapped names
-    df = pd.DataFrame(
-        [
-            {
-                "player": session.player_nickname_lowercase,
-                "date": session.date,
-                "net": session.net_dollars,
-            }
-            for session in consolidated_sessions
-        ]
-    )
+    # Take the sessions' nets with mapped names
+    df = pd.DataFrame({"player": sessions_df["player"], "date": sessions_df["date"], "net": sessions_df["net_dollars"]})
 
     # Add starting data points
     starting_df = pd.DataFrame(
         [
-            {
-                "player": entry.player_name_lowercase,
-                "date": entry.initial_details.initial_date,
-                "net": entry.initial_details.initial_net_amount,
-            }
+            (
+                entry.player_name_lowercase,
+                pd.Timestamp(entry.initial_details.initial_date),
+                float(entry.initial_details.initial_net_amount),
+            )
             for entry in registered_players
-            if entry.initial_details is not None
-        ]
+            if entry.initial_details is not None and include_initial_details
+        ],
+        columns=["player", "date", "net"],
     )
     # Combine starting data with sessions
     df = pd.concat([starting_df, df])
@@ -181,41 +146,30 @@ def get_file_object_of_player_nets_over_time(
 
 
 def get_file_object_of_player_profit_per_hour(
-    consolidated_sessions: list[ConsolidatedPlayerSession],
+    sessions_df: pd.DataFrame,
     registered_players: list[RegisteredPlayer],
 ) -> BytesIO:
     """
     Creates a bar chart showing profit per hour for each player.
 
     Args:
-        consolidated_sessions: List of consolidated player sessions
+        sessions_df: Consolidated sessions frame, see build_consolidated_sessions_frame
         registered_players: List of registered players
 
     Returns:
         BytesIO object containing the rendered plot image
     """
     # Calculate profit per hour for each player
-    player_stats = {}
-    for session in consolidated_sessions:
-        player = session.player_nickname_lowercase
-        if player not in player_stats:
-            player_stats[player] = {"total_profit": 0, "total_hours": 0}
-
-        # Add profit and hours
-        player_stats[player]["total_profit"] += float(session.net_dollars)
-        player_stats[player]["total_hours"] += session.time_played_ms / (1000 * 60 * 60)  # Convert ms to hours
+    player_stats = _sum_by_player(sessions_df, ["net_dollars", "hours_played"])
 
     # If we have stats, calculate hourly rate and create DataFrame
-    if player_stats:
-        df = pd.DataFrame(
-            [
-                {
-                    "player": player,
-                    "profit_per_hour": stats["total_profit"] / stats["total_hours"] if stats["total_hours"] > 0 else 0,
-                }
-                for player, stats in player_stats.items()
-            ]
-        ).sort_values("profit_per_hour", ascending=True)
+    if not player_stats.empty:
+        profit_per_hour = (player_stats["net_dollars"] / player_stats["hours_played"]).where(
+            player_stats["hours_played"] > 0, 0.0
+        )
+        df = pd.DataFrame({"player": profit_per_hour.index, "profit_per_hour": profit_per_hour.to_numpy()}).sort_values(
+            "profit_per_hour", ascending=True
+        )
     else:
         # If no stats, use registered players with 0 profit/hour
         df = pd.DataFrame(
@@ -251,49 +205,37 @@ def get_file_object_of_player_profit_per_hour(
 
 
 def get_file_object_of_buy_in_analysis(
-    consolidated_sessions: list[ConsolidatedPlayerSession],
+    sessions_df: pd.DataFrame,
 ) -> BytesIO:
     """
     Creates a scatter plot showing the relationship between buy-in amounts and final results.
     Also includes a trend line and correlation analysis.
 
     Args:
-        consolidated_sessions: List of consolidated player sessions
+        sessions_df: Consolidated sessions frame, see build_consolidated_sessions_frame
 
     Returns:
         BytesIO object containing the rendered plot image
     """
-    # Extract buy-in and net result data, calculating averages per player
-    player_stats = {}
-    for session in consolidated_sessions:
-        player = session.player_nickname_lowercase
-        if player not in player_stats:
-            player_stats[player] = {"total_buy_in": 0, "total_net": 0, "session_count": 0, "dates": []}
-
-        player_stats[player]["total_buy_in"] += float(session.buy_in_dollars)
-        player_stats[player]["total_net"] += float(session.net_dollars)
-        player_stats[player]["session_count"] += 1
-        player_stats[player]["dates"].append(session.date)
-
-    # Calculate averages and create data points
-    data = []
-    for player, stats in player_stats.items():
-        avg_buy_in = stats["total_buy_in"] / stats["session_count"]
-        avg_net = stats["total_net"] / stats["session_count"]
-        roi = stats["total_net"] / stats["total_buy_in"] if stats["total_buy_in"] != 0 else 0
-        data.append(
-            {
-                "player": player,
-                "avg_buy_in": avg_buy_in,
-                "avg_net_profit": avg_net,
-                "roi": roi,
-                "session_count": stats["session_count"],
-                "date_range": f"{min(stats['dates'])} to {max(stats['dates'])}",
-            }
+    # Aggregate buy-in and net result data per player
+    df = (
+        sessions_df.groupby("player", sort=False)
+        .agg(
+            total_buy_in=("buy_in_dollars", "sum"),
+            total_net=("net_dollars", "sum"),
+            avg_buy_in=("buy_in_dollars", "mean"),
+            avg_net_profit=("net_dollars", "mean"),
+            session_count=("net_dollars", "size"),
+            first_date=("date", "min"),
+            last_date=("date", "max"),
         )
+        .reset_index()
+    )
+    df["roi"] = (df["total_net"] / df["total_buy_in"]).where(df["total_buy_in"] != 0, 0.0)
+    df["date_range"] = df["first_date"].dt.strftime("%Y-%m-%d") + " to " + df["last_date"].dt.strftime("%Y-%m-%d")
 
     # If no valid data, return an empty plot with a message
-    if not data:
+    if df.empty:
         fig = px.scatter(
             title="Buy-In Analysis (No Data Available)",
         )
@@ -303,9 +245,6 @@ def get_file_object_of_buy_in_analysis(
         buffer.seek(0)
         return buffer
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-
     # Create scatter plot
     fig = px.scatter(
         df,
@@ -1,8 +1,13 @@
 from typing import Dict, List, Set, Mapping, Collection, Sequence
 
+import numpy as np
+
+from src.analytics.hand_stats import HandStatsEngine, VpipCounter
+from src.dataingestion.columnar_hand_store import PLAYER_ACTION_CODES, PREFLOP_STREET, ColumnarPokerLog
+from src.dataingestion.poker_hand_parser import get_registered_player_nickname_from_session_nickname_or_id
 from src.dataingestion.schemas.poker_log import PokerLog
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
 from src.dataingestion.schemas.poker_hand import PokerHand
-from src.dataingestion.schemas.player_move import PlayerMove
 from src.dataingestion.schemas.player_action import PlayerAction
 
 
@@ -17,39 +22,18 @@ def _calculate_vpip_stats(hands: Sequence[PokerHand], player_mapping: Mapping[st
     Returns:
         Tuple of (vpip percentages, total hands, vpip hands) dictionaries
     """
-    # Track hands played and vpip hands for each player
-    total_hands: Dict[str, int] = {}  # player_id -> total hands played
-    vpip_hands: Dict[str, int] = {}   # player_id -> hands where player put money in voluntarily
-    
-    for hand in hands:
-        # Get all players in the hand
-        player_ids_in_hand = set(hand.player_registered_nicknames_to_id.values())
-        
-        # Update total hands for each player
-        for player_id in player_ids_in_hand:
-            total_hands[player_id] = total_hands.get(player_id, 0) + 1
-            
-        # Track if each player has VPIPed this hand
-        has_vpiped = set()
-        
-        # Look at preflop actions
-        for action in hand.actions_in_chronological_order:
-            # Stop when we hit the flop
-            if not hasattr(action, 'player_nickname'):
-                break
-                
-            # Skip blind posts since they're not voluntary
-            if action.action == PlayerAction.POST:
-                continue
-                
-            # Any bet/call/raise preflop counts as VPIP
-            if isinstance(action, PlayerMove) and action.action in [PlayerAction.BET, PlayerAction.CALL, PlayerAction.RAISE]:
-                has_vpiped.add(action.player_id)
-                
-        # Update VPIP counts
-        for player_id in has_vpiped:
-            vpip_hands[player_id] = vpip_hands.get(player_id, 0) + 1
+    # Any preflop bet, call or raise counts as VPIP, blind posts are not voluntary
+    vpip_counter = VpipCounter()
+    engine = HandStatsEngine([vpip_counter])
+    engine.add_hands(hands)
+
+    return _summarize_vpip_by_nickname(vpip_counter.chances, vpip_counter.hits, player_mapping)
 
+
+def _summarize_vpip_by_nickname(
+    total_hands: Mapping[str, int], vpip_hands: Mapping[str, int], player_mapping: Mapping[str, Collection[str]]
+) -> tuple[dict[str, float], dict[str, int], dict[str, int]]:
+    """Sum per player ID hand counts up to registered nicknames. Returns (vpip percentages, total hands, vpip hands)."""
     # Sum up stats for each registered nickname
     nickname_total_hands = {}
     nickname_vpip_hands = {}
@@ -107,3 +91,95 @@ def calculate_vpip_by_player(log: PokerLog) -> dict[str, float]:
     # Calculate VPIP stats using the helper function
     vpip_percentages, _, _ = _calculate_vpip_stats(log.hands, log.registered_player_to_ids)
     return vpip_percentages
+
+
+# Columns of the columnar hand store that VPIP is calculated from
+VPIP_ACTION_COLUMNS = ["hand_index", "street", "player_index", "action_code"]
+VPIP_ACTION_CODES = [PLAYER_ACTION_CODES[action] for action in (PlayerAction.BET, PlayerAction.CALL, PlayerAction.RAISE)]
+
+
+def _count_columnar_vpip_hands(
+    log: ColumnarPokerLog, registered_players: list[RegisteredPlayer]
+) -> tuple[dict[str, int], dict[str, int], dict[str, set[str]]]:
+    """
+    Count the hands each player ID played and voluntarily put money in, with the same rules as _calculate_vpip_stats.
+
+    Returns:
+        Tuple of (total hands, vpip hands) by player ID and the registered nickname to player IDs mapping
+    """
+    player_ids = list(dict.fromkeys(log.player_ids))
+    if not player_ids:
+        return {}, {}, {}
+    nicknames = [
+        get_registered_player_nickname_from_session_nickname_or_id(nickname, player_id, registered_players)
+        for player_id, nickname in zip(log.player_ids, log.player_nicknames, strict=True)
+    ]
+    unique_nicknames = list(dict.fromkeys(nicknames))
+    player_id_indexes = {player_id: index for index, player_id in enumerate(player_ids)}
+    nickname_indexes = {nickname: index for index, nickname in enumerate(unique_nicknames)}
+    # The store has a player row per (ID, nickname) pair, these map each row to its ID and registered nickname
+    row_player_ids = np.array([player_id_indexes[player_id] for player_id in log.player_ids], dtype=np.int64)
+    row_nicknames = np.array([nickname_indexes[nickname] for nickname in nicknames], dtype=np.int64)
+
+    # Typed views of the stored columns, no copies are made as the dtypes already match
+    player_index = np.asarray(log.actions["player_index"], dtype=np.int32)
+    street = np.asarray(log.actions["street"], dtype=np.int8)
+    action_code = np.asarray(log.actions["action_code"], dtype=np.int8)
+    is_player_move = player_index >= 0
+    hands = np.asarray(log.actions["hand_index"], dtype=np.int32)[is_player_move].astype(np.int64)
+    move_player_rows = player_index[is_player_move]
+    move_player_ids = row_player_ids[move_player_rows]
+    move_nicknames = row_nicknames[move_player_rows]
+
+    # A hand's players are the last player ID acting under each registered nickname, see parse_poker_hand
+    hand_nickname_keys = hands * len(unique_nicknames) + move_nicknames
+    _, last_from_end = np.unique(hand_nickname_keys[::-1], return_index=True)
+    last_moves = len(hand_nickname_keys) - 1 - last_from_end
+    hand_player_keys = np.unique(hands[last_moves] * len(player_ids) + move_player_ids[last_moves])
+    total_hands = np.bincount(hand_player_keys % len(player_ids), minlength=len(player_ids))
+
+    # Any preflop bet, call or raise counts as VPIP, blind posts are not voluntary
+    is_vpip = (street[is_player_move] == PREFLOP_STREET) & np.isin(action_code[is_player_move], VPIP_ACTION_CODES)
+    vpip_keys = np.unique(hands[is_vpip] * len(player_ids) + move_player_ids[is_vpip])
+    vpip_hands = np.bincount(vpip_keys % len(player_ids), minlength=len(player_ids))
+
+    nickname_to_ids: dict[str, set[str]] = {}
+    last_move_nicknames: list[int] = move_nicknames[last_moves].tolist()
+    last_move_player_ids: list[int] = move_player_ids[last_moves].tolist()
+    for nickname_index, player_id_index in zip(last_move_nicknames, last_move_player_ids, strict=True):
+        nickname_to_ids.setdefault(unique_nicknames[nickname_index], set()).add(player_ids[player_id_index])
+
+    return (
+        {player_id: int(count) for player_id, count in zip(player_ids, total_hands, strict=True)},
+        {player_id: int(count) for player_id, count in zip(player_ids, vpip_hands, strict=True)},
+        nickname_to_ids,
+    )
+
+
+def calculate_vpip_stats_from_columnar_logs(
+    logs: Sequence[ColumnarPokerLog], registered_players: list[RegisteredPlayer]
+) -> tuple[dict[str, float], dict[str, int], dict[str, int]]:
+    """
+    Calculate VPIP statistics across columnar logs, vectorized over their action columns.
+    Gives the same results as _calculate_vpip_stats on the parsed logs, reading only VPIP_ACTION_COLUMNS.
+
+    Args:
+        logs: Columnar logs to analyze, opened with at least VPIP_ACTION_COLUMNS
+        registered_players: Registered players to attribute player IDs and nicknames to
+
+    Returns:
+        Tuple of (vpip percentages, total hands, vpip hands) dictionaries by registered nickname
+    """
+    total_hands: dict[str, int] = {}
+    vpip_hands: dict[str, int] = {}
+    nickname_to_ids: dict[str, set[str]] = {}
+    for log in logs:
+        log_total_hands, log_vpip_hands, log_nickname_to_ids = _count_columnar_vpip_hands(log, registered_players)
+        for player_id, count in log_total_hands.items():
+            total_hands[player_id] = total_hands.get(player_id, 0) + count
+        for player_id, count in log_vpip_hands.items():
+            vpip_hands[player_id] = vpip_hands.get(player_id, 0) + count
+        for nickname, player_ids in log_nickname_to_ids.items():
+            nickname_to_ids.setdefault(nickname, set()).update(player_ids)
+
+    return _summarize_vpip_by_nickname(total_hands, vpip_hands, nickname_to_ids)
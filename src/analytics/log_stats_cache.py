@@ -0,0 +1,82 @@
+import os
+from datetime import date
+from logging import getLogger
+from pathlib import Path
+
+from src.analytics.hand_stats import (
+    HAND_STATS_ACTION_COLUMNS,
+    HAND_STATS_VERSION,
+    HandStats,
+    calculate_hand_stats_from_columnar_logs,
+)
+from src.dataingestion.columnar_hand_store import get_stored_entry_directory, open_columnar_log
+from src.dataingestion.registered_player_helpers import fingerprint_registered_players
+from src.dataingestion.schemas.file_manifest import ManifestEntry
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+
+logger = getLogger(__name__)
+
+
+def get_log_stats_path(log_directory: Path, players_fingerprint: str) -> Path:
+    """
+    Get the path a log's stats are memoized at, next to its stored columns so they are removed with them.
+    Stats depend on the engine's rules and on which player IDs each registered nickname covers.
+    """
+    return log_directory / f"stats_v{HAND_STATS_VERSION}_{players_fingerprint[:16]}.json"
+
+
+def _write_log_stats(path: Path, stats: HandStats) -> None:
+    # Stats of older engine versions or registered players can never be served again
+    for stale_path in path.parent.glob("stats_*.json"):
+        stale_path.unlink(missing_ok=True)
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(stats.model_dump_json())
+    os.replace(temporary_path, path)
+
+
+def get_session_hand_stats(
+    guild_id: str, entries: list[ManifestEntry], registered_players: list[RegisteredPlayer]
+) -> list[tuple[date, HandStats]]:
+    """
+    Get the hand stats of each stored log file on its own, calculating them only for logs that have none memoized.
+    A log's stats never change, so they are kept on disk and survive restarts.
+
+    Args:
+        guild_id: Discord guild ID the logs belong to
+        entries: Manifest entries of log files in the columnar store, see load_stored_poker_log_entries
+        registered_players: Registered players to attribute player IDs and nicknames to
+
+    Returns:
+        (session date, stats) of each log, in the order of the entries
+    """
+    players_fingerprint = fingerprint_registered_players(registered_players)
+    all_stats: list[tuple[date, HandStats]] = []
+    calculated = 0
+    for entry in entries:
+        directory = get_stored_entry_directory(guild_id, entry)
+        if directory is None or entry.summary is None or entry.summary.session_date is None:
+            raise ValueError(f"Poker log {entry.filename} is not stored")
+        session_date = entry.summary.session_date
+        path = get_log_stats_path(directory, players_fingerprint)
+        try:
+            all_stats.append((session_date, HandStats.model_validate_json(path.read_text())))
+            continue
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            # Unreadable or invalid stats, e.g. from a crash mid-write, are recalculated and written again
+            logger.warning(f"Recalculating invalid stats of poker log {entry.filename} for guild {guild_id}: {e}")
+
+        log = open_columnar_log(directory, [], HAND_STATS_ACTION_COLUMNS)
+        if log is None:
+            raise ValueError(f"Poker log {entry.filename} is not stored")
+        stats = calculate_hand_stats_from_columnar_logs([log], registered_players)
+        try:
+            _write_log_stats(path, stats)
+        except OSError as e:
+            logger.error(f"Error memoizing stats of poker log {entry.filename} for guild {guild_id}: {e}")
+        all_stats.append((session_date, stats))
+        calculated += 1
+
+    logger.info(f"Got stats of {len(entries)} poker logs for guild {guild_id}, {calculated} calculated")
+    return all_stats
@@ -1,29 +1,27 @@
+from datetime import date
 from io import BytesIO
 from logging import getLogger
-from typing import List
 import pandas as pd
 
 import plotly.express as px
+import plotly.graph_objects as go
 
-from src.analytics.log_analytics import calculate_vpip_by_player_across_all_logs, calculate_vpip_by_player
-from src.dataingestion.schemas.poker_log import PokerLog
+from src.analytics.hand_evaluator import HAND_CATEGORY_TITLES
+from src.analytics.hand_stats import HandStats
+from src.analytics.showdown_analytics import ShowdownHand
 logger = getLogger(__name__)
 
 
-def get_file_object_of_total_vpip(logs: list[PokerLog]) -> BytesIO:
+def get_file_object_of_vpip_by_player(vpip_by_player: dict[str, float]) -> BytesIO:
     """
-    Creates a bar graph showing VPIP percentage for each player across all sessions.
+    Creates a bar graph of already calculated VPIP percentages.
     
     Args:
-        logs: List of poker logs to analyze
+        vpip_by_player: Dictionary mapping player nicknames to their VPIP percentage
         
     Returns:
         BytesIO buffer containing the graph image
     """
-    
-    # Get VPIP percentages
-    vpip_by_player = calculate_vpip_by_player_across_all_logs(logs)
-    
     # Sort by VPIP percentage ascending
     sorted_players = sorted(vpip_by_player.items(), key=lambda x: x[1], reverse=False)
     players = [p[0] for p in sorted_players]
@@ -53,34 +51,25 @@ def get_file_object_of_total_vpip(logs: list[PokerLog]) -> BytesIO:
     return buffer
 
 
-def get_file_object_of_vpip_over_time(logs: List[PokerLog], num_sessions: int) -> BytesIO:
+def get_file_object_of_vpip_by_session(
+    vpip_by_session: list[tuple[date, dict[str, float]]], num_sessions: int | None
+) -> BytesIO:
     """
-    Creates a scatter plot showing VPIP percentage for each player over time.
-    Each player is represented by a different color/marker in the legend.
+    Creates a scatter plot of already calculated VPIP percentages per session.
     
     Args:
-        logs: List of poker logs to analyze
-        num_sessions: Optional number of most recent sessions to include. If None, includes all sessions.
+        vpip_by_session: (session date, VPIP percentage by player nickname) for each session, oldest first
+        num_sessions: Number of most recent sessions requested, shown in the title. None if all sessions are shown.
         
     Returns:
         BytesIO buffer containing the graph image
     """
-    # Create a list to store data for each log
+    # Create data points for each session
     data = []
-    
-    # Sort logs by date
-    sorted_logs = sorted(logs, key=lambda x: x.date)
-    
-    # Take only the most recent N sessions if specified
-    sorted_logs = sorted_logs[-num_sessions:]
-    
-    # Calculate VPIP for each log and create data points
-    for log in sorted_logs:
-        vpip_by_player = calculate_vpip_by_player(log)
-        
+    for session_date, vpip_by_player in vpip_by_session:
         for player, vpip in vpip_by_player.items():
             data.append({
-                'date': log.date,
+                'date': session_date,
                 'player': player,
                 'vpip': vpip
             })
@@ -123,3 +112,83 @@ def get_file_object_of_vpip_over_time(logs: List[PokerLog], num_sessions: int) -
     fig.write_image(buffer, format="png")
     buffer.seek(0)
     return buffer
+
+
+def get_file_object_of_hud_stats(hand_stats: HandStats) -> BytesIO:
+    """
+    Creates a HUD-style table of each player's hands and stats, players with the most hands first.
+    
+    Args:
+        hand_stats: Stats calculated by the hand stats engine
+        
+    Returns:
+        BytesIO buffer containing the table image
+    """
+    players = sorted(hand_stats.hands_by_player, key=lambda player: hand_stats.hands_by_player[player], reverse=True)
+    columns = [players, [hand_stats.hands_by_player[player] for player in players]]
+    for name in hand_stats.stat_titles:
+        values = hand_stats.stats_by_name[name]
+        columns.append([str(values[player]) if player in values else "-" for player in players])
+
+    fig = go.Figure(
+        go.Table(
+            header={"values": ["Player", "Hands", *hand_stats.stat_titles.values()], "align": "center"},
+            cells={"values": columns, "align": "center", "height": 26},
+        )
+    )
+    fig.update_layout(
+        title="Player Stats",
+        height=160 + 26 * len(players),
+        width=800,
+        template="plotly_white"
+    )
+
+    # Save to buffer
+    buffer = BytesIO()
+    fig.write_image(buffer, format="png")
+    buffer.seek(0)
+    return buffer
+
+
+def get_file_object_of_showdown_hands(showdowns: list[ShowdownHand]) -> BytesIO:
+    """
+    Creates a stacked bar graph of how often each player showed down each hand category.
+    Players with the most showdowns come first.
+    
+    Args:
+        showdowns: Hands classified by classify_showdowns
+        
+    Returns:
+        BytesIO buffer containing the graph image
+    """
+    df = pd.DataFrame({
+        'player': [showdown.player_name for showdown in showdowns],
+        'category': [HAND_CATEGORY_TITLES[showdown.category] for showdown in showdowns],
+    })
+    counts = df.value_counts(['player', 'category']).reset_index(name='count')
+    players = df['player'].value_counts().index.tolist()
+
+    fig = px.bar(
+        counts,
+        x='player',
+        y='count',
+        color='category',
+        category_orders={
+            'player': players,
+            # Strongest hands first in the legend
+            'category': list(reversed(HAND_CATEGORY_TITLES.values())),
+        },
+        labels={
+            'player': 'Player',
+            'count': 'Showdowns',
+            'category': 'Hand'
+        },
+        title='Hands Shown at Showdown by Player'
+    )
+    fig.update_layout(template="plotly_white")
+
+    # Save to buffer
+    buffer = BytesIO()
+    fig.write_image(buffer, format="png")
+    buffer.seek(0)
+    return buffer
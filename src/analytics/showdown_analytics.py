@@ -0,0 +1,120 @@
+from datetime import date
+from logging import getLogger
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.analytics.hand_evaluator import (
+    EVALUATED_CARD_COUNT,
+    HAND_SIZE,
+    HandCategory,
+    encode_cards,
+    evaluate_hands,
+    get_hand_category,
+    get_hand_ranks,
+)
+from src.dataingestion.poker_hand_parser import get_registered_player_nickname_from_session_nickname_or_id
+from src.dataingestion.schemas.board_action import BoardAction
+from src.dataingestion.schemas.board_move import BoardMove
+from src.dataingestion.schemas.card import Card
+from src.dataingestion.schemas.card_rank import CardRank
+from src.dataingestion.schemas.player_action import PlayerAction
+from src.dataingestion.schemas.player_move import PlayerMove
+from src.dataingestion.schemas.poker_hand import PokerHand
+from src.dataingestion.schemas.poker_log import PokerLog
+from src.dataingestion.schemas.registered_player import RegisteredPlayer
+
+logger = getLogger(__name__)
+
+# Hold'em players show two cards, hands of other games are not evaluated
+HOLE_CARD_COUNT = EVALUATED_CARD_COUNT - HAND_SIZE
+FIRST_RUN_ACTIONS = frozenset({BoardAction.FLOP, BoardAction.TURN, BoardAction.RIVER})
+# Cards of the first run dealt before each street of a second run, which shares them
+SECOND_RUN_SHARED_CARD_COUNTS: dict[BoardAction, int] = {
+    BoardAction.SECOND_FLOP: 0,
+    BoardAction.SECOND_TURN: 3,
+    BoardAction.SECOND_RIVER: 4,
+}
+
+
+class ShowdownHand(BaseModel):
+    session_date: date
+    hand_id: str
+    player_name: str  # Registered name, or the session nickname if the player is not registered
+    hole_cards: list[Card]
+    board: list[Card]  # Boards of hands run twice are classified separately
+    hand_value: int  # See evaluate_hands, a larger value beats a smaller one
+    category: HandCategory
+    best_hand: list[CardRank]  # Ranks of the best five cards, e.g. K K K 7 7
+
+
+def get_run_boards(hand: PokerHand) -> list[list[Card]]:
+    """Get the complete board of each run of a hand, the parsed community cards are only the last run's."""
+    first_run: list[Card] = []
+    second_run: list[Card] | None = None
+    for move in hand.actions_in_chronological_order:
+        if not isinstance(move, BoardMove):
+            continue
+        if move.action in FIRST_RUN_ACTIONS:
+            first_run += move.cards
+        else:
+            if second_run is None:
+                second_run = first_run[: SECOND_RUN_SHARED_CARD_COUNTS[move.action]]
+            second_run += move.cards
+    return [board for board in (first_run, second_run) if board is not None and len(board) == HAND_SIZE]
+
+
+def classify_showdowns(logs: list[PokerLog], registered_players: list[RegisteredPlayer]) -> list[ShowdownHand]:
+    """
+    Classify the best hand of each player who showed their cards, on each complete board of the hand.
+    The hands of all logs are evaluated together in one batch.
+
+    Args:
+        logs: Parsed poker logs, shown cards are not kept in the columnar hand store
+        registered_players: Registered players to attribute player IDs and nicknames to
+
+    Returns:
+        One hand per player, shown hand and run, in the order of the logs
+    """
+    shown_hands: list[tuple[date, str, str, list[Card], list[Card]]] = []
+    for log in logs:
+        for hand in log.hands:
+            boards = get_run_boards(hand)
+            if not boards:
+                continue
+            shown_player_ids: set[str] = set()
+            for move in hand.actions_in_chronological_order:
+                if (
+                    not isinstance(move, PlayerMove)
+                    or move.action != PlayerAction.SHOW
+                    or move.cards is None
+                    or len(move.cards) != HOLE_CARD_COUNT
+                    or move.player_id in shown_player_ids
+                ):
+                    continue
+                shown_player_ids.add(move.player_id)
+                player_name = get_registered_player_nickname_from_session_nickname_or_id(
+                    move.player_nickname, move.player_id, registered_players
+                )
+                shown_hands.extend((log.date, hand.hand_id, player_name, move.cards, board) for board in boards)
+
+    cards = np.array(
+        [encode_cards(hole_cards + board) for _, _, _, hole_cards, board in shown_hands], dtype=np.int8
+    ).reshape(-1, EVALUATED_CARD_COUNT)
+    hand_values = evaluate_hands(cards).tolist()
+    logger.info(f"Classified {len(shown_hands)} showdown hands from {len(logs)} poker logs")
+    return [
+        ShowdownHand(
+            session_date=session_date,
+            hand_id=hand_id,
+            player_name=player_name,
+            hole_cards=hole_cards,
+            board=board,
+            hand_value=hand_value,
+            category=get_hand_category(hand_value),
+            best_hand=get_hand_ranks(hand_value),
+        )
+        for (session_date, hand_id, player_name, hole_cards, board), hand_value in zip(
+            shown_hands, hand_values, strict=True
+        )
+    ]
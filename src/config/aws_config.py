@@ -3,3 +3,10 @@ class AWSConfig:
     LEDGER_PREFIX = "uploads/{guild_id}/ledgers/"
     LOG_PREFIX = "uploads/{guild_id}/logs/"
     SECRET_MANAGER_REGION = "us-east-1"
+    S3_MAX_POOL_CONNECTIONS = 32
+    S3_CONNECT_TIMEOUT_SECONDS = 5
+    S3_READ_TIMEOUT_SECONDS = 30
+    S3_MAX_RETRY_ATTEMPTS = 3
+    # Compression applied to uploaded files, "gzip" or None to store them uncompressed
+    UPLOAD_COMPRESSION: str | None = "gzip"
+    UPLOAD_COMPRESSION_LEVEL = 6
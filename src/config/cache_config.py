@@ -0,0 +1,14 @@
+class CacheConfig:
+    # Memory budget for parsed PokerLog objects kept between commands, sized for the 512 MB task
+    PARSED_LOG_CACHE_MAX_BYTES = 128 * 1024 * 1024
+    # Measured footprint of one parsed hand action (pydantic models, cards, log line), used to size cached logs
+    ESTIMATED_BYTES_PER_PARSED_ACTION = 1800
+    # Date ranges kept per guild in the analytics dataset cache, the unbounded dataset counts as one
+    MAX_CACHED_DATASETS_PER_GUILD = 8
+    # Memory budget for rendered chart PNGs
+    CHART_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # Directory rendered charts are also persisted to so they survive restarts, or None to keep them in memory only
+    CHART_CACHE_DIRECTORY: str | None = None
+    CHART_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+    # Guilds whose data is loaded at the same time while warming caches after startup
+    WARMUP_MAX_CONCURRENT_GUILDS = 1
@@ -0,0 +1,7 @@
+class HandBrowserConfig:
+    # Hands shown on each page of /hands
+    PAGE_SIZE = 10
+    # Seconds after the last page turn that the next page button stops working
+    VIEW_TIMEOUT_SECONDS = 600
+    # Discord rejects messages longer than 2000 characters
+    MAX_MESSAGE_LENGTH = 2000
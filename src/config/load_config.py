@@ -0,0 +1,7 @@
+class LoadConfig:
+    # Files downloaded from S3 at the same time while loading a guild's data
+    MAX_CONCURRENT_DOWNLOADS = 4
+    # Opened S3 bodies waiting to be parsed, bounds the connections held open before their bodies are read
+    MAX_QUEUED_DOWNLOADS = 4
+    # Threads parsing downloaded files, the task has a fraction of a vCPU so parsing mostly overlaps network time
+    PARSE_WORKERS = 2
@@ -0,0 +1,12 @@
+from typing import ClassVar
+
+
+class PrecomputeConfig:
+    # How often the scheduler looks for guilds whose data changed since their charts were last precomputed
+    CHECK_INTERVAL_MINUTES = 5
+    # Minimum minutes between precomputes of the same guild
+    DEFAULT_GUILD_INTERVAL_MINUTES = 15
+    # Per guild ID overrides of DEFAULT_GUILD_INTERVAL_MINUTES, None disables precomputing for that guild
+    GUILD_INTERVAL_MINUTES: ClassVar[dict[str, int | None]] = {}
+    # Process CPU seconds precomputing may use per rolling hour, shared by all guilds
+    CPU_SECONDS_PER_HOUR = 120
@@ -0,0 +1,11 @@
+class QueryConfig:
+    # Rows of an ad-hoc query result that are fetched and shown
+    MAX_ROWS = 25
+    # Seconds an ad-hoc query may run before it is interrupted
+    TIMEOUT_SECONDS = 5
+    # SQLite virtual machine instructions between timeout checks
+    PROGRESS_CHECK_INSTRUCTIONS = 10_000
+    # Characters a single value may take in the result table before it is cut off
+    MAX_CELL_WIDTH = 24
+    # Discord rejects messages longer than 2000 characters
+    MAX_MESSAGE_LENGTH = 2000
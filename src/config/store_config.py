@@ -0,0 +1,5 @@
+class StoreConfig:
+    # Local disk stores of derived data, rebuilt from the files in S3 whenever they are missing
+    HAND_STORE_DIRECTORY = "/tmp/headwinspokerbot/hand_store"
+    # One SQLite database per guild with its ledger sessions, hands and actions
+    ANALYTICS_DATABASE_DIRECTORY = "/tmp/headwinspokerbot/analytics"
@@ -0,0 +1,300 @@
+import sqlite3
+from collections.abc import Generator, Iterable
+from contextlib import closing, contextmanager
+from datetime import date
+from logging import getLogger
+from pathlib import Path
+
+from src.config.store_config import StoreConfig
+from src.dataingestion.columnar_hand_store import BOARD_ACTION_STREETS, PREFLOP_STREET
+from src.dataingestion.common_utils import dollars_to_cents, to_epoch_ms
+from src.dataingestion.file_manifest_helpers import DateRange
+from src.dataingestion.schemas.board_move import BoardMove
+from src.dataingestion.schemas.player_session_log import PlayerSessionLog
+from src.dataingestion.schemas.poker_log import PokerLog
+
+logger = getLogger(__name__)
+
+# Bump whenever the schema or the meaning of a column changes, databases of other versions are dropped and refilled
+ANALYTICS_SCHEMA_VERSION = 2
+# Seconds a connection waits for another thread's write transaction before giving up
+BUSY_TIMEOUT_SECONDS = 30
+# Bounds used for open ends of a date range, session dates are stored as ISO strings
+MIN_SESSION_DATE = date.min.isoformat()
+MAX_SESSION_DATE = date.max.isoformat()
+
+TABLE_NAMES = ["actions", "hand_players", "players", "hands", "sessions", "files"]
+SCHEMA = """
+CREATE TABLE files (
+    content_hash TEXT PRIMARY KEY,
+    file_type TEXT NOT NULL,
+    session_date TEXT
+);
+
+CREATE TABLE sessions (
+    content_hash TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    player_nickname TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    buy_in_cents INTEGER NOT NULL,
+    buy_out_cents INTEGER,
+    stack_cents INTEGER NOT NULL,
+    net_cents INTEGER NOT NULL
+);
+CREATE INDEX sessions_by_player_id ON sessions (player_id, session_date);
+CREATE INDEX sessions_by_player_nickname ON sessions (player_nickname, session_date);
+CREATE INDEX sessions_by_date ON sessions (session_date);
+CREATE INDEX sessions_by_file ON sessions (content_hash);
+
+CREATE TABLE hands (
+    content_hash TEXT NOT NULL,
+    hand_id TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    pot_cents INTEGER NOT NULL,
+    PRIMARY KEY (content_hash, hand_id)
+);
+CREATE INDEX hands_by_hand_id ON hands (hand_id);
+CREATE INDEX hands_by_date ON hands (session_date);
+CREATE INDEX hands_by_pot ON hands (pot_cents, content_hash, hand_id);
+CREATE INDEX hands_by_start ON hands (start_ms, content_hash, hand_id);
+
+-- The distinct players of each log, for attributing them to names without scanning its actions
+CREATE TABLE players (
+    content_hash TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    player_nickname TEXT NOT NULL,
+    PRIMARY KEY (content_hash, player_id, player_nickname)
+);
+
+-- One row per player in each hand, copying the hand columns hands are browsed by
+CREATE TABLE hand_players (
+    content_hash TEXT NOT NULL,
+    hand_id TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    player_nickname TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    pot_cents INTEGER NOT NULL,
+    PRIMARY KEY (content_hash, hand_id, player_id, player_nickname)
+);
+CREATE INDEX hand_players_by_pot ON hand_players (player_id, player_nickname, pot_cents, content_hash, hand_id);
+CREATE INDEX hand_players_by_start ON hand_players (player_id, player_nickname, start_ms, content_hash, hand_id);
+
+CREATE TABLE actions (
+    content_hash TEXT NOT NULL,
+    hand_id TEXT NOT NULL,
+    action_order INTEGER NOT NULL,
+    street INTEGER NOT NULL,
+    player_id TEXT,
+    player_nickname TEXT,
+    action TEXT NOT NULL,
+    amount_cents INTEGER,
+    timestamp_ms INTEGER NOT NULL
+);
+CREATE INDEX actions_by_hand ON actions (content_hash, hand_id);
+CREATE INDEX actions_by_player_id ON actions (player_id, hand_id);
+"""
+
+
+def get_analytics_database_path(guild_id: str) -> Path:
+    """Get the path of a guild's analytics database."""
+    return Path(StoreConfig.ANALYTICS_DATABASE_DIRECTORY) / f"{guild_id}.sqlite3"
+
+
+@contextmanager
+def write_transaction(connection: sqlite3.Connection) -> Generator[None, None, None]:
+    """Run statements in one immediate write transaction, rolled back if anything raises."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def open_analytics_database(guild_id: str) -> sqlite3.Connection:
+    """
+    Open a guild's analytics database, creating it or replacing an older schema version.
+    The database only holds data derived from the files in S3, so dropping it loses nothing.
+    Connections are in autocommit mode, writes go through write_transaction.
+    """
+    path = get_analytics_database_path(guild_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        # Write-ahead logging lets queries run while another thread stores a file
+        connection.execute("PRAGMA journal_mode = WAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != ANALYTICS_SCHEMA_VERSION:
+            with write_transaction(connection):
+                # Checked again under the write lock, another connection may have just created the schema
+                if connection.execute("PRAGMA user_version").fetchone()[0] != ANALYTICS_SCHEMA_VERSION:
+                    for table in TABLE_NAMES:
+                        connection.execute(f"DROP TABLE IF EXISTS {table}")
+                    for statement in SCHEMA.split(";"):
+                        if statement.strip():
+                            connection.execute(statement)
+                    connection.execute(f"PRAGMA user_version = {ANALYTICS_SCHEMA_VERSION}")
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def open_read_only_analytics_database(guild_id: str) -> sqlite3.Connection:
+    """
+    Open a guild's existing analytics database read-only, see open_analytics_database.
+    Temporary tables and views can still be created, they live outside the database file.
+    """
+    uri = f"{get_analytics_database_path(guild_id).resolve().as_uri()}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+
+
+def get_date_bounds(date_range: DateRange) -> tuple[str, str]:
+    """Get the inclusive session date bounds of a date range for BETWEEN, open ends included."""
+    start_date, end_date = date_range
+    return (
+        start_date.isoformat() if start_date else MIN_SESSION_DATE,
+        end_date.isoformat() if end_date else MAX_SESSION_DATE,
+    )
+
+
+def select_stored_files(connection: sqlite3.Connection, content_hashes: Iterable[str]) -> None:
+    """
+    Fill the temporary selected_files table that queries restrict their rows to, so files that were
+    deleted or are outside a load's limits are ignored. Temporary tables only live as long as the connection.
+    """
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS selected_files (content_hash TEXT PRIMARY KEY)")
+    connection.execute("DELETE FROM temp.selected_files")
+    connection.executemany(
+        "INSERT OR IGNORE INTO temp.selected_files VALUES (?)", ((content_hash,) for content_hash in content_hashes)
+    )
+
+
+def get_stored_content_hashes(guild_id: str, file_type: str) -> set[str]:
+    """Get the content hashes of a guild's files of a type that are fully stored in its analytics database."""
+    with closing(open_analytics_database(guild_id)) as connection:
+        rows = connection.execute("SELECT content_hash FROM files WHERE file_type = ?", (file_type,)).fetchall()
+    return {content_hash for (content_hash,) in rows}
+
+
+def _insert_file(connection: sqlite3.Connection, content_hash: str, file_type: str, session_date: date | None) -> bool:
+    """Record a file about to be stored. Returns False if it is already stored."""
+    cursor = connection.execute(
+        "INSERT OR IGNORE INTO files VALUES (?, ?, ?)",
+        (content_hash, file_type, session_date.isoformat() if session_date else None),
+    )
+    return cursor.rowcount > 0
+
+
+def store_ledger_sessions(guild_id: str, content_hash: str, sessions: list[PlayerSessionLog]) -> bool:
+    """
+    Write a freshly parsed ledger to the analytics database unless it is already there.
+    Returns False if it could not be stored, failures are logged rather than raised.
+    """
+    session_date = min(session.session_start_at for session in sessions).date() if sessions else None
+    try:
+        with closing(open_analytics_database(guild_id)) as connection, write_transaction(connection):
+            if not _insert_file(connection, content_hash, "ledgers", session_date):
+                return True
+            connection.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        content_hash,
+                        session.player_id,
+                        session.player_nickname_lowercase,
+                        session.session_start_at.date().isoformat(),
+                        to_epoch_ms(session.session_start_at),
+                        to_epoch_ms(session.session_end_at),
+                        dollars_to_cents(session.buy_in_dollars),
+                        dollars_to_cents(session.buy_out_dollars) if session.buy_out_dollars is not None else None,
+                        dollars_to_cents(session.stack_dollars),
+                        dollars_to_cents(session.net_dollars),
+                    )
+                    for session in sessions
+                ),
+            )
+    except Exception as e:
+        logger.error(f"Error storing ledger {content_hash} in the analytics database of guild {guild_id}: {e}")
+        return False
+    return True
+
+
+def store_poker_log(guild_id: str, content_hash: str, log: PokerLog) -> bool:
+    """
+    Write a freshly parsed log to the analytics database unless it is already there.
+    Returns False if it could not be stored, failures are logged rather than raised.
+    """
+    session_date = log.date.isoformat()
+    hand_rows: list[tuple[str, str, str, int, int, int]] = []
+    hand_player_rows: list[tuple[str, str, str, str, str, int, int]] = []
+    log_players: dict[tuple[str, str], None] = {}
+    action_rows: list[tuple[str, str, int, int, str | None, str | None, str, int | None, int]] = []
+    for hand in log.hands:
+        start_ms = to_epoch_ms(hand.start_time)
+        pot_cents = dollars_to_cents(hand.pot_size)
+        hand_rows.append((content_hash, hand.hand_id, session_date, start_ms, to_epoch_ms(hand.end_time), pot_cents))
+        hand_players = dict.fromkeys(
+            (move.player_id, move.player_nickname)
+            for move in hand.actions_in_chronological_order
+            if not isinstance(move, BoardMove)
+        )
+        hand_player_rows.extend(
+            (content_hash, hand.hand_id, player_id, player_nickname, session_date, start_ms, pot_cents)
+            for player_id, player_nickname in hand_players
+        )
+        log_players.update(hand_players)
+        street = PREFLOP_STREET
+        for move in hand.actions_in_chronological_order:
+            if isinstance(move, BoardMove):
+                street = BOARD_ACTION_STREETS[move.action]
+                player_id, player_nickname, amount_cents = None, None, None
+            else:
+                player_id, player_nickname = move.player_id, move.player_nickname
+                amount_cents = dollars_to_cents(move.amount) if move.amount is not None else None
+            action_rows.append(
+                (
+                    content_hash,
+                    hand.hand_id,
+                    move.order,
+                    street,
+                    player_id,
+                    player_nickname,
+                    move.action.value,
+                    amount_cents,
+                    to_epoch_ms(move.timestamp),
+                )
+            )
+
+    try:
+        with closing(open_analytics_database(guild_id)) as connection, write_transaction(connection):
+            if not _insert_file(connection, content_hash, "logs", log.date):
+                return True
+            connection.executemany("INSERT OR IGNORE INTO hands VALUES (?, ?, ?, ?, ?, ?)", hand_rows)
+            connection.executemany("INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", action_rows)
+            connection.executemany("INSERT OR IGNORE INTO hand_players VALUES (?, ?, ?, ?, ?, ?, ?)", hand_player_rows)
+            connection.executemany(
+                "INSERT INTO players VALUES (?, ?, ?)",
+                ((content_hash, player_id, player_nickname) for player_id, player_nickname in log_players),
+            )
+    except Exception as e:
+        logger.error(f"Error storing log {content_hash} in the analytics database of guild {guild_id}: {e}")
+        return False
+    return True
+
+
+def remove_stored_files(guild_id: str, content_hashes: list[str]) -> None:
+    """Remove the rows of deleted files. A file that is still needed is simply stored again on load."""
+    if not content_hashes:
+        return
+    with closing(open_analytics_database(guild_id)) as connection, write_transaction(connection):
+        select_stored_files(connection, content_hashes)
+        for table in TABLE_NAMES:
+            connection.execute(
+                f"DELETE FROM {table} WHERE content_hash IN (SELECT content_hash FROM temp.selected_files)"
+            )
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from logging import getLogger
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+logger = getLogger(__name__)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+    max_bytes: int = 0
+
+
+class ByteBudgetLRUCache(Generic[K, V]):
+    """
+    Least recently used cache bounded by the estimated size of its values rather than their count.
+    Meant to be used from the event loop only, it is not thread-safe.
+    """
+
+    def __init__(self, name: str, max_bytes: int) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: K) -> V | None:
+        """Get a cached value and mark it as recently used. Returns None on a miss."""
+        cached = self._entries.get(key)
+        if cached is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return cached[0]
+
+    def put(self, key: K, value: V, size_bytes: int) -> None:
+        """Cache a value, evicting least recently used values until the cache fits its budget."""
+        if size_bytes > self.max_bytes:
+            logger.info(f"Not caching {key} in {self.name}, {size_bytes} bytes exceeds the whole budget")
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, size_bytes)
+        self._size_bytes += size_bytes
+        while self._size_bytes > self.max_bytes:
+            evicted_key = next(iter(self._entries))
+            self._remove(evicted_key)
+            self._evictions += 1
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """Remove every cached value whose key matches the predicate. Returns the number removed."""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            entries=len(self._entries),
+            size_bytes=self._size_bytes,
+            max_bytes=self.max_bytes,
+        )
+
+    def _remove(self, key: K) -> None:
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self._size_bytes -= cached[1]
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from logging import getLogger
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel, ConfigDict
+
+from src.config.store_config import StoreConfig
+from src.dataingestion.common_utils import dollars_to_cents, to_epoch_ms
+from src.dataingestion.schemas.board_action import BoardAction
+from src.dataingestion.schemas.board_move import BoardMove
+from src.dataingestion.schemas.file_manifest import ManifestEntry
+from src.dataingestion.schemas.player_action import PlayerAction
+from src.dataingestion.schemas.poker_log import PokerLog
+
+logger = getLogger(__name__)
+
+# Bump whenever the columns or their encoding change, stored logs of other versions are ignored and rewritten
+COLUMNAR_FORMAT_VERSION = 1
+METADATA_FILENAME = "metadata.json"
+
+PLAYER_ACTION_CODES: dict[PlayerAction, int] = {action: code for code, action in enumerate(PlayerAction)}
+# Board actions share the action code column, offset so they never collide with player actions
+BOARD_ACTION_CODES: dict[BoardAction, int] = {action: 16 + code for code, action in enumerate(BoardAction)}
+BOARD_ACTION_STREETS: dict[BoardAction, int] = {
+    BoardAction.FLOP: 1,
+    BoardAction.TURN: 2,
+    BoardAction.RIVER: 3,
+    BoardAction.SECOND_FLOP: 1,
+    BoardAction.SECOND_TURN: 2,
+    BoardAction.SECOND_RIVER: 3,
+}
+PREFLOP_STREET = 0
+# player_index of board moves
+NO_PLAYER = -1
+# amount_cents of moves without an amount
+NO_AMOUNT = -1
+
+HAND_COLUMN_DTYPES: dict[str, type[np.generic]] = {
+    "start_ms": np.int64,
+    "end_ms": np.int64,
+    "pot_cents": np.int64,
+}
+ACTION_COLUMN_DTYPES: dict[str, type[np.generic]] = {
+    "hand_index": np.int32,
+    "order": np.int64,
+    "street": np.int8,
+    "player_index": np.int32,
+    "action_code": np.int8,
+    "amount_cents": np.int64,
+    "timestamp_ms": np.int64,
+}
+
+
+class ColumnarPokerLog(BaseModel):
+    """
+    A parsed poker log as a hand table and an action table of numpy columns.
+    Players are stored as seen in the log, one row per distinct (player ID, nickname) pair,
+    so the columns do not depend on the registered players.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    session_date: date
+    hand_ids: list[str]
+    player_ids: list[str]
+    player_nicknames: list[str]
+    hands: dict[str, NDArray[np.generic]]
+    actions: dict[str, NDArray[np.generic]]
+
+
+def build_columnar_log(log: PokerLog) -> ColumnarPokerLog:
+    """Convert a parsed poker log to columns, actions in chronological order within each hand."""
+    player_indexes: dict[tuple[str, str], int] = {}
+    hand_rows: dict[str, list[int]] = {name: [] for name in HAND_COLUMN_DTYPES}
+    action_rows: dict[str, list[int]] = {name: [] for name in ACTION_COLUMN_DTYPES}
+
+    for hand_index, hand in enumerate(log.hands):
+        hand_rows["start_ms"].append(to_epoch_ms(hand.start_time))
+        hand_rows["end_ms"].append(to_epoch_ms(hand.end_time))
+        hand_rows["pot_cents"].append(dollars_to_cents(hand.pot_size))
+
+        street = PREFLOP_STREET
+        for move in hand.actions_in_chronological_order:
+            if isinstance(move, BoardMove):
+                street = BOARD_ACTION_STREETS[move.action]
+                player_index = NO_PLAYER
+                action_code = BOARD_ACTION_CODES[move.action]
+                amount_cents = NO_AMOUNT
+            else:
+                player_index = player_indexes.setdefault((move.player_id, move.player_nickname), len(player_indexes))
+                action_code = PLAYER_ACTION_CODES[move.action]
+                amount_cents = dollars_to_cents(move.amount) if move.amount is not None else NO_AMOUNT
+
+            action_rows["hand_index"].append(hand_index)
+            action_rows["order"].append(move.order)
+            action_rows["street"].append(street)
+            action_rows["player_index"].append(player_index)
+            action_rows["action_code"].append(action_code)
+            action_rows["amount_cents"].append(amount_cents)
+            action_rows["timestamp_ms"].append(to_epoch_ms(move.timestamp))
+
+    return ColumnarPokerLog(
+        session_date=log.date,
+        hand_ids=[hand.hand_id for hand in log.hands],
+        player_ids=[player_id for player_id, _ in player_indexes],
+        player_nicknames=[nickname for _, nickname in player_indexes],
+        hands={name: np.array(rows, dtype=HAND_COLUMN_DTYPES[name]) for name, rows in hand_rows.items()},
+        actions={name: np.array(rows, dtype=ACTION_COLUMN_DTYPES[name]) for name, rows in action_rows.items()},
+    )
+
+
+def write_columnar_log(columnar_log: ColumnarPokerLog, directory: Path) -> None:
+    """
+    Write a columnar log as one .npy file per column plus a metadata file.
+    The files are written to a temporary directory that is renamed into place, so readers never see a partial log.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    temporary_directory = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}."))
+    try:
+        for table, columns in (("hands", columnar_log.hands), ("actions", columnar_log.actions)):
+            for name, column in columns.items():
+                np.save(temporary_directory / f"{table}_{name}.npy", column)
+        metadata = {
+            "format_version": COLUMNAR_FORMAT_VERSION,
+            "session_date": columnar_log.session_date.isoformat(),
+            "hand_ids": columnar_log.hand_ids,
+            "player_ids": columnar_log.player_ids,
+            "player_nicknames": columnar_log.player_nicknames,
+        }
+        (temporary_directory / METADATA_FILENAME).write_text(json.dumps(metadata))
+
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(temporary_directory, directory)
+    except Exception:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        raise
+
+
+def open_columnar_log(
+    directory: Path,
+    hand_columns: list[str] | None = None,
+    action_columns: list[str] | None = None,
+) -> ColumnarPokerLog | None:
+    """
+    Open a stored columnar log with its columns memory mapped, so they are read lazily from the page cache
+    and every reader, in any process, shares one physical copy.
+
+    Args:
+        directory: Directory the log was written to
+        hand_columns: Hand columns to open, all of them if None
+        action_columns: Action columns to open, all of them if None
+
+    Returns:
+        The log with read-only column views, or None if it is missing or was written in another format version
+    """
+    try:
+        metadata = json.loads((directory / METADATA_FILENAME).read_text())
+    except FileNotFoundError:
+        return None
+    if metadata["format_version"] != COLUMNAR_FORMAT_VERSION:
+        return None
+
+    def open_columns(table: str, names: list[str]) -> dict[str, NDArray[np.generic]]:
+        return {name: np.load(directory / f"{table}_{name}.npy", mmap_mode="r") for name in names}
+
+    return ColumnarPokerLog(
+        session_date=date.fromisoformat(metadata["session_date"]),
+        hand_ids=metadata["hand_ids"],
+        player_ids=metadata["player_ids"],
+        player_nicknames=metadata["player_nicknames"],
+        hands=open_columns("hands", hand_columns if hand_columns is not None else list(HAND_COLUMN_DTYPES)),
+        actions=open_columns("actions", action_columns if action_columns is not None else list(ACTION_COLUMN_DTYPES)),
+    )
+
+
+def get_columnar_log_directory(guild_id: str, session_date: date, content_hash: str) -> Path:
+    """
+    Get the directory a guild's log is stored in. Logs are partitioned by session date,
+    and keyed by content within a partition so renamed or re-uploaded files share a directory.
+    """
+    return Path(StoreConfig.HAND_STORE_DIRECTORY) / guild_id / f"session_date={session_date.isoformat()}" / content_hash
+
+
+def get_stored_entry_directory(guild_id: str, entry: ManifestEntry) -> Path | None:
+    """Get the store directory of a log file's manifest entry, or None if its session date or content is unknown."""
+    if entry.content_hash is None or entry.summary is None or entry.summary.session_date is None:
+        return None
+    return get_columnar_log_directory(guild_id, entry.summary.session_date, entry.content_hash)
+
+
+def remove_stored_logs(guild_id: str, entries: list[ManifestEntry]) -> None:
+    """Remove the stored columns of deleted log files. A log that is still needed is simply stored again on load."""
+    for entry in entries:
+        directory = get_stored_entry_directory(guild_id, entry)
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def store_columnar_log(guild_id: str, content_hash: str, log: PokerLog) -> None:
+    """Write a freshly parsed log to the local store unless it is already there. Failures are logged, not raised."""
+    directory = get_columnar_log_directory(guild_id, log.date, content_hash)
+    try:
+        if open_columnar_log(directory, [], []) is not None:
+            return
+        write_columnar_log(build_columnar_log(log), directory)
+    except Exception as e:
+        logger.error(f"Error storing columnar log {content_hash} for guild {guild_id}: {e}")
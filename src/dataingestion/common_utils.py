@@ -15,3 +15,13 @@ def cents_to_dollars(cents: str) -> Decimal:
 def get_difference_in_ms(start_time: datetime, end_time: datetime) -> int:
     """Get the difference in milliseconds between two datetime objects"""
     return int((end_time - start_time).total_seconds() * 1000)
+
+
+def dollars_to_cents(dollars: Decimal) -> int:
+    """Convert dollars to whole cents"""
+    return int((dollars * 100).to_integral_value())
+
+
+def to_epoch_ms(value: datetime) -> int:
+    """Convert a timezone-aware datetime to milliseconds since the epoch"""
+    return int(value.timestamp() * 1000)
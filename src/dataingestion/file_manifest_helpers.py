@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+from collections.abc import Iterable
+from datetime import date
+from logging import getLogger
+
+from src.dataingestion.schemas.file_manifest import FileSummary, GuildManifest, ManifestEntry, StoredObject
+from src.discordbot.services.s3_service import FileType, S3Service
+
+logger = getLogger(__name__)
+
+MANIFEST_FILE_TYPES: tuple[FileType, ...] = ("ledgers", "logs")
+
+# Inclusive (start date, end date) range, either end may be open
+DateRange = tuple[date | None, date | None]
+
+# Manifest updates are read-modify-write, so they are serialized per guild within the process
+_manifest_locks: dict[str, asyncio.Lock] = {}
+
+
+def _get_manifest_lock(guild_id: str) -> asyncio.Lock:
+    return _manifest_locks.setdefault(guild_id, asyncio.Lock())
+
+
+def hash_file_content(content: bytes) -> str:
+    """Get the content hash recorded in the manifest for a file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+async def _build_manifest_from_listing(guild_id: str, s3_service: S3Service) -> GuildManifest:
+    """Bootstrap a manifest for a guild that has files from before manifests existed."""
+    manifest = GuildManifest()
+    for file_type in MANIFEST_FILE_TYPES:
+        for stored_object in await s3_service.list_file_objects(guild_id, file_type):
+            manifest.entries[stored_object.key] = ManifestEntry(**stored_object.model_dump(), file_type=file_type)
+    logger.info(f"Bootstrapped manifest with {len(manifest.entries)} entries for guild {guild_id}")
+    return manifest
+
+
+async def _get_or_build_manifest(guild_id: str, s3_service: S3Service) -> GuildManifest:
+    manifest = await s3_service.get_manifest(guild_id)
+    if manifest is None:
+        manifest = await _build_manifest_from_listing(guild_id, s3_service)
+        await s3_service.save_manifest(guild_id, manifest)
+    return manifest
+
+
+async def load_guild_manifest(guild_id: str, s3_service: S3Service) -> GuildManifest:
+    """
+    Load a guild's file manifest, bootstrapping it from an S3 listing if it does not exist yet.
+
+    Args:
+        guild_id: Discord guild ID to load the manifest for
+
+    Returns:
+        The guild's manifest
+    """
+    async with _get_manifest_lock(guild_id):
+        return await _get_or_build_manifest(guild_id, s3_service)
+
+
+def get_manifest_entries(manifest: GuildManifest, file_type: FileType) -> list[ManifestEntry]:
+    """Get the manifest entries of a file type, oldest session first. Entries without a summary come last."""
+    entries = [entry for entry in manifest.entries.values() if entry.file_type == file_type]
+    return sorted(
+        entries,
+        key=lambda entry: (
+            entry.summary is None or entry.summary.session_date is None,
+            entry.summary.session_date if entry.summary and entry.summary.session_date else entry.last_modified.date(),
+            entry.filename,
+        ),
+    )
+
+
+def select_manifest_entries(
+    manifest: GuildManifest,
+    file_type: FileType,
+    latest_sessions: int | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+) -> list[ManifestEntry]:
+    """
+    Select the manifest entries of a file type that a load needs, oldest session first.
+    Entries without a summary have an unknown session date, so they are always selected
+    and callers apply the same limits again on the parsed data.
+    Files with the same content as an earlier entry are left out, so duplicates are only loaded once.
+
+    Args:
+        manifest: The guild's manifest
+        file_type: Type of files to select
+        latest_sessions: Only select the files of the most recent N sessions. If None, selects all files.
+        start_date: Only select files with a session date on or after this date
+        end_date: Only select files with a session date on or before this date
+
+    Returns:
+        The selected entries
+    """
+    entries = remove_duplicate_entries(get_manifest_entries(manifest, file_type))
+    dated_entries = [
+        entry
+        for entry in entries
+        if entry.summary
+        and entry.summary.session_date
+        and is_in_date_range(entry.summary.session_date, start_date, end_date)
+    ]
+    undated_entries = [entry for entry in entries if not (entry.summary and entry.summary.session_date)]
+    if latest_sessions is not None:
+        dated_entries = dated_entries[max(len(dated_entries) - latest_sessions, 0) :]
+    return dated_entries + undated_entries
+
+
+def remove_duplicate_entries(entries: list[ManifestEntry]) -> list[ManifestEntry]:
+    """Keep only the first entry of each content hash. Entries without a known hash are all kept."""
+    seen_hashes: set[str] = set()
+    unique_entries: list[ManifestEntry] = []
+    for entry in entries:
+        if entry.content_hash is not None:
+            if entry.content_hash in seen_hashes:
+                continue
+            seen_hashes.add(entry.content_hash)
+        unique_entries.append(entry)
+    return unique_entries
+
+
+def find_entry_by_content_hash(manifest: GuildManifest, file_type: str, content_hash: str) -> ManifestEntry | None:
+    """Find an entry of a file type with exactly the same content, the manifest doubles as the guild's hash index."""
+    for entry in manifest.entries.values():
+        if entry.file_type == file_type and entry.content_hash == content_hash:
+            return entry
+    return None
+
+
+def is_in_date_range(value: date, start_date: date | None, end_date: date | None) -> bool:
+    """Check whether a date falls within an optional inclusive date range."""
+    return (start_date is None or value >= start_date) and (end_date is None or value <= end_date)
+
+
+def find_manifest_entry(manifest: GuildManifest, file_type: FileType, filename: str) -> ManifestEntry | None:
+    """Find the manifest entry of a file by name."""
+    for entry in manifest.entries.values():
+        if entry.file_type == file_type and entry.filename == filename:
+            return entry
+    return None
+
+
+def build_manifest_entry(
+    stored_object: StoredObject, file_type: FileType, content: bytes, summary: FileSummary | None
+) -> ManifestEntry:
+    """Build the manifest entry of a freshly uploaded file."""
+    return ManifestEntry(
+        **stored_object.model_dump(),
+        file_type=file_type,
+        content_hash=hash_file_content(content),
+        summary=summary,
+    )
+
+
+async def record_uploaded_files(
+    guild_id: str, s3_service: S3Service, entries: list[ManifestEntry]
+) -> list[ManifestEntry | None]:
+    """
+    Add or replace the manifest entries of freshly uploaded files in a single manifest update.
+    The content check runs in the same locked update, so of concurrent uploads of the same content only the first
+    is recorded. Later copies under a new key are deleted from S3 instead, as they would be counted twice.
+
+    Returns:
+        For each entry, the entry of the earlier copy it was not recorded in favour of, or None if it was recorded
+    """
+    if not entries:
+        return []
+
+    duplicate_of: list[ManifestEntry | None] = []
+    async with _get_manifest_lock(guild_id):
+        manifest = await _get_or_build_manifest(guild_id, s3_service)
+        for entry in entries:
+            stored_entry = (
+                find_entry_by_content_hash(manifest, entry.file_type, entry.content_hash)
+                if entry.content_hash is not None and entry.key not in manifest.entries
+                else None
+            )
+            if stored_entry is None:
+                manifest.entries[entry.key] = entry
+            duplicate_of.append(stored_entry)
+        if any(stored_entry is None for stored_entry in duplicate_of):
+            await s3_service.save_manifest(guild_id, manifest)
+
+        duplicate_keys = [
+            entry.key for entry, stored_entry in zip(entries, duplicate_of, strict=True) if stored_entry is not None
+        ]
+        if duplicate_keys:
+            logger.info(
+                f"Deleting {len(duplicate_keys)} uploads already recorded by a concurrent upload for guild {guild_id}"
+            )
+            await s3_service.delete_keys(duplicate_keys)
+    return duplicate_of
+
+
+async def record_file_summaries(
+    guild_id: str,
+    s3_service: S3Service,
+    summaries: dict[str, tuple[str, FileSummary]],
+) -> None:
+    """
+    Backfill content hashes and summaries for entries that were bootstrapped from a listing.
+
+    Args:
+        guild_id: Discord guild ID the files belong to
+        summaries: Object key -> (content hash, summary)
+    """
+    if not summaries:
+        return
+
+    async with _get_manifest_lock(guild_id):
+        manifest = await _get_or_build_manifest(guild_id, s3_service)
+        for key, (content_hash, summary) in summaries.items():
+            entry = manifest.entries.get(key)
+            if entry is not None:
+                entry.content_hash = content_hash
+                entry.summary = summary
+        await s3_service.save_manifest(guild_id, manifest)
+    logger.info(f"Backfilled {len(summaries)} manifest summaries for guild {guild_id}")
+
+
+async def remove_manifest_entries(guild_id: str, s3_service: S3Service, keys: Iterable[str]) -> None:
+    """Remove the manifest entries of deleted files."""
+    async with _get_manifest_lock(guild_id):
+        manifest = await _get_or_build_manifest(guild_id, s3_service)
+        for key in keys:
+            manifest.entries.pop(key, None)
+        await s3_service.save_manifest(guild_id, manifest)
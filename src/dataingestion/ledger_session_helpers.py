@@ -1,24 +1,44 @@
+import asyncio
 import csv
 import datetime
+import hashlib
+import sqlite3
+from collections.abc import Iterable
+from contextlib import closing
 from decimal import Decimal
 from io import StringIO
 from logging import getLogger
 
-from src.dataingestion.common_utils import cents_to_dollars, get_difference_in_ms, parse_utc_datetime
+from src.dataingestion.analytics_database import (
+    get_date_bounds,
+    get_stored_content_hashes,
+    open_analytics_database,
+    select_stored_files,
+    store_ledger_sessions,
+)
+from src.dataingestion.common_utils import cents_to_dollars, parse_utc_datetime
+from src.dataingestion.file_manifest_helpers import (
+    DateRange,
+    load_guild_manifest,
+    record_file_summaries,
+    select_manifest_entries,
+)
+from src.dataingestion.load_pipeline import run_download_parse_pipeline
 from src.dataingestion.schemas.consolidated_session import ConsolidatedPlayerSession
+from src.dataingestion.schemas.file_manifest import FileSummary, GuildManifest, ManifestEntry, StoredFileBody
 from src.dataingestion.schemas.player_session_log import PlayerSessionLog
 from src.dataingestion.schemas.registered_player import RegisteredPlayer
-from src.discordbot.services.s3_service import S3Service
+from src.discordbot.services.s3_service import S3Service, open_stored_body_stream
 
 logger = getLogger(__name__)
 
 
-def load_sessions_from_csv_file(csv_file: StringIO) -> list[PlayerSessionLog]:
+def load_sessions_from_csv_file(csv_file: Iterable[str]) -> list[PlayerSessionLog]:
     """
-    Load poker sessions from a CSV file or StringIO into a list of PlayerSessionLog models
+    Load poker sessions from a CSV file, StringIO or S3 text stream into a list of PlayerSessionLog models
 
     Args:
-        csv_path: Path to CSV file or StringIO containing CSV data
+        csv_file: File-like object or stream of lines containing CSV data
 
     Returns:
         List of PlayerSessionLog objects
@@ -79,102 +99,78 @@ def load_sessions_from_csv_file(csv_file: StringIO) -> list[PlayerSessionLog]:
     return sessions
 
 
-async def get_ledger_csv_file_contents(
-    guild_id: str,
-    s3_service: S3Service,
-) -> list[StringIO]:
-    """
-    Gets contents of ledger CSV files from S3 for a guild.
+def summarize_ledger_sessions(sessions: list[PlayerSessionLog]) -> FileSummary:
+    """Build the manifest summary of a ledger file from its parsed sessions."""
+    return FileSummary(
+        session_date=min(session.session_start_at for session in sessions).date() if sessions else None,
+        player_ids=sorted({session.player_id for session in sessions}),
+    )
 
-    Args:
-        guild_id: Discord guild ID to get files for
 
-    Returns:
-        List of csv file contents for each ledger CSV file
-    """
-    csv_files: list[StringIO] = []
-    try:
-        file_names, _ = await s3_service.list_files(guild_id, "ledgers")
-        for file_name in file_names:
-            if file_name.endswith(".csv"):
-                # Get the object from S3
-                success, file_content = await s3_service.get_file(guild_id, file_name, "ledgers")
-                if not success:
-                    raise Exception(file_content)
-                # Create a StringIO object
-                csv_file = StringIO(file_content)
-                csv_files.append(csv_file)
-    except Exception as e:
-        logger.error(f"Error accessing S3: {e}")
-        raise
+def summarize_ledger_content(file_content: str) -> FileSummary:
+    """Build the manifest summary of a ledger file from its raw CSV content."""
+    return summarize_ledger_sessions(load_sessions_from_csv_file(StringIO(file_content)))
 
-    return csv_files
 
+def parse_ledger_file_body(stored_body: StoredFileBody) -> tuple[list[PlayerSessionLog], str]:
+    """Parse a stored ledger file as it streams from S3. Returns (sessions, content hash)."""
+    content_hash = hashlib.sha256()
+    with stored_body.body:
+        sessions = load_sessions_from_csv_file(open_stored_body_stream(stored_body, content_hash.update))
+    return sessions, content_hash.hexdigest()
 
-async def load_all_ledger_sessions(guild_id: str, s3_service: S3Service) -> list[PlayerSessionLog]:
-    """
-    Loads and combines all poker sessions from CSV files in S3.
 
-    Args:
-        guild_id: Discord guild ID to load sessions for
-
-    Returns:
-        list of all sessions combined
+def parse_and_store_ledger_file_body(
+    guild_id: str, stored_body: StoredFileBody
+) -> tuple[list[PlayerSessionLog], str, bool]:
     """
-    all_sessions: list[PlayerSessionLog] = []
-    csv_files = await get_ledger_csv_file_contents(guild_id, s3_service)
-
-    for csv_file in csv_files:
-        sessions = load_sessions_from_csv_file(csv_file)
-        all_sessions.extend(sessions)
-
-    return all_sessions
-
-
-def consolidate_sessions_with_player_mapping_details(
-    session_logs: list[PlayerSessionLog], registered_players: list[RegisteredPlayer]
-) -> list[ConsolidatedPlayerSession]:
-    if not session_logs:
-        return []
+    Parse a downloaded ledger file and also write it to the guild's analytics database.
+    Returns (sessions, content hash, whether the ledger is in the analytics database).
+    """
+    sessions, content_hash = parse_ledger_file_body(stored_body)
+    stored_in_database = store_ledger_sessions(guild_id, content_hash, sessions)
+    return sessions, content_hash, stored_in_database
+
+
+def select_ledger_entries(manifest: GuildManifest, date_range: DateRange) -> list[ManifestEntry]:
+    """Select the ledger files that can hold sessions starting within a date range."""
+    start_date, end_date = date_range
+    # A ledger's session date is its earliest session start, so a ledger from the day before
+    # the range can still hold sessions that start after midnight within it
+    manifest_start_date = start_date - datetime.timedelta(days=1) if start_date else None
+    return [
+        entry
+        for entry in select_manifest_entries(manifest, "ledgers", None, manifest_start_date, end_date)
+        if entry.filename.endswith(".csv")
+    ]
 
-    # Helper function to create a consolidated session from a group of sessions
-    def create_consolidated_session(nickname: str, date_val: datetime.date, sessions_list: list[PlayerSessionLog]):
-        total_time_played_ms = sum(
-            get_difference_in_ms(session.session_start_at, session.session_end_at) for session in sessions_list
-        )
-        total_net_dollars = sum((session.net_dollars for session in sessions_list), Decimal(0))
-        total_buy_in_dollars = sum((session.buy_in_dollars for session in sessions_list), Decimal(0))
-        return ConsolidatedPlayerSession(
-            player_nickname_lowercase=nickname,
-            net_dollars=total_net_dollars,
-            date=date_val,
-            time_played_ms=total_time_played_ms,
-            buy_in_dollars=total_buy_in_dollars,
-        )
 
-    # 1. Process registered players
-    sessions_by_player_and_date = {}
+def map_session_players_to_names(
+    session_players: list[tuple[str, str]], registered_players: list[RegisteredPlayer]
+) -> list[tuple[str, str, str]]:
+    """
+    Attribute the (player ID, nickname) pairs of ledger sessions to player names.
+    A pair is attributed to every registered player whose IDs, nicknames or name it matches.
+    Other pairs keep their nickname as the name, unless the nickname is a registered player's name or nickname
+    or was seen with a registered player's ID. Pairs left out are not consolidated.
 
+    Returns:
+        (player ID, nickname, player name) rows
+    """
+    player_names: list[tuple[str, str, str]] = []
     for registered_player in registered_players:
         player_name = registered_player.player_name_lowercase
+        player_names.extend(
+            (player_id, nickname, player_name)
+            for player_id, nickname in session_players
+            if player_id in registered_player.player_ids
+            or nickname in registered_player.player_nicknames_lowercase
+            or nickname == player_name
+        )
 
-        # Find sessions belonging to this player
-        for session_log in session_logs:
-            if (
-                session_log.player_id in registered_player.player_ids
-                or session_log.player_nickname_lowercase in registered_player.player_nicknames_lowercase
-                or session_log.player_nickname_lowercase == player_name
-            ):
-                session_date = session_log.session_start_at.date()
-                key = (player_name, session_date)
-
-                sessions_by_player_and_date.setdefault(key, []).append(session_log)
-
-    # 2. Identify processed sessions
     processed_player_ids = {
         player_id for registered_player in registered_players for player_id in registered_player.player_ids
     }
-
     processed_nicknames = (
         {registered_player.player_name_lowercase for registered_player in registered_players}
         | {
@@ -182,28 +178,167 @@ def consolidate_sessions_with_player_mapping_details(
             for registered_player in registered_players
             for nickname in registered_player.player_nicknames_lowercase
         }
-        | {
-            session_log.player_nickname_lowercase
-            for session_log in session_logs
-            if session_log.player_id in processed_player_ids
-        }
+        | {nickname for player_id, nickname in session_players if player_id in processed_player_ids}
+    )
+    player_names.extend(
+        (player_id, nickname, nickname)
+        for player_id, nickname in session_players
+        if nickname not in processed_nicknames
+    )
+    return player_names
+
+
+def fill_session_player_names(
+    connection: sqlite3.Connection, registered_players: list[RegisteredPlayer], date_bounds: tuple[str, str]
+) -> None:
+    """
+    Fill the temporary session_player_names table attributing the players of the selected ledger sessions
+    within the date bounds to names, see map_session_players_to_names and select_stored_files.
+    """
+    session_players = connection.execute(
+        """
+        SELECT DISTINCT player_id, player_nickname FROM sessions
+        WHERE session_date BETWEEN ? AND ? AND content_hash IN (SELECT content_hash FROM temp.selected_files)
+        """,
+        date_bounds,
+    ).fetchall()
+    connection.execute("CREATE TEMP TABLE session_player_names (player_id TEXT, player_nickname TEXT, name TEXT)")
+    connection.executemany(
+        "INSERT INTO temp.session_player_names VALUES (?, ?, ?)",
+        map_session_players_to_names(session_players, registered_players),
+    )
+
+
+def query_consolidated_sessions(
+    guild_id: str,
+    content_hashes: list[str],
+    registered_players: list[RegisteredPlayer],
+    date_range: DateRange = (None, None),
+) -> list[ConsolidatedPlayerSession]:
+    """
+    Consolidate ledger sessions in the guild's analytics database, summed per player name and date in SQL.
+
+    Args:
+        guild_id: Discord guild ID to query
+        content_hashes: Content hashes of the ledger files to include
+        registered_players: Registered players to attribute sessions to
+        date_range: Only include sessions starting within this inclusive (start date, end date) range
+
+    Returns:
+        Consolidated sessions ordered by player name and date
+    """
+    date_bounds = get_date_bounds(date_range)
+    with closing(open_analytics_database(guild_id)) as connection:
+        select_stored_files(connection, content_hashes)
+        fill_session_player_names(connection, registered_players, date_bounds)
+        rows = connection.execute(
+            """
+            SELECT names.name, sessions.session_date, SUM(sessions.end_ms - sessions.start_ms),
+                SUM(sessions.net_cents), SUM(sessions.buy_in_cents)
+            FROM sessions JOIN temp.session_player_names AS names USING (player_id, player_nickname)
+            WHERE sessions.session_date BETWEEN ? AND ?
+                AND sessions.content_hash IN (SELECT content_hash FROM temp.selected_files)
+            GROUP BY names.name, sessions.session_date
+            ORDER BY names.name, sessions.session_date
+            """,
+            date_bounds,
+        ).fetchall()
+
+    return [
+        ConsolidatedPlayerSession(
+            player_nickname_lowercase=name,
+            date=datetime.date.fromisoformat(session_date),
+            time_played_ms=time_played_ms,
+            net_dollars=Decimal(net_cents) / 100,
+            buy_in_dollars=Decimal(buy_in_cents) / 100,
+        )
+        for name, session_date, time_played_ms, net_cents, buy_in_cents in rows
+    ]
+
+
+async def store_ledger_entries(guild_id: str, s3_service: S3Service, entries: list[ManifestEntry]) -> list[str]:
+    """
+    Download, parse and store ledger files in the guild's analytics database, backfilling their manifest summaries.
+
+    Returns:
+        Content hashes of the files that are now in the analytics database
+    """
+    logger.info(f"Storing {len(entries)} ledgers missing from the analytics database of guild {guild_id}")
+
+    async def download(entry: ManifestEntry) -> StoredFileBody:
+        return await s3_service.download_file_body(guild_id, entry.filename, "ledgers")
+
+    parsed_files = await run_download_parse_pipeline(
+        entries, download, lambda _, stored_body: parse_and_store_ledger_file_body(guild_id, stored_body)
     )
+    await record_file_summaries(
+        guild_id,
+        s3_service,
+        {
+            entry.key: (content_hash, summarize_ledger_sessions(sessions))
+            for entry, (sessions, content_hash, _) in zip(entries, parsed_files, strict=True)
+            if entry.summary is None
+        },
+    )
+    return [content_hash for _, content_hash, stored_in_database in parsed_files if stored_in_database]
 
-    # 3. Process unmapped sessions
-    unmapped_sessions = [s for s in session_logs if s.player_nickname_lowercase not in processed_nicknames]
 
-    # Group sessions by nickname and date
-    for session in unmapped_sessions:
-        nickname = session.player_nickname_lowercase
-        date = session.session_start_at.date()
-        key = (nickname, date)
+async def load_stored_ledger_hashes(
+    guild_id: str, s3_service: S3Service, date_range: DateRange = (None, None)
+) -> list[str]:
+    """
+    Make sure the ledger files that can hold sessions in a date range are in the guild's analytics database.
+    Files missing from the database are downloaded, parsed and stored first, which also backfills their summaries.
 
-        sessions_by_player_and_date.setdefault(key, []).append(session)
+    Args:
+        guild_id: Discord guild ID to load ledgers for
+        date_range: Only select ledgers that can hold sessions within this inclusive (start date, end date) range
 
-    # 4. Create consolidated sessions from all grouped sessions
-    consolidated_sessions = [
-        create_consolidated_session(player, date, sessions)
-        for (player, date), sessions in sessions_by_player_and_date.items()
+    Returns:
+        Content hashes of the selected ledger files, leaving out any that could not be stored
+    """
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    entries = select_ledger_entries(manifest, date_range)
+    stored_hashes = await asyncio.to_thread(get_stored_content_hashes, guild_id, "ledgers")
+    missed_entries = [entry for entry in entries if entry.content_hash not in stored_hashes]
+    content_hashes = [
+        entry.content_hash
+        for entry in entries
+        if entry.content_hash is not None and entry.content_hash in stored_hashes
     ]
 
-    return consolidated_sessions
+    if missed_entries:
+        stored_content_hashes = await store_ledger_entries(guild_id, s3_service, missed_entries)
+        content_hashes.extend(stored_content_hashes)
+        unstored_count = len(missed_entries) - len(stored_content_hashes)
+        if unstored_count:
+            logger.warning(
+                f"Leaving out {unstored_count} ledgers that could not be stored in the analytics database "
+                f"of guild {guild_id}, they are stored again on the next load"
+            )
+
+    return content_hashes
+
+
+async def load_all_consolidated_sessions(
+    guild_id: str,
+    s3_service: S3Service,
+    registered_players: list[RegisteredPlayer],
+    date_range: DateRange = (None, None),
+) -> list[ConsolidatedPlayerSession]:
+    """
+    Load consolidated ledger sessions from the guild's analytics database, see query_consolidated_sessions.
+    Only ledgers missing from the database are downloaded and parsed, which also stores them.
+
+    Args:
+        guild_id: Discord guild ID to load sessions for
+        registered_players: Registered players to attribute sessions to
+        date_range: Only include sessions starting within this inclusive (start date, end date) range
+
+    Returns:
+        Consolidated sessions ordered by player name and date
+    """
+    content_hashes = await load_stored_ledger_hashes(guild_id, s3_service, date_range)
+    return await asyncio.to_thread(
+        query_consolidated_sessions, guild_id, content_hashes, registered_players, date_range
+    )
@@ -0,0 +1,67 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from logging import getLogger
+from typing import TypeVar
+
+from src.config.load_config import LoadConfig
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+D = TypeVar("D")
+R = TypeVar("R")
+
+
+async def run_download_parse_pipeline(
+    items: Sequence[T],
+    download: Callable[[T], Awaitable[D]],
+    parse: Callable[[T, D], R],
+) -> list[R]:
+    """
+    Download and parse items with a producer/consumer pipeline.
+    Downloaders feed a bounded queue, and parse workers pick up each download as soon as it finishes,
+    so network and CPU time overlap. A full queue pauses the downloaders, capping memory.
+
+    Args:
+        items: Items to load, e.g. manifest entries
+        download: Coroutine fetching the raw data of an item
+        parse: Blocking function parsing an item's raw data, run in a worker thread
+
+    Returns:
+        Parsed results in the same order as items
+    """
+    results: list[R | None] = [None] * len(items)
+    pending = iter(enumerate(items))
+    queue: asyncio.Queue[tuple[int, D] | None] = asyncio.Queue(maxsize=LoadConfig.MAX_QUEUED_DOWNLOADS)
+    parse_workers = min(LoadConfig.PARSE_WORKERS, len(items))
+
+    async def downloader() -> None:
+        for index, item in pending:
+            data = await download(item)
+            await queue.put((index, data))
+
+    async def download_all() -> None:
+        async with asyncio.TaskGroup() as download_group:
+            for _ in range(min(LoadConfig.MAX_CONCURRENT_DOWNLOADS, len(items))):
+                download_group.create_task(downloader())
+        for _ in range(parse_workers):
+            await queue.put(None)
+
+    async def parse_worker() -> None:
+        while (queued := await queue.get()) is not None:
+            index, data = queued
+            results[index] = await asyncio.to_thread(parse, items[index], data)
+
+    try:
+        async with asyncio.TaskGroup() as pipeline_group:
+            pipeline_group.create_task(download_all())
+            for _ in range(parse_workers):
+                pipeline_group.create_task(parse_worker())
+    except ExceptionGroup as eg:
+        # Surface the first failure as is, callers report its message to users
+        first_error = eg.exceptions[0]
+        while isinstance(first_error, ExceptionGroup):
+            first_error = first_error.exceptions[0]
+        raise first_error from None
+
+    return [result for result in results if result is not None]
@@ -1,13 +1,35 @@
+import asyncio
 import csv
+import hashlib
 import re
+from collections.abc import Collection, Iterable
 from decimal import Decimal, InvalidOperation
 from io import StringIO
 from logging import getLogger
 from typing import cast
 
+from src.config.cache_config import CacheConfig
+from src.dataingestion.analytics_database import get_stored_content_hashes, store_poker_log
+from src.dataingestion.byte_budget_cache import ByteBudgetLRUCache
+from src.dataingestion.columnar_hand_store import (
+    ColumnarPokerLog,
+    get_stored_entry_directory,
+    open_columnar_log,
+    store_columnar_log,
+)
+from src.dataingestion.file_manifest_helpers import (
+    DateRange,
+    is_in_date_range,
+    load_guild_manifest,
+    record_file_summaries,
+    select_manifest_entries,
+)
+from src.dataingestion.load_pipeline import run_download_parse_pipeline
+from src.dataingestion.schemas.file_manifest import FileSummary, GuildManifest, ManifestEntry, StoredFileBody
 from src.dataingestion.schemas.poker_log import PokerLog
+from src.dataingestion.registered_player_helpers import fingerprint_registered_players
 from src.dataingestion.schemas.registered_player import RegisteredPlayer
-from src.discordbot.services.s3_service import S3Service
+from src.discordbot.services.s3_service import S3Service, open_stored_body_stream
 from src.dataingestion.schemas.board_action import BoardAction
 from src.dataingestion.schemas.board_move import BoardMove
 from src.dataingestion.schemas.card import Card
@@ -20,6 +42,16 @@ from src.dataingestion.common_utils import parse_utc_datetime
 
 logger = getLogger(__name__)
 
+# Bump whenever parsing output changes, so logs parsed by an older parser are not served from the cache
+PARSER_VERSION = 1
+
+# (guild ID, object key, ETag, parser version, registered players fingerprint)
+ParsedLogCacheKey = tuple[str, str, str, int, str]
+
+parsed_log_cache: ByteBudgetLRUCache[ParsedLogCacheKey, PokerLog] = ByteBudgetLRUCache(
+    "parsed poker logs", CacheConfig.PARSED_LOG_CACHE_MAX_BYTES
+)
+
 VALID_RANKS: set[str] = {rank.value for rank in CardRank}
 
 
@@ -303,40 +335,46 @@ def is_admin_log(entry: str) -> bool:
     return any(pattern in entry for pattern in admin_patterns)
 
 
-def parse_poker_log(log_file: StringIO, registered_players: list[RegisteredPlayer]) -> PokerLog:
+def parse_poker_log(log_file: Iterable[str], registered_players: list[RegisteredPlayer]) -> PokerLog:
     """
     Parse a poker log file into a list of PokerHand objects.
     
     Args:
-        log_file: StringIO object containing the poker log CSV data
+        log_file: StringIO object or S3 text stream containing the poker log CSV data
         
     Returns:
         List of PokerHand objects
     """
     hands = []
+    # Entries of the hand being read, newest first
     current_hand_entries = []
-    
-    # Read CSV in reverse order since the log is in reverse chronological order
-    rows = list(csv.DictReader(log_file))[::-1]
-    
-    for row in rows:
+    oldest_row = None
+
+    # The log is in reverse chronological order, so it is streamed as is and each hand is read
+    # from its end to its start, only reversing that hand's entries
+    for row in csv.DictReader(log_file):
+        oldest_row = row
         # Skip administrative logs
         if is_admin_log(row["entry"]):
             continue
-            
+
         if "starting hand" in row["entry"]:
-            # Start collecting entries for a new hand
+            if current_hand_entries:
+                # Parse completed hand
+                current_hand_entries.append(row)
+                hands.append(parse_poker_hand(current_hand_entries[::-1], registered_players))
+                current_hand_entries = []
+        elif "ending hand" in row["entry"]:
+            # Start collecting entries for a new hand, dropping a later hand whose start is missing
             current_hand_entries = [row]
         elif current_hand_entries:
             # Add entry to current hand
             current_hand_entries.append(row)
-            if "ending hand" in row["entry"]:
-                # Parse completed hand
-                hand = parse_poker_hand(current_hand_entries, registered_players)
-                hands.append(hand)
-                current_hand_entries = []
 
-    date = parse_utc_datetime(rows[0]["at"]).date()
+    if oldest_row is None:
+        raise ValueError("Poker log has no entries")
+    hands.reverse()
+    date = parse_utc_datetime(oldest_row["at"]).date()
     registered_player_to_ids = build_nickname_to_player_ids_mapping(hands)
     
     return PokerLog(hands=hands, date=date, registered_player_to_ids=registered_player_to_ids)
@@ -362,58 +400,302 @@ def build_nickname_to_player_ids_mapping(hands: list[PokerHand]) -> dict[str, li
     return nickname_to_ids
         
 
-async def get_poker_log_file_contents(
-    guild_id: str,
-    s3_service: S3Service,
-) -> list[tuple[StringIO, str]]:
-    """
-    Gets contents of poker log CSV files from S3 for a guild.
+def summarize_poker_log(log: PokerLog) -> FileSummary:
+    """Build the manifest summary of a log file from its parsed log."""
+    player_ids = {player_id for hand in log.hands for player_id in hand.starting_stacks}
+    return FileSummary(session_date=log.date, hand_count=len(log.hands), player_ids=sorted(player_ids))
 
-    Args:
-        guild_id: Discord guild ID to get files for
 
-    Returns:
-        List of csv file contents for each poker log CSV file
-    """
-    csv_files_content_and_names: list[tuple[StringIO, str]] = []
+def summarize_poker_log_content(file_content: str) -> FileSummary:
+    """Build the manifest summary of a log file from its raw CSV content."""
+    return summarize_poker_log(parse_poker_log(StringIO(file_content), []))
+
+
+def parse_poker_log_file_body(
+    entry: ManifestEntry, stored_body: StoredFileBody, registered_players: list[RegisteredPlayer]
+) -> tuple[PokerLog, str]:
+    """Parse a stored poker log file as it streams from S3. Returns (log, content hash)."""
+    content_hash = hashlib.sha256()
     try:
-        file_names, _ = await s3_service.list_files(guild_id, "logs") 
-        for file_name in file_names:
-            if file_name.endswith(".csv"):
-                # Get the object from S3
-                success, file_content = await s3_service.get_file(guild_id, file_name, "logs")
-                if not success:
-                    raise Exception(file_content)
-                # Create a StringIO object
-                csv_file = StringIO(file_content)
-                csv_files_content_and_names.append((csv_file, file_name))
+        with stored_body.body:
+            log = parse_poker_log(open_stored_body_stream(stored_body, content_hash.update), registered_players)
     except Exception as e:
-        logger.error(f"Error accessing S3: {e}")
+        logger.error(f"Error parsing poker log {entry.filename}: {e}")
         raise
+    return log, content_hash.hexdigest()
+
 
-    return csv_files_content_and_names
+def parse_and_store_poker_log_file_body(
+    guild_id: str, entry: ManifestEntry, stored_body: StoredFileBody, registered_players: list[RegisteredPlayer]
+) -> tuple[PokerLog, str, bool]:
+    """
+    Parse a downloaded poker log file and also write it to the local columnar hand store and analytics database.
+    Returns (log, content hash, whether the log is in the analytics database).
+    """
+    log, content_hash = parse_poker_log_file_body(entry, stored_body, registered_players)
+    store_columnar_log(guild_id, content_hash, log)
+    stored_in_database = store_poker_log(guild_id, content_hash, log)
+    return log, content_hash, stored_in_database
+
+
+def estimate_poker_log_size(log: PokerLog) -> int:
+    """Estimate the memory a parsed log holds, which is dominated by its hand actions."""
+    action_count = sum(len(hand.actions_in_chronological_order) for hand in log.hands)
+    return (action_count + len(log.hands)) * CacheConfig.ESTIMATED_BYTES_PER_PARSED_ACTION
+
+
+def get_parsed_log_cache_key(guild_id: str, entry: ManifestEntry, players_fingerprint: str) -> ParsedLogCacheKey:
+    """Key a parsed log by the exact object version it came from, so overwritten files are never served stale."""
+    return (guild_id, entry.key, entry.etag, PARSER_VERSION, players_fingerprint)
 
 
-async def load_all_poker_logs(guild_id: str, s3_service: S3Service, registered_players: list[RegisteredPlayer]) -> list[PokerLog]:
+def invalidate_cached_poker_logs(guild_id: str, entry_keys: Collection[str]) -> int:
+    """
+    Drop the cached parsed logs of deleted files, which could otherwise only leave the cache by eviction.
+    Returns the number of logs dropped.
+    """
+    return parsed_log_cache.invalidate(lambda key: key[0] == guild_id and key[1] in entry_keys)
+
+
+def select_log_entries(
+    manifest: GuildManifest, latest_sessions: int | None, date_range: DateRange
+) -> list[ManifestEntry]:
+    """Select the log files of the most recent sessions within a date range, see select_manifest_entries."""
+    start_date, end_date = date_range
+    return [
+        entry
+        for entry in select_manifest_entries(manifest, "logs", latest_sessions, start_date, end_date)
+        if entry.filename.endswith(".csv")
+    ]
+
+
+async def load_all_poker_logs(
+    guild_id: str,
+    s3_service: S3Service,
+    registered_players: list[RegisteredPlayer],
+    latest_sessions: int | None = None,
+    date_range: DateRange = (None, None),
+) -> list[PokerLog]:
     """
     Loads and combines all poker hands from CSV files in S3.
+    Files are parsed as soon as each download finishes, see run_download_parse_pipeline.
+    Limits are pushed down to the manifest session dates, so files outside them are never downloaded.
+    Parsed logs are kept in parsed_log_cache, so repeated loads only download and parse new or changed files.
 
     Args:
         guild_id: Discord guild ID to load hands for
+        latest_sessions: Only load the logs of the most recent N sessions. If None, loads all logs.
+        date_range: Only load logs of sessions within this inclusive (start date, end date) range
 
     Returns:
-        list of all poker hands combined
+        list of all poker hands combined, oldest session first
     """
+    start_date, end_date = date_range
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    entries = select_log_entries(manifest, latest_sessions, date_range)
+
+    players_fingerprint = fingerprint_registered_players(registered_players)
+    cache_keys = [get_parsed_log_cache_key(guild_id, entry, players_fingerprint) for entry in entries]
+    cached_logs = [parsed_log_cache.get(cache_key) for cache_key in cache_keys]
+    missed_entries = [entry for entry, log in zip(entries, cached_logs, strict=True) if log is None]
+
+    async def download(entry: ManifestEntry) -> StoredFileBody:
+        return await s3_service.download_file_body(guild_id, entry.filename, "logs")
+
+    parsed_files = await run_download_parse_pipeline(
+        missed_entries,
+        download,
+        lambda entry, stored_body: parse_and_store_poker_log_file_body(
+            guild_id, entry, stored_body, registered_players
+        ),
+    )
+    parsed_files_by_key = {entry.key: parsed for entry, parsed in zip(missed_entries, parsed_files, strict=True)}
+    logger.info(
+        f"Loaded {len(entries)} poker logs for guild {guild_id}, {len(entries) - len(missed_entries)} from cache "
+        f"({parsed_log_cache.stats()})"
+    )
+
     all_logs: list[PokerLog] = []
-    csv_files_with_names = await get_poker_log_file_contents(guild_id, s3_service)
+    missing_summaries: dict[str, tuple[str, FileSummary]] = {}
+    loaded_hashes: set[str] = set()
+    for entry, cache_key, cached_log in zip(entries, cache_keys, cached_logs, strict=True):
+        if cached_log is not None:
+            log, content_hash = cached_log, entry.content_hash
+        else:
+            log, content_hash, _ = parsed_files_by_key[entry.key]
+            parsed_log_cache.put(cache_key, log, estimate_poker_log_size(log))
+            if entry.summary is None:
+                missing_summaries[entry.key] = (content_hash, summarize_poker_log(log))
+
+        # Files uploaded before deduplication only get a known hash once parsed, their hands are counted once
+        if content_hash is not None:
+            if content_hash in loaded_hashes:
+                logger.info(f"Skipping {entry.filename}, it has the same content as an earlier poker log")
+                continue
+            loaded_hashes.add(content_hash)
+        all_logs.append(log)
+
+    await record_file_summaries(guild_id, s3_service, missing_summaries)
+
+    # Files without a summary had unknown dates, so the limits are applied again on the parsed dates
+    all_logs = sorted(
+        (log for log in all_logs if is_in_date_range(log.date, start_date, end_date)),
+        key=lambda log: log.date,
+    )
+    if latest_sessions is not None:
+        all_logs = all_logs[max(len(all_logs) - latest_sessions, 0) :]
+    return all_logs
 
-    for csv_file, file_name in csv_files_with_names:
-        try:
-            log = parse_poker_log(csv_file, registered_players)
-            all_logs.append(log)
-        except Exception as e:
-            logger.error(f"Error parsing poker log {file_name}: {e}")
-            raise
 
+async def store_poker_log_entries(guild_id: str, s3_service: S3Service, entries: list[ManifestEntry]) -> list[str]:
+    """
+    Download, parse and store log files in the local stores, backfilling their manifest summaries.
+
+    Returns:
+        Content hashes of the files that are now in the analytics database
+    """
+    logger.info(f"Storing {len(entries)} poker logs missing from the local stores for guild {guild_id}")
+
+    async def download(entry: ManifestEntry) -> StoredFileBody:
+        return await s3_service.download_file_body(guild_id, entry.filename, "logs")
+
+    # Registered players only affect the parsed PokerLog, the stores keep raw player IDs and nicknames
+    parsed_files = await run_download_parse_pipeline(
+        entries,
+        download,
+        lambda entry, stored_body: parse_and_store_poker_log_file_body(guild_id, entry, stored_body, []),
+    )
+    await record_file_summaries(
+        guild_id,
+        s3_service,
+        {
+            entry.key: (content_hash, summarize_poker_log(log))
+            for entry, (log, content_hash, _) in zip(entries, parsed_files, strict=True)
+            if entry.summary is None
+        },
+    )
+    return [content_hash for _, content_hash, stored_in_database in parsed_files if stored_in_database]
+
+
+def open_stored_entries(
+    guild_id: str, entries: list[ManifestEntry], action_columns: list[str] | None
+) -> list[ColumnarPokerLog | None]:
+    """Open the stored columns of log files, None for files that are not in the store."""
+    logs: list[ColumnarPokerLog | None] = []
+    for entry in entries:
+        directory = get_stored_entry_directory(guild_id, entry)
+        logs.append(open_columnar_log(directory, None, action_columns) if directory else None)
+    return logs
+
+
+async def load_stored_poker_log_entries(
+    guild_id: str,
+    s3_service: S3Service,
+    latest_sessions: int | None = None,
+    date_range: DateRange = (None, None),
+) -> list[ManifestEntry]:
+    """
+    Make sure the selected log files are in the local date-partitioned columnar store, see get_stored_entry_directory.
+    Files missing from the store are downloaded, parsed and stored first, which also backfills their summaries.
+
+    Args:
+        guild_id: Discord guild ID to load logs for
+        latest_sessions: Only select the logs of the most recent N sessions. If None, selects all logs.
+        date_range: Only select logs of sessions within this inclusive (start date, end date) range
+
+    Returns:
+        Manifest entries of the selected log files, oldest session first
+    """
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    entries = select_log_entries(manifest, latest_sessions, date_range)
+    stored_logs = await asyncio.to_thread(open_stored_entries, guild_id, entries, [])
+    missed_entries = [entry for entry, log in zip(entries, stored_logs, strict=True) if log is None]
+
+    if missed_entries:
+        await store_poker_log_entries(guild_id, s3_service, missed_entries)
+
+        # Summaries were backfilled, so entries that had unknown dates can now be limited and opened
+        manifest = await load_guild_manifest(guild_id, s3_service)
+        entries = select_log_entries(manifest, latest_sessions, date_range)
+        stored_logs = await asyncio.to_thread(open_stored_entries, guild_id, entries, [])
+
+    stored_entries: list[tuple[ColumnarPokerLog, ManifestEntry]] = []
+    for entry, log in zip(entries, stored_logs, strict=True):
+        if log is None:
+            raise ValueError(f"Could not store poker log {entry.filename}")
+        stored_entries.append((log, entry))
+    return [entry for _, entry in sorted(stored_entries, key=lambda stored_entry: stored_entry[0].session_date)]
+
+
+async def load_all_columnar_poker_logs(
+    guild_id: str,
+    s3_service: S3Service,
+    latest_sessions: int | None = None,
+    date_range: DateRange = (None, None),
+    action_columns: list[str] | None = None,
+) -> list[ColumnarPokerLog]:
+    """
+    Load poker logs from the local date-partitioned columnar store, see open_columnar_log.
+    Only the partitions in the date range and the requested action columns are read,
+    files missing from the store are stored first, see load_stored_poker_log_entries.
+
+    Args:
+        guild_id: Discord guild ID to load logs for
+        latest_sessions: Only load the logs of the most recent N sessions. If None, loads all logs.
+        date_range: Only load logs of sessions within this inclusive (start date, end date) range
+        action_columns: Action columns to read, all of them if None. Hand tables are small and always read whole.
+
+    Returns:
+        list of columnar logs, oldest session first
+    """
+    entries = await load_stored_poker_log_entries(guild_id, s3_service, latest_sessions, date_range)
+    stored_logs = await asyncio.to_thread(open_stored_entries, guild_id, entries, action_columns)
+
+    all_logs: list[ColumnarPokerLog] = []
+    for entry, log in zip(entries, stored_logs, strict=True):
+        if log is None:
+            raise ValueError(f"Could not open stored poker log {entry.filename}")
+        all_logs.append(log)
     return all_logs
 
+
+async def load_stored_poker_log_hashes(
+    guild_id: str,
+    s3_service: S3Service,
+    latest_sessions: int | None = None,
+    date_range: DateRange = (None, None),
+) -> list[str]:
+    """
+    Make sure the selected log files are in the guild's analytics database, for queries restricted to them.
+    Files missing from the database are downloaded, parsed and stored first, which also backfills their summaries.
+
+    Args:
+        guild_id: Discord guild ID to load logs for
+        latest_sessions: Only select the logs of the most recent N sessions. If None, selects all logs.
+        date_range: Only select logs of sessions within this inclusive (start date, end date) range
+
+    Returns:
+        Content hashes of the selected log files, leaving out any that could not be stored
+    """
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    entries = select_log_entries(manifest, latest_sessions, date_range)
+    stored_hashes = await asyncio.to_thread(get_stored_content_hashes, guild_id, "logs")
+    missed_entries = [entry for entry in entries if entry.content_hash not in stored_hashes]
+    if not missed_entries:
+        return [entry.content_hash for entry in entries if entry.content_hash is not None]
+
+    stored_hashes.update(await store_poker_log_entries(guild_id, s3_service, missed_entries))
+    # Summaries were backfilled, so entries that had unknown dates can now be limited
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    content_hashes = [
+        entry.content_hash
+        for entry in select_log_entries(manifest, latest_sessions, date_range)
+        if entry.content_hash is not None
+    ]
+    unstored_hashes = [content_hash for content_hash in content_hashes if content_hash not in stored_hashes]
+    if unstored_hashes:
+        logger.warning(
+            f"Leaving out {len(unstored_hashes)} poker logs that could not be stored in the analytics database "
+            f"of guild {guild_id}, they are stored again on the next load"
+        )
+    return [content_hash for content_hash in content_hashes if content_hash in stored_hashes]
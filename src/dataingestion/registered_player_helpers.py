@@ -1,3 +1,4 @@
+import hashlib
 import json
 from logging import getLogger
 
@@ -48,3 +49,11 @@ async def load_registered_players(guild_id: str, s3_service: S3Service) -> list[
     except Exception as e:
         logger.error(f"Error loading player mapping from S3: {e}")
         return []
+
+
+def fingerprint_registered_players(registered_players: list[RegisteredPlayer]) -> str:
+    """Get a hash that changes whenever the registered player mappings change, for keying cached parse results."""
+    content_hash = hashlib.sha256()
+    for registered_player in sorted(registered_players, key=lambda player: player.player_name_lowercase):
+        content_hash.update(registered_player.model_dump_json().encode())
+    return content_hash.hexdigest()
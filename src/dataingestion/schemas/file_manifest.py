@@ -0,0 +1,35 @@
+from datetime import date, datetime
+
+from botocore.response import StreamingBody
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class FileSummary(BaseModel):
+    session_date: date | None = None
+    hand_count: int | None = None  # Only known for log files
+    player_ids: list[str] = Field(default_factory=list)
+
+
+class StoredObject(BaseModel):
+    key: str
+    filename: str
+    etag: str
+    size_bytes: int  # Size of the stored (possibly compressed) object
+    last_modified: datetime
+
+
+class ManifestEntry(StoredObject):
+    file_type: str
+    content_hash: str | None = None  # sha256 of the uncompressed file content
+    summary: FileSummary | None = None  # None until the file has been parsed once
+
+
+class GuildManifest(BaseModel):
+    entries: dict[str, ManifestEntry] = Field(default_factory=dict)  # object key -> entry
+
+
+class StoredFileBody(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    body: StreamingBody  # Open S3 response body of the stored bytes, still compressed, read once by the parser
+    compression: str | None = None
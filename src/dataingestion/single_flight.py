@@ -0,0 +1,32 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from logging import getLogger
+from typing import Any, Generic, TypeVar
+
+logger = getLogger(__name__)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Coalesces concurrent calls with the same key into a single in-flight computation whose result,
+    or exception, every caller receives. Only calls that overlap are coalesced, nothing is cached.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._in_flight: dict[K, asyncio.Task[V]] = {}
+
+    async def run(self, key: K, work: Callable[[], Coroutine[Any, Any, V]]) -> V:
+        """Run work for a key, or wait for the run already in flight for it."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight {self.name} for {key}")
+        # Shielded so a caller that gives up does not cancel the work the other callers are waiting on
+        return await asyncio.shield(task)
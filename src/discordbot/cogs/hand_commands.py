@@ -0,0 +1,144 @@
+import asyncio
+from collections.abc import Callable
+from functools import partial
+from logging import getLogger
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from src.analytics.guild_dataset_cache import GuildDatasetCache, get_shared_guild_dataset_cache
+from src.analytics.hand_browser import (
+    HandCursor,
+    HandFilter,
+    HandPage,
+    HandSortOrder,
+    format_hand_page,
+    query_hand_page,
+)
+from src.config.hand_browser_config import HandBrowserConfig
+from src.dataingestion.poker_hand_parser import load_stored_poker_log_hashes
+from src.discordbot.cogs.graph_commands import END_DATE_DESCRIPTION, START_DATE_DESCRIPTION
+from src.discordbot.helpers.cache_warmup import ForegroundActivity, get_shared_foreground_activity
+from src.discordbot.helpers.validation_helpers import parse_date_range_options
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
+
+logger = getLogger(__name__)
+
+
+class HandPageView(discord.ui.View):
+    """Turns the pages of a /hands result, each page continuing from the cursor of the one before."""
+
+    def __init__(
+        self,
+        user_id: int,
+        query: Callable[[HandCursor | None], HandPage],
+        hand_filter: HandFilter,
+        first_page: HandPage,
+    ) -> None:
+        super().__init__(timeout=HandBrowserConfig.VIEW_TIMEOUT_SECONDS)
+        self.user_id = user_id
+        self.query = query
+        self.hand_filter = hand_filter
+        self.page_number = 1
+        self.next_cursor = first_page.next_cursor
+        self.next_page.disabled = first_page.next_cursor is None
+        self.message: discord.WebhookMessage | None = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("Only the user who ran /hands can turn its pages.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self) -> None:
+        self.next_page.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException as e:
+                logger.warning(f"Could not disable the hands page button: {e}")
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button["HandPageView"]) -> None:
+        try:
+            page = await asyncio.to_thread(self.query, self.next_cursor)
+        except Exception as e:
+            logger.error(f"Error loading the next page of hands: {e}")
+            await interaction.response.send_message("An error occurred while loading the next page.", ephemeral=True)
+            return
+
+        self.page_number += 1
+        self.next_cursor = page.next_cursor
+        button.disabled = page.next_cursor is None
+        await interaction.response.edit_message(
+            content=format_hand_page(page, self.hand_filter, self.page_number), view=self
+        )
+
+
+class HandCommands(commands.Cog):
+    def __init__(
+        self,
+        bot: commands.Bot,
+        s3_service: S3Service,
+        dataset_cache: GuildDatasetCache,
+        foreground_activity: ForegroundActivity,
+    ) -> None:
+        self.bot = bot
+        self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
+        self.foreground_activity = foreground_activity
+
+    @app_commands.command(
+        name="hands",
+        description="Browse hands by pot size or recency, optionally only the hands a player played in",
+    )
+    @app_commands.describe(
+        player="Only include hands this registered player or nickname played in (optional)",
+        sort="Show the biggest pots or the most recent hands first (defaults to biggest pots)",
+        start_date=START_DATE_DESCRIPTION,
+        end_date=END_DATE_DESCRIPTION,
+    )
+    async def hands(
+        self,
+        interaction: discord.Interaction,
+        player: str | None = None,
+        sort: HandSortOrder = "pot",
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> None:
+        logger.info(f"Browsing hands for guild {interaction.guild_id}")
+        try:
+            await interaction.response.defer(thinking=True)
+            start, end = parse_date_range_options(start_date, end_date)
+            guild_id = str(interaction.guild_id)
+
+            async with self.foreground_activity.track():
+                # Logs missing from the analytics database are stored first, so every hand can be found
+                registered_players, log_hashes = await asyncio.gather(
+                    self.dataset_cache.get_registered_players(guild_id),
+                    load_stored_poker_log_hashes(guild_id, self.s3_service, None, (start, end)),
+                )
+                if not log_hashes:
+                    await interaction.followup.send("No poker hand data available yet.", ephemeral=True)
+                    return
+
+                hand_filter = HandFilter(player_name=player, date_range=(start, end), sort=sort)
+                # Later pages reuse the selected logs, so turning a page only reads the analytics database
+                query = partial(query_hand_page, guild_id, log_hashes, registered_players, hand_filter)
+                page = await asyncio.to_thread(query)
+
+            view = HandPageView(interaction.user.id, query, hand_filter, page)
+            view.message = await interaction.followup.send(format_hand_page(page, hand_filter, 1), view=view)
+        except Exception as e:
+            logger.error(f"Error browsing hands: {e}")
+            try:
+                await interaction.followup.send(f"An error occurred: {e!s}", ephemeral=True)
+            except Exception as e:
+                logger.error(f"Could not send error message: {e}")
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(
+        HandCommands(bot, get_shared_s3_service(), get_shared_guild_dataset_cache(), get_shared_foreground_activity())
+    )
@@ -4,6 +4,8 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from src.analytics.adhoc_query import QUERY_TABLES_DESCRIPTION
+
 logger = getLogger(__name__)
 
 
@@ -92,6 +94,28 @@ class HelpCommands(commands.Cog):
                     "- `/graph_played_time_totals` - See how much time each player has spent playing\n"
                     "- `/graph_profit_per_hour` - Analyze each player's profit per hour played\n"
                     "- `/graph_buy_in_analysis` - Analyze the relationship between buy-in amounts and final results\n"
+                    "- `/graph_player_stats` - See each player's VPIP, PFR, 3-bet, aggression factor and "
+                    "went to showdown stats from the hand logs\n"
+                    "- `/graph_showdown_hands` - See which hands each player showed at showdown, "
+                    "from high card to straight flush\n"
+                    "- `/hands` - Browse the biggest pots or most recent hands, optionally only a player's, "
+                    "a page at a time\n\n"
+                    "All graph commands accept optional `start_date` and `end_date` options (YYYY-MM-DD) "
+                    "to only include sessions in that date range.\n"
+                ),
+                inline=False,
+            )
+
+            # Add empty field as spacer
+            embed.add_field(name="\u200b", value="\u200b", inline=False)
+
+            # Ad-hoc Queries section
+            embed.add_field(
+                name="🔎 Ad-hoc Queries",
+                value=(
+                    "Admins can answer one-off questions with a read-only SQL `SELECT` using `/query`. "
+                    "Amounts are in cents, times are milliseconds since the epoch and dates are YYYY-MM-DD. "
+                    "The available tables are:\n\n" + QUERY_TABLES_DESCRIPTION
                 ),
                 inline=False,
             )
@@ -111,6 +135,8 @@ class HelpCommands(commands.Cog):
                     "- `/get_registered_players` - Fetch your current registered players file\n"
                     "- `/delete_ledger_file` - Delete a specific ledger file by name (admin only)\n"
                     "- `/delete_log_file` - Delete a specific log file by name (admin only)\n"
+                    "- `/delete_files` - Delete several ledger or log files by name at once (admin only)\n"
+                    "- `/delete_files_in_date_range` - Delete all ledger or log files in a date range (admin only)\n"
                     "- `/delete_registered_players` - Delete the registered players file (admin only)\n"
                 ),
                 inline=False,
@@ -1,20 +1,77 @@
+import asyncio
 from logging import getLogger
+from typing import Literal
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
+from src.analytics.guild_dataset_cache import GuildDatasetCache, get_shared_guild_dataset_cache
 from src.config.discord_config import DiscordConfig
-from src.discordbot.helpers.validation_helpers import validate_ledger_and_log_files
-from src.discordbot.services.s3_service import S3Service
+from src.dataingestion.analytics_database import remove_stored_files
+from src.dataingestion.columnar_hand_store import remove_stored_logs
+from src.dataingestion.file_manifest_helpers import (
+    find_manifest_entry,
+    get_manifest_entries,
+    load_guild_manifest,
+    remove_manifest_entries,
+)
+from src.dataingestion.ledger_session_helpers import store_ledger_entries
+from src.dataingestion.poker_hand_parser import invalidate_cached_poker_logs, store_poker_log_entries
+from src.dataingestion.schemas.file_manifest import ManifestEntry
+from src.discordbot.helpers.upload_helpers import upload_and_record_files
+from src.discordbot.helpers.validation_helpers import parse_date_option, validate_ledger_and_log_files
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
 
 logger = getLogger(__name__)
 
+# Maximum number of filenames listed per section of a batch delete reply, to stay under Discord's message limit
+MAX_LISTED_FILENAMES = 20
+
+
+def format_filenames(filenames: list[str]) -> str:
+    listed = ", ".join(filenames[:MAX_LISTED_FILENAMES])
+    if len(filenames) > MAX_LISTED_FILENAMES:
+        listed += f" and {len(filenames) - MAX_LISTED_FILENAMES} more"
+    return listed
+
 
 class LedgerAndLogCommands(commands.Cog):
-    def __init__(self, bot: commands.Bot, s3_service: S3Service) -> None:
+    def __init__(self, bot: commands.Bot, s3_service: S3Service, dataset_cache: GuildDatasetCache) -> None:
         self.bot = bot
         self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
+
+    async def _delete_manifest_entries(self, guild_id: str, entries: list[ManifestEntry]) -> tuple[bool, str]:
+        """
+        Delete files already known to exist from the manifest with batched S3 calls, then drop their entries.
+        Returns (success, message)
+        """
+        filenames_by_key = {entry.key: entry.filename for entry in entries}
+        deleted_keys, failed_keys = await self.s3_service.delete_keys(list(filenames_by_key))
+        if deleted_keys:
+            await remove_manifest_entries(guild_id, self.s3_service, deleted_keys)
+            self.dataset_cache.invalidate(guild_id)
+            deleted_entries = [entry for entry in entries if entry.key in deleted_keys]
+            deleted_logs = [entry for entry in deleted_entries if entry.file_type == "logs"]
+            await asyncio.to_thread(remove_stored_logs, guild_id, deleted_logs)
+            invalidate_cached_poker_logs(guild_id, {entry.key for entry in deleted_logs})
+            deleted_hashes = [entry.content_hash for entry in deleted_entries if entry.content_hash is not None]
+            await asyncio.to_thread(remove_stored_files, guild_id, deleted_hashes)
+
+        if len(entries) == 1:
+            filename = entries[0].filename
+            if deleted_keys:
+                return True, f"Successfully deleted {filename}"
+            return False, f"Failed to delete {filename}"
+
+        message = f"Deleted {len(deleted_keys)} files: {format_filenames([filenames_by_key[k] for k in deleted_keys])}"
+        if failed_keys:
+            message += (
+                f"\nFailed to delete {len(failed_keys)} files: "
+                f"{format_filenames([filenames_by_key[k] for k in failed_keys])}"
+            )
+        return not failed_keys, message
 
     @app_commands.command(
         name="upload_ledger_and_log_csv",
@@ -30,15 +87,23 @@ class LedgerAndLogCommands(commands.Cog):
             await interaction.response.defer(thinking=True)
             logger.info(f"Uploading ledger and log CSV files: {ledger_file.filename} and {log_file.filename}")
 
-            validation_result = await validate_ledger_and_log_files(ledger_file, log_file)
+            # Each attachment is downloaded once and the same bytes are validated and uploaded
+            ledger_content, log_content = await asyncio.gather(ledger_file.read(), log_file.read())
+
+            validation_result = await validate_ledger_and_log_files(
+                ledger_file.filename, ledger_content, log_file.filename, log_content
+            )
             if validation_result:
                 await interaction.followup.send(validation_result, ephemeral=True)
                 return
 
-            ledger_success, ledger_message = await self.s3_service.upload_file(
-                ledger_file, str(interaction.guild_id), "ledgers"
+            (ledger_success, ledger_message), (log_success, log_message) = await upload_and_record_files(
+                self.s3_service,
+                str(interaction.guild_id),
+                [(ledger_file.filename, ledger_content, "ledgers"), (log_file.filename, log_content, "logs")],
             )
-            log_success, log_message = await self.s3_service.upload_file(log_file, str(interaction.guild_id), "logs")
+            if ledger_success or log_success:
+                self.dataset_cache.invalidate(str(interaction.guild_id))
             await interaction.followup.send(ledger_message, ephemeral=not ledger_success)
             await interaction.followup.send(log_message, ephemeral=not log_success)
 
@@ -92,15 +157,16 @@ class LedgerAndLogCommands(commands.Cog):
             await interaction.response.defer(thinking=True)
             logger.info(f"Deleting ledger file {filename} for guild {interaction.guild_id}")
 
-            files, _ = await self.s3_service.list_files(str(interaction.guild_id), "ledgers")
-            if filename not in files:
+            manifest = await load_guild_manifest(str(interaction.guild_id), self.s3_service)
+            entry = find_manifest_entry(manifest, "ledgers", filename)
+            if entry is None:
                 await interaction.followup.send(
                     f"File '{filename}' not found in ledger files.",
                     ephemeral=True,
                 )
                 return
 
-            success, message = await self.s3_service.delete_file(str(interaction.guild_id), filename, "ledgers")
+            success, message = await self._delete_manifest_entries(str(interaction.guild_id), [entry])
             await interaction.followup.send(message, ephemeral=not success)
 
         except Exception as e:
@@ -121,21 +187,138 @@ class LedgerAndLogCommands(commands.Cog):
             await interaction.response.defer(thinking=True)
             logger.info(f"Deleting log file {filename} for guild {interaction.guild_id}")
 
-            files, _ = await self.s3_service.list_files(str(interaction.guild_id), "logs")
-            if filename not in files:
+            manifest = await load_guild_manifest(str(interaction.guild_id), self.s3_service)
+            entry = find_manifest_entry(manifest, "logs", filename)
+            if entry is None:
                 await interaction.followup.send(
                     f"File '{filename}' not found in log files.",
                     ephemeral=True,
                 )
                 return
 
-            success, message = await self.s3_service.delete_file(str(interaction.guild_id), filename, "logs")
+            success, message = await self._delete_manifest_entries(str(interaction.guild_id), [entry])
             await interaction.followup.send(message, ephemeral=not success)
 
         except Exception as e:
             logger.error(f"Error in delete_log_file: {e}")
             await interaction.followup.send("An error occurred while deleting the file.", ephemeral=True)
 
+    @app_commands.command(
+        name="delete_files",
+        description="Delete several ledger or log CSV files at once, given as a comma-separated list of names",
+    )
+    @app_commands.describe(
+        file_type="Type of files to delete",
+        filenames="Comma-separated file names, e.g. ledger_a.csv,ledger_b.csv",
+    )
+    @app_commands.checks.has_role(DiscordConfig.HEADWINSPOKER_ADMIN_ROLE_NAME)
+    async def delete_files(
+        self,
+        interaction: discord.Interaction,
+        file_type: Literal["ledgers", "logs"],
+        filenames: str,
+    ) -> None:
+        try:
+            await interaction.response.defer(thinking=True)
+            requested_filenames = list(dict.fromkeys(name.strip() for name in filenames.split(",") if name.strip()))
+            logger.info(f"Deleting {len(requested_filenames)} {file_type} files for guild {interaction.guild_id}")
+
+            manifest = await load_guild_manifest(str(interaction.guild_id), self.s3_service)
+            entries: list[ManifestEntry] = []
+            missing_filenames: list[str] = []
+            for filename in requested_filenames:
+                entry = find_manifest_entry(manifest, file_type, filename)
+                if entry is None:
+                    missing_filenames.append(filename)
+                else:
+                    entries.append(entry)
+
+            if not entries:
+                await interaction.followup.send(f"None of the given files were found in {file_type}.", ephemeral=True)
+                return
+
+            success, message = await self._delete_manifest_entries(str(interaction.guild_id), entries)
+            if missing_filenames:
+                message += f"\nNot found: {format_filenames(missing_filenames)}"
+            await interaction.followup.send(message, ephemeral=not success)
+
+        except Exception as e:
+            logger.error(f"Error in delete_files: {e}")
+            await interaction.followup.send("An error occurred while deleting the files.", ephemeral=True)
+
+    @app_commands.command(
+        name="delete_files_in_date_range",
+        description="Delete all ledger or log CSV files whose session date falls within a date range",
+    )
+    @app_commands.describe(
+        file_type="Type of files to delete",
+        start_date="First session date to delete, inclusive (YYYY-MM-DD)",
+        end_date="Last session date to delete, inclusive (YYYY-MM-DD)",
+    )
+    @app_commands.checks.has_role(DiscordConfig.HEADWINSPOKER_ADMIN_ROLE_NAME)
+    async def delete_files_in_date_range(
+        self,
+        interaction: discord.Interaction,
+        file_type: Literal["ledgers", "logs"],
+        start_date: str,
+        end_date: str,
+    ) -> None:
+        try:
+            await interaction.response.defer(thinking=True)
+            logger.info(f"Deleting {file_type} files from {start_date} to {end_date} for guild {interaction.guild_id}")
+
+            start = parse_date_option(start_date)
+            end = parse_date_option(end_date)
+            if start is None or end is None or start > end:
+                await interaction.followup.send(
+                    "Please provide a valid date range in YYYY-MM-DD format.",
+                    ephemeral=True,
+                )
+                return
+
+            guild_id = str(interaction.guild_id)
+            manifest = await load_guild_manifest(guild_id, self.s3_service)
+            unsummarized_entries = [
+                entry
+                for entry in get_manifest_entries(manifest, file_type)
+                if entry.summary is None and entry.filename.endswith(".csv")
+            ]
+            if unsummarized_entries:
+                # Files that were never loaded have no session date yet, storing them backfills it as the loaders do
+                store_entries = store_ledger_entries if file_type == "ledgers" else store_poker_log_entries
+                try:
+                    await store_entries(guild_id, self.s3_service, unsummarized_entries)
+                except Exception as e:
+                    logger.error(f"Error backfilling {file_type} summaries for guild {guild_id}: {e}")
+                manifest = await load_guild_manifest(guild_id, self.s3_service)
+
+            entries: list[ManifestEntry] = []
+            undated_filenames: list[str] = []
+            for entry in get_manifest_entries(manifest, file_type):
+                if entry.summary is None:
+                    undated_filenames.append(entry.filename)
+                elif entry.summary.session_date is not None and start <= entry.summary.session_date <= end:
+                    entries.append(entry)
+            undated_message = (
+                f"\nSkipped {len(undated_filenames)} files whose session date could not be read: "
+                f"{format_filenames(undated_filenames)}"
+                if undated_filenames
+                else ""
+            )
+            if not entries:
+                await interaction.followup.send(
+                    f"No {file_type} files found with a session date between {start} and {end}.{undated_message}",
+                    ephemeral=True,
+                )
+                return
+
+            success, message = await self._delete_manifest_entries(guild_id, entries)
+            await interaction.followup.send(message + undated_message, ephemeral=not success)
+
+        except Exception as e:
+            logger.error(f"Error in delete_files_in_date_range: {e}")
+            await interaction.followup.send("An error occurred while deleting the files.", ephemeral=True)
+
 
 async def setup(bot: commands.Bot) -> None:
-    await bot.add_cog(LedgerAndLogCommands(bot, S3Service()))
+    await bot.add_cog(LedgerAndLogCommands(bot, get_shared_s3_service(), get_shared_guild_dataset_cache()))
@@ -0,0 +1,106 @@
+import time
+from collections import deque
+from logging import getLogger
+
+from discord.ext import commands, tasks
+
+from src.analytics.guild_charts import GuildCharts, get_shared_guild_charts
+from src.analytics.guild_dataset_cache import GuildDatasetCache, get_shared_guild_dataset_cache
+from src.config.precompute_config import PrecomputeConfig
+from src.discordbot.helpers.cache_warmup import ForegroundActivity, get_shared_foreground_activity, is_active_guild
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
+
+logger = getLogger(__name__)
+
+SECONDS_PER_HOUR = 60 * 60
+
+
+class PrecomputeTasks(commands.Cog):
+    """
+    Periodically renders the all-time charts of guilds whose data changed, so graph commands
+    mostly read cached charts. Runs only while no user command is loading or rendering.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        s3_service: S3Service,
+        dataset_cache: GuildDatasetCache,
+        guild_charts: GuildCharts,
+        foreground_activity: ForegroundActivity,
+    ) -> None:
+        self.bot = bot
+        self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
+        self.guild_charts = guild_charts
+        self.foreground_activity = foreground_activity
+        self._precomputed_data_versions: dict[str, str] = {}
+        self._last_precomputed_at: dict[str, float] = {}
+        # (monotonic time, process CPU seconds) of each precompute within the last hour
+        self._cpu_usage: deque[tuple[float, float]] = deque()
+        self.precompute_changed_guilds.start()
+
+    async def cog_unload(self) -> None:
+        self.precompute_changed_guilds.cancel()
+
+    def _is_due(self, guild_id: str) -> bool:
+        interval_minutes = PrecomputeConfig.GUILD_INTERVAL_MINUTES.get(
+            guild_id, PrecomputeConfig.DEFAULT_GUILD_INTERVAL_MINUTES
+        )
+        if interval_minutes is None:
+            return False
+        last_precomputed_at = self._last_precomputed_at.get(guild_id)
+        return last_precomputed_at is None or time.monotonic() - last_precomputed_at >= interval_minutes * 60
+
+    def _get_cpu_seconds_in_last_hour(self) -> float:
+        while self._cpu_usage and time.monotonic() - self._cpu_usage[0][0] > SECONDS_PER_HOUR:
+            self._cpu_usage.popleft()
+        return sum(cpu_seconds for _, cpu_seconds in self._cpu_usage)
+
+    async def _precompute_guild(self, guild_id: str) -> None:
+        if not await is_active_guild(guild_id, self.s3_service):
+            return
+        data_version = await self.dataset_cache.get_data_version(guild_id)
+        if self._precomputed_data_versions.get(guild_id) == data_version:
+            return
+
+        # Process CPU time also counts user commands running meanwhile, which errs on the side of precomputing less
+        cpu_start = time.process_time()
+        await self.guild_charts.precompute_all_time_charts(guild_id)
+        cpu_seconds = time.process_time() - cpu_start
+        self._cpu_usage.append((time.monotonic(), cpu_seconds))
+        self._precomputed_data_versions[guild_id] = data_version
+        logger.info(f"Precomputed charts of data version {data_version} for guild {guild_id} in {cpu_seconds:.1f}s CPU")
+
+    @tasks.loop(minutes=PrecomputeConfig.CHECK_INTERVAL_MINUTES)
+    async def precompute_changed_guilds(self) -> None:
+        for guild in self.bot.guilds:
+            guild_id = str(guild.id)
+            if not self._is_due(guild_id):
+                continue
+            if self._get_cpu_seconds_in_last_hour() >= PrecomputeConfig.CPU_SECONDS_PER_HOUR:
+                logger.info("Precompute CPU budget for this hour is used up, resuming on a later run")
+                return
+
+            await self.foreground_activity.wait_until_idle()
+            self._last_precomputed_at[guild_id] = time.monotonic()
+            try:
+                await self._precompute_guild(guild_id)
+            except Exception as e:
+                logger.error(f"Error precomputing charts for guild {guild_id}: {e}")
+
+    @precompute_changed_guilds.before_loop
+    async def before_precompute_changed_guilds(self) -> None:
+        await self.bot.wait_until_ready()
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(
+        PrecomputeTasks(
+            bot,
+            get_shared_s3_service(),
+            get_shared_guild_dataset_cache(),
+            get_shared_guild_charts(),
+            get_shared_foreground_activity(),
+        )
+    )
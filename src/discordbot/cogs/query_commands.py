@@ -0,0 +1,66 @@
+import asyncio
+from logging import getLogger
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from src.analytics.adhoc_query import format_query_result, run_read_only_query
+from src.analytics.guild_dataset_cache import GuildDatasetCache, get_shared_guild_dataset_cache
+from src.config.discord_config import DiscordConfig
+from src.dataingestion.ledger_session_helpers import load_stored_ledger_hashes
+from src.dataingestion.poker_hand_parser import load_stored_poker_log_hashes
+from src.discordbot.helpers.cache_warmup import ForegroundActivity, get_shared_foreground_activity
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
+
+logger = getLogger(__name__)
+
+
+class QueryCommands(commands.Cog):
+    def __init__(
+        self,
+        bot: commands.Bot,
+        s3_service: S3Service,
+        dataset_cache: GuildDatasetCache,
+        foreground_activity: ForegroundActivity,
+    ) -> None:
+        self.bot = bot
+        self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
+        self.foreground_activity = foreground_activity
+
+    @app_commands.command(
+        name="query",
+        description="Run a read-only SQL query over this server's sessions and hands (admin only)",
+    )
+    @app_commands.describe(sql="A single SELECT statement, see /help for the tables")
+    @app_commands.checks.has_role(DiscordConfig.HEADWINSPOKER_ADMIN_ROLE_NAME)
+    async def query(self, interaction: discord.Interaction, sql: str) -> None:
+        logger.info(f"Running ad-hoc query for guild {interaction.guild_id}: {sql}")
+        try:
+            await interaction.response.defer(thinking=True)
+            guild_id = str(interaction.guild_id)
+
+            async with self.foreground_activity.track():
+                # Files missing from the analytics database are stored first, so queries see every file
+                registered_players, ledger_hashes, log_hashes = await asyncio.gather(
+                    self.dataset_cache.get_registered_players(guild_id),
+                    load_stored_ledger_hashes(guild_id, self.s3_service),
+                    load_stored_poker_log_hashes(guild_id, self.s3_service),
+                )
+                result = await asyncio.to_thread(
+                    run_read_only_query, guild_id, sql, ledger_hashes + log_hashes, registered_players
+                )
+
+            await interaction.followup.send(format_query_result(result))
+        except ValueError as e:
+            await interaction.followup.send(f"Query failed: {e}", ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error in query: {e}")
+            await interaction.followup.send("An error occurred while running the query.", ephemeral=True)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(
+        QueryCommands(bot, get_shared_s3_service(), get_shared_guild_dataset_cache(), get_shared_foreground_activity())
+    )
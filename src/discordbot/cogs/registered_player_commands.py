@@ -5,17 +5,19 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from src.analytics.guild_dataset_cache import GuildDatasetCache, get_shared_guild_dataset_cache
 from src.config.discord_config import DiscordConfig
 from src.discordbot.helpers.validation_helpers import validate_registered_players_file
-from src.discordbot.services.s3_service import S3Service
+from src.discordbot.services.s3_service import S3Service, get_shared_s3_service
 
 logger = getLogger(__name__)
 
 
 class RegisteredPlayerCommands(commands.Cog):
-    def __init__(self, bot: commands.Bot, s3_service: S3Service) -> None:
+    def __init__(self, bot: commands.Bot, s3_service: S3Service, dataset_cache: GuildDatasetCache) -> None:
         self.bot = bot
         self.s3_service = s3_service
+        self.dataset_cache = dataset_cache
 
     @app_commands.command(
         name="upload_registered_players",
@@ -30,14 +32,17 @@ class RegisteredPlayerCommands(commands.Cog):
             await interaction.response.defer(thinking=True)
             logger.info(f"Uploading registered players JSON file: {registered_players_file.filename}")
 
-            validation_result = await validate_registered_players_file(registered_players_file)
+            content = await registered_players_file.read()
+            validation_result = await validate_registered_players_file(registered_players_file.filename, content)
             if validation_result:
                 await interaction.followup.send(validation_result, ephemeral=True)
                 return
 
             success, message = await self.s3_service.upload_file(
-                registered_players_file, str(interaction.guild_id), "registered_players"
+                content, registered_players_file.filename, str(interaction.guild_id), "registered_players"
             )
+            if success:
+                self.dataset_cache.invalidate(str(interaction.guild_id))
             await interaction.followup.send(message, ephemeral=not success)
 
         except Exception as e:
@@ -114,6 +119,8 @@ class RegisteredPlayerCommands(commands.Cog):
             success, message = await self.s3_service.delete_file(
                 str(interaction.guild_id), "registered_players.json", "registered_players"
             )
+            if success:
+                self.dataset_cache.invalidate(str(interaction.guild_id))
             await interaction.followup.send(message, ephemeral=not success)
 
         except Exception as e:
@@ -122,4 +129,4 @@ class RegisteredPlayerCommands(commands.Cog):
 
 
 async def setup(bot: commands.Bot) -> None:
-    await bot.add_cog(RegisteredPlayerCommands(bot, S3Service()))
+    await bot.add_cog(RegisteredPlayerCommands(bot, get_shared_s3_service(), get_shared_guild_dataset_cache()))
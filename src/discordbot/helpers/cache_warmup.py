@@ -0,0 +1,85 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from functools import cache
+from logging import getLogger
+
+from src.analytics.guild_dataset_cache import GuildDatasetCache
+from src.config.cache_config import CacheConfig
+from src.dataingestion.poker_hand_parser import load_all_columnar_poker_logs
+from src.discordbot.services.s3_service import S3Service
+
+logger = getLogger(__name__)
+
+
+class ForegroundActivity:
+    """Counts user commands in progress, so background work can wait until the bot is idle."""
+
+    def __init__(self) -> None:
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def track(self) -> AsyncGenerator[None, None]:
+        self._active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if self._active == 0:
+                self._idle.set()
+
+    async def wait_until_idle(self) -> None:
+        await self._idle.wait()
+
+
+@cache
+def get_shared_foreground_activity() -> ForegroundActivity:
+    return ForegroundActivity()
+
+
+async def is_active_guild(guild_id: str, s3_service: S3Service) -> bool:
+    """Check whether a guild has uploaded files, without bootstrapping a manifest for guilds that never did."""
+    manifest = await s3_service.get_manifest(guild_id)
+    return manifest is not None and bool(manifest.entries)
+
+
+async def warm_guild_caches(
+    guild_ids: list[str],
+    s3_service: S3Service,
+    dataset_cache: GuildDatasetCache,
+    foreground_activity: ForegroundActivity,
+) -> None:
+    """
+    Load each active guild's ledger dataset into the in-memory cache and its poker logs into the local hand store.
+    Before each load it waits for user commands to finish, so it only uses otherwise idle time.
+
+    Args:
+        guild_ids: Discord guild IDs the bot is in
+        s3_service: S3 service to load the data with
+        dataset_cache: Cache the ledger datasets are loaded into
+        foreground_activity: User command activity to yield to
+    """
+    semaphore = asyncio.Semaphore(CacheConfig.WARMUP_MAX_CONCURRENT_GUILDS)
+
+    async def warm_guild(guild_id: str) -> None:
+        async with semaphore:
+            await foreground_activity.wait_until_idle()
+            if not await is_active_guild(guild_id, s3_service):
+                return
+
+            await foreground_activity.wait_until_idle()
+            await dataset_cache.get_dataset(guild_id)
+
+            await foreground_activity.wait_until_idle()
+            # Only fills the local hand store, no columns are read
+            await load_all_columnar_poker_logs(guild_id, s3_service, action_columns=[])
+            logger.info(f"Warmed caches for guild {guild_id}")
+
+    results = await asyncio.gather(*(warm_guild(guild_id) for guild_id in guild_ids), return_exceptions=True)
+    for guild_id, result in zip(guild_ids, results, strict=True):
+        if isinstance(result, Exception):
+            logger.error(f"Error warming caches for guild {guild_id}: {result}")
+    logger.info(f"Finished warming caches for {len(guild_ids)} guilds")
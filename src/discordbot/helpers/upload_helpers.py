@@ -0,0 +1,120 @@
+import asyncio
+from collections.abc import Callable
+from logging import getLogger
+
+from src.dataingestion.file_manifest_helpers import (
+    build_manifest_entry,
+    find_entry_by_content_hash,
+    hash_file_content,
+    load_guild_manifest,
+    record_uploaded_files,
+)
+from src.dataingestion.ledger_session_helpers import summarize_ledger_content
+from src.dataingestion.poker_hand_parser import summarize_poker_log_content
+from src.dataingestion.schemas.file_manifest import FileSummary, GuildManifest, ManifestEntry
+from src.discordbot.services.s3_service import FileType, S3Service
+
+logger = getLogger(__name__)
+
+SUMMARIZERS: dict[FileType, Callable[[str], FileSummary]] = {
+    "ledgers": summarize_ledger_content,
+    "logs": summarize_poker_log_content,
+}
+
+
+def _summarize_file(filename: str, content: bytes, file_type: FileType) -> FileSummary | None:
+    # A file that cannot be summarized is still stored, its summary is backfilled on first load
+    try:
+        return SUMMARIZERS[file_type](content.decode("utf-8"))
+    except Exception as e:
+        logger.warning(f"Could not summarize {filename}: {e}")
+        return None
+
+
+async def _store_file(
+    s3_service: S3Service,
+    filename: str,
+    content: bytes,
+    guild_id: str,
+    file_type: FileType,
+) -> ManifestEntry | None:
+    """Upload a file and summarize it concurrently. Returns its manifest entry, or None if the upload failed."""
+    try:
+        stored_object, summary = await asyncio.gather(
+            s3_service.upload_content(content, filename, guild_id, file_type),
+            asyncio.to_thread(_summarize_file, filename, content, file_type),
+        )
+    except Exception as e:
+        logger.error(f"Failed to upload {filename}: {e}")
+        return None
+    return build_manifest_entry(stored_object, file_type, content, summary)
+
+
+def _find_duplicates(manifest: GuildManifest, files: list[tuple[str, bytes, FileType]]) -> list[str | None]:
+    """
+    Find files whose exact content is already stored, or repeated earlier in the same upload.
+
+    Returns:
+        For each file, the filename of its earlier copy, or None if its content is new
+    """
+    uploaded_filenames: dict[tuple[FileType, str], str] = {}
+    duplicate_of: list[str | None] = []
+    for filename, content, file_type in files:
+        content_hash = hash_file_content(content)
+        stored_entry = find_entry_by_content_hash(manifest, file_type, content_hash)
+        earlier_filename = stored_entry.filename if stored_entry else uploaded_filenames.get((file_type, content_hash))
+        duplicate_of.append(earlier_filename)
+        uploaded_filenames.setdefault((file_type, content_hash), filename)
+    return duplicate_of
+
+
+async def upload_and_record_files(
+    s3_service: S3Service,
+    guild_id: str,
+    files: list[tuple[str, bytes, FileType]],
+) -> list[tuple[bool, str]]:
+    """
+    Upload already read ledger and log files to S3 concurrently and record them in the guild's manifest.
+    Files with exactly the same content as a stored file are not stored again, so they are never counted twice.
+
+    Args:
+        files: (filename, content, file type) of each file to upload
+
+    Returns:
+        (success, message) for each file, in the same order
+    """
+    manifest = await load_guild_manifest(guild_id, s3_service)
+    duplicate_of = await asyncio.to_thread(_find_duplicates, manifest, files)
+    new_files = [file for file, earlier_filename in zip(files, duplicate_of, strict=True) if earlier_filename is None]
+    for (filename, _, _), earlier_filename in zip(files, duplicate_of, strict=True):
+        if earlier_filename is not None:
+            logger.info(f"Skipping duplicate upload {filename} of {earlier_filename} for guild {guild_id}")
+
+    new_entries = await asyncio.gather(
+        *(_store_file(s3_service, filename, content, guild_id, file_type) for filename, content, file_type in new_files)
+    )
+    uploaded_entries = [entry for entry in new_entries if entry is not None]
+    # The check above skips most duplicates early, this one runs under the manifest lock and catches concurrent uploads
+    recorded_duplicate_of = dict(
+        zip(
+            (entry.key for entry in uploaded_entries),
+            await record_uploaded_files(guild_id, s3_service, uploaded_entries),
+            strict=True,
+        )
+    )
+
+    remaining_entries = iter(new_entries)
+    results: list[tuple[bool, str]] = []
+    for (filename, _, _), earlier_filename in zip(files, duplicate_of, strict=True):
+        entry = next(remaining_entries) if earlier_filename is None else None
+        recorded_duplicate = recorded_duplicate_of[entry.key] if entry is not None else None
+        copy_filename = recorded_duplicate.filename if recorded_duplicate is not None else earlier_filename
+        if copy_filename == filename:
+            results.append((False, f"Skipped {filename}, it is already uploaded"))
+        elif copy_filename is not None:
+            results.append((False, f"Skipped {filename}, it has the same content as {copy_filename}"))
+        elif entry is not None:
+            results.append((True, f"Successfully uploaded {filename}"))
+        else:
+            results.append((False, f"Failed to upload {filename}"))
+    return results
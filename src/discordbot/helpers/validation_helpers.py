@@ -1,21 +1,19 @@
 import json
 import re
+from datetime import date
 from logging import getLogger
 
-import discord
-
 logger = getLogger(__name__)
 
 
-async def validate_registered_players_file(file: discord.Attachment) -> str | None:
+async def validate_registered_players_file(filename: str, content: bytes) -> str | None:
     """Validate the registered players JSON file format."""
-    if not file.filename.endswith(".json"):
+    if not filename.endswith(".json"):
         return "Please upload a JSON file"
 
-    if file.filename != "registered_players.json":
+    if filename != "registered_players.json":
         return "File must be named 'registered_players.json'"
 
-    content = await file.read()
     text = content.decode("utf-8")
 
     try:
@@ -66,11 +64,34 @@ async def validate_registered_players_file(file: discord.Attachment) -> str | No
     return None
 
 
-async def validate_ledger_file(ledger_file: discord.Attachment) -> str | None:
-    if not ledger_file.filename.endswith(".csv") or not ledger_file.filename.startswith("ledger"):
+def parse_date_option(value: str) -> date | None:
+    """Parse a YYYY-MM-DD command option. Returns None if the value is not a valid date."""
+    if not re.match(r"^\d{4}-\d{2}-\d{2}$", value):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_date_range_options(start_date: str | None, end_date: str | None) -> tuple[date | None, date | None]:
+    """
+    Parse optional YYYY-MM-DD start and end date command options.
+    Raises ValueError with a user-facing message if either date is invalid or the range is empty.
+    """
+    start = parse_date_option(start_date) if start_date else None
+    end = parse_date_option(end_date) if end_date else None
+    if (start_date and start is None) or (end_date and end is None):
+        raise ValueError("Dates must be valid and in YYYY-MM-DD format")
+    if start is not None and end is not None and start > end:
+        raise ValueError("start_date must be on or before end_date")
+    return start, end
+
+
+async def validate_ledger_file(ledger_filename: str, ledger_content: bytes) -> str | None:
+    if not ledger_filename.endswith(".csv") or not ledger_filename.startswith("ledger"):
         return "Please upload a ledger CSV file starting with 'ledger'"
 
-    ledger_content = await ledger_file.read()
     ledger_text = ledger_content.decode("utf-8")
     first_line = ledger_text.split("\n")[0].strip()
     expected_headers = "player_nickname,player_id,session_start_at,session_end_at,buy_in,buy_out,stack,net"
@@ -84,11 +105,10 @@ async def validate_ledger_file(ledger_file: discord.Attachment) -> str | None:
     return None
 
 
-async def validate_log_file(log_file: discord.Attachment) -> str | None:
-    if not log_file.filename.endswith(".csv") or not log_file.filename.startswith("poker_now_log"):
+async def validate_log_file(log_filename: str, log_content: bytes) -> str | None:
+    if not log_filename.endswith(".csv") or not log_filename.startswith("poker_now_log"):
         return "Please upload a log CSV file starting with 'poker_now_log'"
 
-    log_content = await log_file.read()
     log_text = log_content.decode("utf-8")
     log_first_line = log_text.split("\n")[0].strip()
     expected_log_headers = "entry,at,order"
@@ -99,12 +119,17 @@ async def validate_log_file(log_file: discord.Attachment) -> str | None:
     return None
 
 
-async def validate_ledger_and_log_files(ledger_file: discord.Attachment, log_file: discord.Attachment) -> str | None:
-    ledger_validation = await validate_ledger_file(ledger_file)
+async def validate_ledger_and_log_files(
+    ledger_filename: str,
+    ledger_content: bytes,
+    log_filename: str,
+    log_content: bytes,
+) -> str | None:
+    ledger_validation = await validate_ledger_file(ledger_filename, ledger_content)
     if ledger_validation:
         return ledger_validation
 
-    log_validation = await validate_log_file(log_file)
+    log_validation = await validate_log_file(log_filename, log_content)
     if log_validation:
         return log_validation
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 
@@ -6,7 +7,10 @@ from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from src.analytics.guild_dataset_cache import get_shared_guild_dataset_cache
 from src.config.discord_config import DiscordConfig
+from src.discordbot.helpers.cache_warmup import get_shared_foreground_activity, warm_guild_caches
+from src.discordbot.services.s3_service import get_shared_s3_service
 from src.discordbot.services.secrets_manager_service import SecretsManagerService
 
 logger = logging.getLogger(__name__)
@@ -16,6 +20,9 @@ intents.message_content = True
 intents.members = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+# References to running background tasks, so they are not garbage collected before they finish
+background_tasks: set[asyncio.Task[None]] = set()
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -44,12 +51,27 @@ async def on_ready() -> None:
     await bot.load_extension("src.discordbot.cogs.graph_commands")
     await bot.load_extension("src.discordbot.cogs.ledger_and_log_commands")
     await bot.load_extension("src.discordbot.cogs.registered_player_commands")
+    await bot.load_extension("src.discordbot.cogs.query_commands")
+    await bot.load_extension("src.discordbot.cogs.hand_commands")
     await bot.load_extension("src.discordbot.cogs.help_commands")
+    await bot.load_extension("src.discordbot.cogs.precompute_tasks")
     await bot.tree.sync()
 
     logger.info("Cogs loaded and commands synced")
     logger.info("------")
 
+    # Warm caches in the background after commands are available, so startup is not delayed by it
+    warmup_task = asyncio.create_task(
+        warm_guild_caches(
+            [str(guild.id) for guild in bot.guilds],
+            get_shared_s3_service(),
+            get_shared_guild_dataset_cache(),
+            get_shared_foreground_activity(),
+        )
+    )
+    background_tasks.add(warmup_task)
+    warmup_task.add_done_callback(background_tasks.discard)
+
 
 if __name__ == "__main__":
     load_dotenv()
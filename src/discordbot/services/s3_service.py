@@ -1,26 +1,120 @@
+import asyncio
+import codecs
+import gzip
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from functools import cache
 from io import BytesIO
 from logging import getLogger
-from typing import Literal
+from typing import Any, Literal
 
 import boto3
-import discord
+from botocore.config import Config
 
 from src.config.aws_config import AWSConfig
+from src.dataingestion.schemas.file_manifest import GuildManifest, StoredFileBody, StoredObject
 
 logger = getLogger(__name__)
 
 FileType = Literal["registered_players", "ledgers", "logs"]
 
+# Maximum number of keys accepted by a single delete_objects call
+MAX_KEYS_PER_DELETE = 1000
+
+# Object metadata key recording how a stored file was compressed, absent for uncompressed objects
+COMPRESSION_METADATA_KEY = "compression"
+
+
+class _ObservedReader:
+    """Binary reader that passes every chunk it reads to an observer, e.g. a running content hash."""
+
+    def __init__(self, raw: Any, observer: Callable[[bytes], object]) -> None:
+        self.raw = raw
+        self.observer = observer
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.observer(chunk)
+        return chunk
+
+
+def open_text_stream(
+    raw: Any,
+    compression: str | None,
+    content_observer: Callable[[bytes], object] | None = None,
+) -> Iterable[str]:
+    """
+    Wrap a binary reader over a stored body in a stream of text lines.
+    The body is decompressed and UTF-8 decoded incrementally while it is read, so it is never held in full.
+
+    Args:
+        raw: Binary reader over the stored bytes
+        compression: Compression recorded in the object metadata, None if stored uncompressed
+        content_observer: Optional callback receiving each chunk of uncompressed content as it is read
+    """
+    if compression == "gzip":
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    elif compression is not None:
+        raise ValueError(f"Unsupported stored compression: {compression}")
+    if content_observer is not None:
+        raw = _ObservedReader(raw, content_observer)
+    return codecs.getreader("utf-8")(raw)
+
+
+def open_stored_body_stream(
+    stored_body: StoredFileBody,
+    content_observer: Callable[[bytes], object] | None = None,
+) -> Iterable[str]:
+    """Open a stored file body as a stream of text lines read straight from S3, see open_text_stream."""
+    return open_text_stream(stored_body.body, stored_body.compression, content_observer)
+
 
 class S3Service:
     def __init__(self) -> None:
-        self.s3_client = boto3.client("s3")
+        self.s3_client = boto3.client(
+            "s3",
+            config=Config(
+                max_pool_connections=AWSConfig.S3_MAX_POOL_CONNECTIONS,
+                connect_timeout=AWSConfig.S3_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=AWSConfig.S3_READ_TIMEOUT_SECONDS,
+                retries={"max_attempts": AWSConfig.S3_MAX_RETRY_ATTEMPTS, "mode": "standard"},
+                tcp_keepalive=True,
+            ),
+        )
         self.bucket_name: str = AWSConfig.BUCKET_NAME
 
     def _get_prefix(self, guild_id: str, file_type: FileType) -> str:
         """Get the S3 prefix for a given file type and guild."""
         return f"uploads/{guild_id}/{file_type}/"
 
+    def _get_manifest_key(self, guild_id: str) -> str:
+        """Get the S3 key of a guild's file manifest."""
+        return f"uploads/{guild_id}/manifest.json"
+
+    def get_key(self, guild_id: str, filename: str, file_type: FileType) -> str:
+        """Get the S3 key for a given file, file type and guild."""
+        return self._get_prefix(guild_id, file_type) + filename
+
+    def _compress(self, content: bytes) -> tuple[bytes, dict[str, Any]]:
+        """Compress file content for upload. Returns (body, extra upload args)."""
+        if AWSConfig.UPLOAD_COMPRESSION is None:
+            return content, {}
+        if AWSConfig.UPLOAD_COMPRESSION != "gzip":
+            raise ValueError(f"Unsupported upload compression: {AWSConfig.UPLOAD_COMPRESSION}")
+
+        # mtime=0 keeps the compressed bytes deterministic for identical content
+        body = gzip.compress(content, compresslevel=AWSConfig.UPLOAD_COMPRESSION_LEVEL, mtime=0)
+        return body, {"ContentEncoding": "gzip", "Metadata": {COMPRESSION_METADATA_KEY: "gzip"}}
+
+    def _decompress(self, body: bytes, metadata: dict[str, str]) -> bytes:
+        """Decompress a stored body based on its object metadata. Uncompressed objects are returned as is."""
+        compression = metadata.get(COMPRESSION_METADATA_KEY)
+        if compression is None:
+            return body
+        if compression == "gzip":
+            return gzip.decompress(body)
+        raise ValueError(f"Unsupported stored compression: {compression}")
+
     async def get_file(self, guild_id: str, filename: str, file_type: FileType) -> tuple[bool, str]:
         """
         Get a specific file from S3.
@@ -29,11 +123,25 @@ class S3Service:
         try:
             key = self._get_prefix(guild_id, file_type) + filename
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-            return True, response["Body"].read().decode("utf-8")
+            body = self._decompress(response["Body"].read(), response.get("Metadata", {}))
+            return True, body.decode("utf-8")
         except Exception as e:
             logger.error(f"Error getting {file_type} file: {e}")
             return False, f"Failed to get {filename}"
 
+    async def download_file_body(self, guild_id: str, filename: str, file_type: FileType) -> StoredFileBody:
+        """
+        Open the stored body of a specific file in a worker thread, without reading or decompressing it.
+        The body is streamed from S3 as it is parsed, see open_stored_body_stream, and must be closed by the reader.
+        Raises on S3 errors.
+        """
+        key = self.get_key(guild_id, filename, file_type)
+        response = await asyncio.to_thread(self.s3_client.get_object, Bucket=self.bucket_name, Key=key)
+        return StoredFileBody(
+            body=response["Body"],
+            compression=response.get("Metadata", {}).get(COMPRESSION_METADATA_KEY),
+        )
+
     async def list_files(self, guild_id: str, file_type: FileType, limit: int | None = None) -> tuple[list[str], str]:
         """
         List files of a specific type in S3 for a guild.
@@ -76,6 +184,47 @@ class S3Service:
             logger.error(f"Error listing {file_type} files: {e}")
             return [], f"Failed to list {file_type} files"
 
+    async def list_file_objects(self, guild_id: str, file_type: FileType) -> list[StoredObject]:
+        """
+        List every stored object of a specific type for a guild, including ETag and size.
+        Raises on S3 errors.
+        """
+        prefix = self._get_prefix(guild_id, file_type)
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        stored_objects: list[StoredObject] = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                stored_objects.append(
+                    StoredObject(
+                        key=obj["Key"],
+                        filename=obj["Key"].split("/")[-1],
+                        etag=obj["ETag"],
+                        size_bytes=obj["Size"],
+                        last_modified=obj["LastModified"],
+                    )
+                )
+        return stored_objects
+
+    async def get_manifest(self, guild_id: str) -> GuildManifest | None:
+        """
+        Get a guild's file manifest.
+        Returns None if the guild has no manifest yet, raises on other S3 errors.
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self._get_manifest_key(guild_id))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return GuildManifest.model_validate_json(response["Body"].read())
+
+    async def save_manifest(self, guild_id: str, manifest: GuildManifest) -> None:
+        """Overwrite a guild's file manifest. Raises on S3 errors."""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=self._get_manifest_key(guild_id),
+            Body=manifest.model_dump_json().encode("utf-8"),
+            ContentType="application/json",
+        )
+
     async def delete_file(self, guild_id: str, filename: str, file_type: FileType) -> tuple[bool, str]:
         """
         Delete a specific file from S3.
@@ -104,29 +253,87 @@ class S3Service:
             logger.error(f"Error deleting {file_type} file: {e}")
             return False, f"Failed to delete {filename}"
 
+    async def delete_keys(self, keys: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Delete many objects using batched delete_objects calls, without checking that they exist first.
+        Returns (deleted keys, keys that failed to delete)
+        """
+        deleted: list[str] = []
+        failed: list[str] = []
+        for start in range(0, len(keys), MAX_KEYS_PER_DELETE):
+            batch = keys[start : start + MAX_KEYS_PER_DELETE]
+            try:
+                response = await asyncio.to_thread(
+                    self.s3_client.delete_objects,
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": False},
+                )
+            except Exception as e:
+                logger.error(f"Error deleting batch of {len(batch)} files: {e}")
+                failed.extend(batch)
+                continue
+
+            deleted.extend(obj["Key"] for obj in response.get("Deleted", []))
+            for error in response.get("Errors", []):
+                logger.error(f"Error deleting {error['Key']}: {error.get('Message')}")
+                failed.append(error["Key"])
+        return deleted, failed
+
+    async def upload_content(
+        self,
+        content: bytes,
+        filename: str,
+        guild_id: str,
+        file_type: FileType,
+    ) -> StoredObject:
+        """
+        Upload raw file content to S3, compressing it if configured.
+        Compression and the upload run in a worker thread so concurrent uploads overlap.
+        Returns the stored object, raises on S3 errors.
+        """
+        body, extra_args = await asyncio.to_thread(self._compress, content)
+        key = self.get_key(guild_id, filename, file_type)
+
+        response = await asyncio.to_thread(
+            self.s3_client.put_object,
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=BytesIO(body),
+            ContentType="text/csv",
+            **extra_args,
+        )
+        return StoredObject(
+            key=key,
+            filename=filename,
+            etag=response["ETag"],
+            size_bytes=len(body),
+            last_modified=datetime.now(UTC),
+        )
+
     async def upload_file(
         self,
-        file: discord.Attachment,
+        content: bytes,
+        filename: str,
         guild_id: str,
         file_type: FileType,
     ) -> tuple[bool, str]:
         """
-        Upload a single file to S3.
+        Upload a single file that has already been read to S3.
         Returns (success, message)
         """
         try:
-            file_content = await file.read()
-            file_buffer = BytesIO(file_content)
-            key = self._get_prefix(guild_id, file_type) + file.filename
-
-            self.s3_client.upload_fileobj(
-                file_buffer,
-                self.bucket_name,
-                key,
-                ExtraArgs={"ContentType": "text/csv"},
-            )
-            return True, f"Successfully uploaded {file.filename}"
+            await self.upload_content(content, filename, guild_id, file_type)
+            return True, f"Successfully uploaded {filename}"
 
         except Exception as e:
-            logger.error(f"Failed to upload {file.filename}: {e}")
-            return False, f"Failed to upload {file.filename}"
+            logger.error(f"Failed to upload {filename}: {e}")
+            return False, f"Failed to upload {filename}"
+
+
+@cache
+def get_shared_s3_service() -> S3Service:
+    """
+    Get the process-wide S3Service.
+    Building a boto3 client is expensive, so every cog shares one client and its connection pool.
+    """
+    return S3Service()